@@ -0,0 +1,61 @@
+"""Cold start: seconds from launching uvicorn to the first /healthz answer.
+
+Measures this tree and, with ``--before REV``, the tree at that git
+revision (e.g. one that still ran ``pip install --upgrade yt-dlp`` on
+import), ``--runs`` times each, alternating.
+
+    python -m backend.bench.cold_start --before <rev> [--runs 5]
+"""
+import argparse
+import contextlib
+import io
+import shutil
+import subprocess
+import tarfile
+import tempfile
+from pathlib import Path
+
+from backend.bench.common import ROOT, percentile, serving
+
+
+@contextlib.contextmanager
+def checkout(rev: str):
+    """The tree at ``rev``, unpacked into a temporary directory."""
+    directory = Path(tempfile.mkdtemp(prefix="svd-checkout-"))
+    try:
+        archive = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(directory, filter="data")
+        yield directory
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def cold_start(root: Path, timeout: float) -> float:
+    with serving(root=root, timeout=timeout) as (_, _, seconds):
+        return seconds
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--before", help="git revision to compare against")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=600, help="seconds to wait for one start")
+    args = parser.parse_args()
+
+    with contextlib.ExitStack() as stack:
+        trees = {"this tree": ROOT}
+        if args.before:
+            trees[args.before] = stack.enter_context(checkout(args.before))
+        times: dict[str, list[float]] = {name: [] for name in trees}
+        for _ in range(args.runs):
+            for name, root in trees.items():
+                times[name].append(cold_start(root, args.timeout))
+
+    print(f"{'tree':<12} {'runs':>4} {'min s':>7} {'median s':>9} {'max s':>7}")
+    for name, values in times.items():
+        print(f"{name[:12]:<12} {len(values):>4} {min(values):>7.2f} {percentile(values, 50):>9.2f} {max(values):>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
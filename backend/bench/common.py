@@ -0,0 +1,127 @@
+"""Running the app as it is deployed (uvicorn in its own process) for benchmarks."""
+import contextlib
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] if ordered else float("nan")
+
+
+TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def descendants(pid: int) -> list[int]:
+    """Live processes below ``pid``, from /proc (Linux)."""
+    children: dict[int, list[int]] = {}
+    for proc in Path("/proc").iterdir():
+        if not proc.name.isdigit():
+            continue
+        try:
+            ppid = int((proc / "stat").read_text().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(proc.name))
+    found, pending = [], [pid]
+    while pending:
+        for child in children.get(pending.pop(), ()):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def tree_cpu_seconds(pid: int) -> float:
+    """User + system CPU of ``pid``, its reaped children and its live descendants (Linux)."""
+    total = 0.0
+    for proc in [pid, *descendants(pid)]:
+        try:
+            fields = Path(f"/proc/{proc}/stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # utime, stime, and cutime, cstime of the children it already reaped
+        total += sum(int(f) for f in fields[11:15]) / TICKS
+    return total
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _stage_installed_ytdlp(home: Path) -> None:
+    # Without a yt-dlp executable on PATH, point the updater's CURRENT at the
+    # installed package so the subprocess engine runs it with python -m
+    import yt_dlp
+
+    staged = home / "versions" / "installed"
+    staged.mkdir(parents=True)
+    (staged / "yt_dlp").symlink_to(Path(yt_dlp.__file__).resolve().parent, target_is_directory=True)
+    (home / "CURRENT").write_text("installed", encoding="utf-8")
+
+
+@contextlib.contextmanager
+def serving(env: dict[str, str] | None = None, timeout: float = 60, root: Path = ROOT):
+    """Start the app on a free port; yields (process, base URL, seconds until /healthz answered).
+
+    State goes to a temporary directory, files the run downloads are removed
+    afterwards and no periodic yt-dlp update runs. ``root`` is the checkout
+    to run.
+    """
+    state = Path(tempfile.mkdtemp(prefix="svd-bench-"))
+    settings = {
+        "STATE_DIR": str(state),
+        "JOB_STORE": "memory",
+        "YTDLP_UPDATE_INTERVAL_HOURS": "0",
+        "RATE_LIMIT_PER_MINUTE": "6000",
+        "RATE_LIMIT_MAX_PER_MINUTE": "6000",
+        "RATE_LIMIT_BASE_SLEEP": "0",
+        **(env or {}),
+    }
+    if settings.get("YTDLP_ENGINE") == "subprocess" and not shutil.which("yt-dlp"):
+        settings.setdefault("YTDLP_HOME", str(state / "yt-dlp"))
+        _stage_installed_ytdlp(Path(settings["YTDLP_HOME"]))
+    downloads = root / "downloads"
+    downloads.mkdir(exist_ok=True)
+    before = set(downloads.iterdir())
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env={**os.environ, **settings}, stdout=subprocess.DEVNULL,
+        # Its own process group, so engine workers still starting up can be
+        # killed along with it
+        start_new_session=True,
+    )
+    try:
+        while True:
+            try:
+                httpx.get(f"{base}/healthz", timeout=1).raise_for_status()
+                break
+            except httpx.HTTPError:
+                if proc.poll() is not None or time.perf_counter() - started > timeout:
+                    raise RuntimeError("the app did not start")
+                time.sleep(0.01)
+        yield proc, base, time.perf_counter() - started
+    finally:
+        proc.terminate()
+        proc.wait()
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(proc.pid, signal.SIGKILL)
+        for path in set(downloads.iterdir()) - before:
+            if path.is_file():
+                path.unlink()
+        shutil.rmtree(state, ignore_errors=True)
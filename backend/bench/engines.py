@@ -0,0 +1,101 @@
+"""Per-request CPU time and latency of the yt-dlp engines.
+
+Runs ``--requests`` extract + download cycles of a small file from a local
+media server through each engine, one after another, and reports wall-clock
+latency and the CPU time the cycle cost across this process and every
+child (worker processes, yt-dlp CLI runs). The first cycle of an engine is
+reported apart: it includes the in-process workers' imports.
+
+    python -m backend.bench.engines [--requests 20]
+"""
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from backend.bench.common import TICKS, descendants, percentile
+from backend.engine import DownloadOptions, InProcessEngine, SubprocessEngine
+from backend.tests.stubs import MediaServer, installed_ytdlp, unique
+
+
+def cpu_seconds() -> float:
+    """User + system CPU of this process, its reaped children and its live descendants."""
+    total = time.process_time()
+    reaped = resource.getrusage(resource.RUSAGE_CHILDREN)
+    total += reaped.ru_utime + reaped.ru_stime
+    for pid in descendants(os.getpid()):
+        try:
+            fields = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # utime and stime, in clock ticks
+        total += (int(fields[11]) + int(fields[12])) / TICKS
+    return total
+
+
+async def cycle(engine, url: str, directory: Path) -> None:
+    job = unique("bench")
+    options = DownloadOptions(outtmpl=str(directory / "%(id)s.%(ext)s"), sleep_requests=0)
+    info_path = str(directory / f"{job}.json")
+    extracted = await engine.extract(job, url, options, info_path)
+    assert extracted.code == 0, extracted.stderr
+    result = await engine.download(job, url, options, lambda event: None, info_path=info_path)
+    assert result.code == 0, result.stderr
+
+
+async def measure(engine, media: MediaServer, requests: int) -> list[tuple[float, float]]:
+    """(latency, CPU seconds) per cycle, the first one included."""
+    directory = Path(tempfile.mkdtemp(prefix="svd-engines-"))
+    samples = []
+    try:
+        for _ in range(requests + 1):
+            cpu, started = cpu_seconds(), time.perf_counter()
+            await cycle(engine, media.url(unique("clip")), directory)
+            samples.append((time.perf_counter() - started, cpu_seconds() - cpu))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return samples
+
+
+async def run(requests: int, size: int) -> dict[str, list[tuple[float, float]]]:
+    media = MediaServer(size)
+    site = installed_ytdlp()
+    results = {}
+    try:
+        for name, engine in (
+            ("inprocess", InProcessEngine(workers=1)),
+            ("subprocess", SubprocessEngine(ytdlp_path=lambda: site)),
+        ):
+            engine.start()
+            try:
+                results[name] = await measure(engine, media, requests)
+            finally:
+                engine.close()
+    finally:
+        media.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--size", type=int, default=1024 * 1024, help="bytes per file")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.size))
+    print(f"{args.requests} extract + download cycles of a {args.size}-byte file per engine")
+    print(f"{'engine':<11} {'first ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'CPU ms/req':>11} {'first CPU ms':>13}")
+    for name, samples in results.items():
+        (first, first_cpu), rest = samples[0], samples[1:]
+        latencies = [latency for latency, _ in rest]
+        cpu = sum(c for _, c in rest) / len(rest)
+        print(f"{name:<11} {first * 1000:>9.0f} {percentile(latencies, 50) * 1000:>8.0f} "
+              f"{percentile(latencies, 99) * 1000:>8.0f} {cpu * 1000:>11.0f} {first_cpu * 1000:>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
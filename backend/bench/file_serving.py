@@ -0,0 +1,130 @@
+"""Throughput and server CPU per GB of file responses: RangeFileResponse vs Starlette's FileResponse.
+
+A ``--size``-byte file is served by uvicorn in its own process, from an app
+that answers every request with one response class. The client downloads
+``--total`` bytes per case and throws them away:
+
+- full: whole-file GETs, with Starlette's ``FileResponse`` (64 KiB reads,
+  what /files-download used before) and with ``RangeFileResponse``;
+- range: single ``--range-bytes`` ranges at random offsets;
+- multi: four ranges of a quarter of that size each (multipart/byteranges).
+
+Starlette's FileResponse here ignores Range, so the ranged cases only run
+for RangeFileResponse. CPU is the server process's only.
+
+    python -m backend.bench.file_serving [--size 268435456] [--total 1073741824]
+"""
+import argparse
+import contextlib
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+from backend.bench.common import ROOT, free_port, tree_cpu_seconds
+
+
+def app():
+    """ASGI app for ``uvicorn --factory``: serves BENCH_FILE with BENCH_RESPONSE."""
+    from starlette.responses import FileResponse
+
+    from backend.delivery import RangeFileResponse
+
+    path = os.environ["BENCH_FILE"]
+    response = RangeFileResponse if os.environ["BENCH_RESPONSE"] == "range" else FileResponse
+
+    async def serve(scope, receive, send):
+        await response(path)(scope, receive, send)
+
+    return serve
+
+
+@contextlib.contextmanager
+def server(path: Path, response: str):
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.bench.file_serving:app", "--factory", "--lifespan", "off",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, "BENCH_FILE": str(path), "BENCH_RESPONSE": response},
+    )
+    try:
+        started = time.perf_counter()
+        while True:
+            try:
+                httpx.head(base, timeout=1)
+                break
+            except httpx.HTTPError:
+                if proc.poll() is not None or time.perf_counter() - started > 30:
+                    raise RuntimeError("uvicorn did not start")
+                time.sleep(0.05)
+        yield proc, base
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def fetch(client: httpx.Client, headers: dict[str, str], status: int) -> int:
+    received = 0
+    with client.stream("GET", "/", headers=headers) as response:
+        assert response.status_code == status, response.status_code
+        for chunk in response.iter_raw(1024 * 1024):
+            received += len(chunk)
+    return received
+
+
+def run(path: Path, response: str, case: str, total: int, range_bytes: int) -> tuple[float, float, int]:
+    """MB/s, server CPU seconds per GB and requests made."""
+    size = path.stat().st_size
+    rng = random.Random(0)
+
+    def request() -> tuple[dict[str, str], int]:
+        if case == "full":
+            return {}, 200
+        if case == "range":
+            start = rng.randrange(size - range_bytes)
+            return {"Range": f"bytes={start}-{start + range_bytes - 1}"}, 206
+        part = range_bytes // 4
+        # Ranges far enough apart not to be merged
+        starts = sorted(rng.sample(range(0, size - part, 2 * part), 4))
+        return {"Range": "bytes=" + ",".join(f"{s}-{s + part - 1}" for s in starts)}, 206
+
+    with server(path, response) as (proc, base), httpx.Client(base_url=base, timeout=60) as client:
+        fetch(client, *request())
+        received, requests = 0, 0
+        cpu, started = tree_cpu_seconds(proc.pid), time.perf_counter()
+        while received < total:
+            received += fetch(client, *request())
+            requests += 1
+        elapsed, cpu = time.perf_counter() - started, tree_cpu_seconds(proc.pid) - cpu
+    return received / elapsed / 1e6, cpu / (received / 1e9), requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=256 * 1024 * 1024, help="bytes in the served file")
+    parser.add_argument("--total", type=int, default=1024 * 1024 * 1024, help="bytes downloaded per case")
+    parser.add_argument("--range-bytes", type=int, default=4 * 1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile(prefix="svd-serve-", suffix=".mp4") as f:
+        for _ in range(0, args.size, 1024 * 1024):
+            f.write(os.urandom(1024 * 1024))
+        f.flush()
+        path = Path(f.name)
+        print(f"{args.size / 2**20:.0f} MiB file, {args.total / 2**30:g} GiB per case, "
+              f"{args.range_bytes / 2**20:g} MiB ranges, loopback")
+        print(f"{'response':<18} {'case':<6} {'MB/s':>7} {'CPU s/GB':>9} {'requests':>9}")
+        for response, case in (("starlette", "full"), ("range", "full"), ("range", "range"), ("range", "multi")):
+            speed, cpu, requests = run(path, response, case, args.total, args.range_bytes)
+            label = "FileResponse" if response == "starlette" else "RangeFileResponse"
+            print(f"{label:<18} {case:<6} {speed:>7.0f} {cpu:>9.2f} {requests:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""HLS download time with fragments fetched one at a time vs in parallel.
+
+A local media server serves ``--segments`` segments of ``--segment-bytes``
+as an HLS playlist. Each request waits ``--latency`` seconds before it is
+answered, and each connection is held to ``--bandwidth`` bytes/s. For each
+``DOWNLOAD_FRAGMENTS`` setting, a fresh app process runs ``--downloads``
+blocking POST /download requests, one after another. 1 is yt-dlp's own
+default.
+
+    python -m backend.bench.fragments [--engine subprocess] [--fragments 1 4 8]
+"""
+import argparse
+import time
+
+import httpx
+
+from backend.bench.common import serving
+from backend.tests.stubs import MediaServer, unique
+
+
+def run(media: MediaServer, engine: str, fragments: int, downloads: int) -> tuple[float, float, int, int]:
+    """Fastest and slowest download in seconds, requests per download and peak requests in flight."""
+    env = {"YTDLP_ENGINE": engine, "DOWNLOAD_FRAGMENTS": str(fragments)}
+    durations, names = [], []
+    with serving(env) as (_, base, _):
+        for i in range(downloads + 1):
+            name = unique("hls")
+            media.peak_active = 0
+            started = time.perf_counter()
+            httpx.post(f"{base}/download", json={"url": media.hls_url(name)}, timeout=600).raise_for_status()
+            # The first one includes worker start-up
+            if i:
+                durations.append(time.perf_counter() - started)
+                names.append(name)
+    requests = sum(n for path, n in media.hits.items() if any(f"/{name}" in path for name in names))
+    return min(durations), max(durations), requests // downloads, media.peak_active
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engine", default="inprocess", choices=("inprocess", "subprocess"))
+    parser.add_argument("--segments", type=int, default=60)
+    parser.add_argument("--segment-bytes", type=int, default=256 * 1024)
+    parser.add_argument("--latency", type=float, default=0.04, help="seconds before each response")
+    parser.add_argument("--bandwidth", type=int, default=4 * 1024 * 1024, help="bytes/s per connection")
+    parser.add_argument("--fragments", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--downloads", type=int, default=2, help="downloads per setting")
+    args = parser.parse_args()
+
+    media = MediaServer(args.segments * args.segment_bytes, args.bandwidth, args.segment_bytes, args.latency)
+    try:
+        print(f"engine={args.engine}: {args.segments} x {args.segment_bytes // 1024} KiB segments, "
+              f"{args.latency * 1000:.0f} ms latency, {args.bandwidth / 2**20:g} MiB/s per connection")
+        print(f"{'fragments':>9} {'seconds':>11} {'requests':>9} {'in flight':>10}")
+        for fragments in args.fragments:
+            fastest, slowest, requests, peak = run(media, args.engine, fragments, args.downloads)
+            print(f"{fragments:>9} {fastest:>5.2f}-{slowest:<5.2f} {requests:>9} {peak:>10}")
+    finally:
+        media.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""/healthz latency while downloads run.
+
+Samples /healthz on an idle server, then while ``--downloads`` blocking
+POST /download requests fetch files from a local, bandwidth-limited media
+server, and prints the latency percentiles of both phases. A flat p99
+means downloads never hold up the event loop.
+
+    python -m backend.bench.healthz_load [--engine subprocess] [--downloads 20]
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from backend.bench.common import percentile, serving
+from backend.tests.stubs import MediaServer, unique
+
+
+def sample(base: str, stop: threading.Event, interval: float) -> list[float]:
+    latencies = []
+    with httpx.Client(base_url=base, timeout=30) as client:
+        while not stop.is_set():
+            started = time.perf_counter()
+            client.get("/healthz").raise_for_status()
+            latencies.append(time.perf_counter() - started)
+            stop.wait(interval)
+    return latencies
+
+
+def download(base: str, url: str, i: int) -> float:
+    started = time.perf_counter()
+    # One address per download so the per-client queue limit does not apply
+    response = httpx.post(
+        f"{base}/download", json={"url": url}, headers={"X-Forwarded-For": f"198.51.100.{i}"}, timeout=600
+    )
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+def run(
+    engine: str = "inprocess",
+    downloads: int = 20,
+    size: int = 8 * 1024 * 1024,
+    bandwidth: int = 2 * 1024 * 1024,
+    idle_seconds: float = 5,
+    interval: float = 0.02,
+    segmented: bool = False,
+) -> tuple[list[float], list[float], list[float]]:
+    """Returns the idle and loaded /healthz latencies and the download durations, in seconds."""
+    media = MediaServer(size, bandwidth)
+    env = {
+        "YTDLP_ENGINE": engine,
+        "JOB_MAX_RUNNING": str(downloads),
+        "JOB_CONCURRENCY": str(downloads),
+        "YTDLP_WORKERS": str(downloads),
+        "SEGMENTED_CONNECTIONS": "4" if segmented else "1",
+        "SEGMENTED_MIN_BYTES": "0",
+    }
+    try:
+        with serving(env) as (_, base, _):
+            # Warm up: first request, worker start-up
+            download(base, media.url(unique("warmup")), 0)
+            stop = threading.Event()
+            timer = threading.Timer(idle_seconds, stop.set)
+            timer.start()
+            idle = sample(base, stop, interval)
+
+            stop.clear()
+            with ThreadPoolExecutor(downloads + 1) as pool:
+                loaded = pool.submit(sample, base, stop, interval)
+                try:
+                    durations = list(pool.map(
+                        lambda i: download(base, media.url(unique(f"load{i}")), i), range(1, downloads + 1)
+                    ))
+                finally:
+                    stop.set()
+                return idle, loaded.result(), durations
+    finally:
+        media.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engine", default="inprocess", choices=("inprocess", "subprocess"))
+    parser.add_argument("--downloads", type=int, default=20)
+    parser.add_argument("--size", type=int, default=8 * 1024 * 1024, help="bytes per file")
+    parser.add_argument("--bandwidth", type=int, default=2 * 1024 * 1024, help="bytes/s per connection")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+    parser.add_argument("--interval", type=float, default=0.02, help="seconds between /healthz samples")
+    parser.add_argument("--segmented", action="store_true", help="let the backend fetch large files itself")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    idle, loaded, durations = run(
+        args.engine, args.downloads, args.size, args.bandwidth, args.idle_seconds, args.interval, args.segmented
+    )
+    print(f"engine={args.engine} downloads={args.downloads} size={args.size} bandwidth={args.bandwidth}/s"
+          f"{' segmented' if args.segmented else ''}")
+    print(f"{'phase':<8} {'samples':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for phase, latencies in (("idle", idle), ("loaded", loaded)):
+        print(f"{phase:<8} {len(latencies):>7} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f} {max(latencies) * 1000:>8.1f}")
+    print(f"downloads: each {min(durations):.1f}-{max(durations):.1f}s, "
+          f"run {time.perf_counter() - started:.1f}s in total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Bytes fetched from the source per quality preset, and the format each one picks.
+
+The local media server offers a 10 s video as a DASH manifest of the
+stub's ``FORMATS``: pre-muxed 360p (2.5 MB) and 720p (7 MB), video-only
+480p, 720p and 1080p (3, 6 and 14 MB) and 128k audio (0.5 MB). As on
+most sites, it gives their bitrates, not their sizes, so a size cap cannot
+rule a format out up front. Each row is one blocking POST /download with that
+``quality`` and ``max_filesize``. "fetched" counts the body bytes the media
+server sent for it, at ``--bandwidth`` bytes/s, including what a capped
+download had read by the time it was stopped.
+
+Without ffmpeg on PATH, presets that merge video and audio fall back to
+pre-muxed formats; the header says which case ran.
+
+    python -m backend.bench.presets [--engine subprocess] [--bandwidth 8388608]
+"""
+import argparse
+import shutil
+
+import httpx
+
+from backend.bench.common import serving
+from backend.formats import PRESETS
+from backend.tests.stubs import MediaServer, unique
+
+CAPPED = [("720p", 5_000_000), ("best", 1_000_000)]
+
+
+def run(base: str, media: MediaServer, quality: str, max_filesize: int | None) -> tuple[int, str, int]:
+    """Status of /download, the formats it fetched and bytes the media server sent."""
+    name = unique("presets")
+    body = {"url": media.formats_url(name), "quality": quality}
+    if max_filesize:
+        body["max_filesize"] = max_filesize
+    response = httpx.post(f"{base}/download", json=body, timeout=600)
+    fetched = {path.rsplit("/", 1)[1].removesuffix(".m4s"): n
+               for path, n in media.sent.items() if path.startswith(f"/formats/{name}/")}
+    return response.status_code, "+".join(sorted(fetched, reverse=True)) or "-", sum(fetched.values())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--engine", default="inprocess", choices=("inprocess", "subprocess"))
+    parser.add_argument("--bandwidth", type=int, default=8 * 1024 * 1024, help="bytes/s per connection")
+    args = parser.parse_args()
+
+    media = MediaServer(max(size for _, _, size in MediaServer.FORMATS.values()), args.bandwidth)
+    try:
+        with serving({"YTDLP_ENGINE": args.engine}) as (_, base, _):
+            print(f"engine={args.engine}, ffmpeg {'found' if shutil.which('ffmpeg') else 'not found'}, "
+                  f"{args.bandwidth / 2**20:g} MiB/s per connection")
+            print(f"{'preset':<14} {'status':>6} {'formats':<12} {'fetched MB':>10}")
+            for quality, max_filesize in [(q, None) for q in PRESETS] + CAPPED:
+                status, fetched, size = run(base, media, quality, max_filesize)
+                label = quality + (f" <= {max_filesize / 1e6:g} MB" if max_filesize else "")
+                print(f"{label:<14} {status:>6} {fetched:<12} {size / 1e6:>10.2f}")
+    finally:
+        media.close()
+
+
+if __name__ == "__main__":
+    main()
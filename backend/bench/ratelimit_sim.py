@@ -0,0 +1,154 @@
+"""Throughput of the adaptive rate limiter against the old fixed pace, on a fake upstream.
+
+The fake upstream allows ``--allow`` requests per minute (burst 5) and, once
+it has turned away more than 8 requests within a minute, blocks the client
+for two minutes: roughly how Instagram and TikTok treat a server IP.
+``--workers`` job slots run jobs of 3 upstream requests each, for
+``--minutes`` simulated minutes that pass ``--scale`` times faster than real
+ones:
+
+- fixed: what download_video did before, ``--sleep-requests 1`` and a 429
+  fails the job;
+- adaptive: job starts paced by ``AdaptiveLimiter`` (the app's default
+  settings), its ``--sleep-requests``, and ``RATE_LIMIT_RETRIES`` retries of
+  a rate-limited job.
+
+    python -m backend.bench.ratelimit_sim [--minutes 10]
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+
+from backend.ratelimit import AdaptiveLimiter
+
+REQUESTS_PER_JOB = 3
+RETRIES = 2
+# Simulated seconds between one job ending and the worker's next one starting
+JOB_GAP = 1
+
+
+class Upstream:
+    """Token bucket per client IP with a temporary block for clients that keep pushing."""
+
+    def __init__(self, per_minute: float, scale: float, burst: int = 5, strikes: int = 8, block: float = 120) -> None:
+        self._rate = per_minute / 60
+        self._scale = scale
+        self._burst = burst
+        self._strikes = strikes
+        self._block = block
+        self._tokens = float(burst)
+        self._updated = self.now()
+        self._rejected: list[float] = []
+        self._blocked_until = 0.0
+        self.served = 0
+        self.refused = 0
+        self.blocked_seconds = 0.0
+
+    def now(self) -> float:
+        """Simulated seconds."""
+        return time.monotonic() * self._scale
+
+    def request(self) -> bool:
+        now = self.now()
+        self._tokens = min(self._burst, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+        if now >= self._blocked_until and self._tokens >= 1:
+            self._tokens -= 1
+            self.served += 1
+            return True
+        self.refused += 1
+        self._rejected = [t for t in self._rejected if now - t < 60] + [now]
+        if len(self._rejected) > self._strikes and now >= self._blocked_until:
+            self._blocked_until = now + self._block
+            self.blocked_seconds += self._block
+        return False
+
+
+@dataclass
+class Outcome:
+    policy: str
+    minutes: float
+    upstream: Upstream
+    jobs: int = 0
+    failed: int = 0
+
+    @property
+    def per_minute(self) -> float:
+        return self.jobs / self.minutes
+
+
+async def _job(upstream: Upstream, sleep: float, scale: float) -> bool:
+    for request in range(REQUESTS_PER_JOB):
+        if request:
+            await asyncio.sleep(sleep / scale)
+        if not upstream.request():
+            return False
+    return True
+
+
+async def _fixed(upstream: Upstream, outcome: Outcome, until: float, scale: float) -> None:
+    while upstream.now() < until:
+        if await _job(upstream, 1, scale):
+            outcome.jobs += 1
+        else:
+            outcome.failed += 1
+        await asyncio.sleep(JOB_GAP / scale)
+
+
+async def _adaptive(upstream: Upstream, outcome: Outcome, until: float, scale: float, limiter: AdaptiveLimiter) -> None:
+    while upstream.now() < until:
+        for _ in range(RETRIES + 1):
+            await limiter.acquire("tiktok", None)
+            if upstream.now() >= until:
+                return
+            if await _job(upstream, limiter.sleep_requests("tiktok", None), scale):
+                limiter.success("tiktok", None)
+                outcome.jobs += 1
+                break
+            limiter.rate_limited("tiktok", None)
+        else:
+            outcome.failed += 1
+        await asyncio.sleep(JOB_GAP / scale)
+
+
+async def simulate(policy: str, minutes: float = 10, workers: int = 4, allow: float = 20, scale: float = 60) -> Outcome:
+    """Run ``policy`` ("fixed" or "adaptive") against a fresh upstream."""
+    upstream = Upstream(allow, scale)
+    outcome = Outcome(policy, minutes, upstream)
+    until = upstream.now() + minutes * 60
+    if policy == "fixed":
+        runners = [_fixed(upstream, outcome, until, scale) for _ in range(workers)]
+    else:
+        # The app's defaults, in rates per real minute of the sped-up clock
+        limiter = AdaptiveLimiter(
+            per_minute=30 * scale,
+            min_per_minute=2 * scale,
+            max_per_minute=120 * scale,
+            recover_per_minute=1 * scale,
+            cooldown=30 / scale,
+        )
+        runners = [_adaptive(upstream, outcome, until, scale, limiter) for _ in range(workers)]
+    await asyncio.gather(*runners)
+    return outcome
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--minutes", type=float, default=10, help="simulated minutes per policy")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--allow", type=float, default=20, help="upstream requests per minute")
+    parser.add_argument("--scale", type=float, default=60, help="simulated seconds per real second")
+    args = parser.parse_args()
+
+    print(f"{args.workers} workers, {REQUESTS_PER_JOB} requests per job, upstream allows {args.allow:g}/min, "
+          f"{args.minutes:g} simulated minutes")
+    print(f"{'policy':<9} {'jobs/min':>9} {'failed':>7} {'429s':>6} {'blocked min':>12}")
+    for policy in ("fixed", "adaptive"):
+        outcome = asyncio.run(simulate(policy, args.minutes, args.workers, args.allow, args.scale))
+        print(f"{policy:<9} {outcome.per_minute:>9.1f} {outcome.failed:>7} {outcome.upstream.refused:>6} "
+              f"{outcome.upstream.blocked_seconds / 60:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
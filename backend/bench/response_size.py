@@ -0,0 +1,93 @@
+"""Size and render time of a /download response: the old payload with yt-dlp's output vs the slim one.
+
+Fixtures are recorded first: ``python -m yt_dlp --print-json --newline
+--progress``, the info dict and every progress line, runs against three
+sources on the local media server (a progressive file, a 60-segment HLS
+stream and a DASH manifest with 9 representations of 1500 fragments
+each), and its stdout and stderr are kept. For each fixture:
+
+- old: the payload /download returned before, with that stdout and stderr,
+  rendered the way FastAPI did (``jsonable_encoder`` + ``JSONResponse``);
+- new: the same result validated as ``DownloadResponse`` and rendered with
+  the app's default response class (orjson when installed).
+
+    python -m backend.bench.response_size [--renders 200]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="svd-bench-"))
+os.environ.setdefault("JOB_STORE", "memory")
+os.environ.setdefault("YTDLP_UPDATE_INTERVAL_HOURS", "0")
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from backend import main as app  # noqa: E402
+from backend.tests.stubs import MediaServer, unique  # noqa: E402
+
+
+def record(url: str, directory: str) -> tuple[str, str]:
+    """stdout and stderr of a ``--print-json`` download of ``url``."""
+    proc = subprocess.run(
+        [sys.executable, "-m", "yt_dlp", "--print-json", "--newline", "--progress", "-o",
+         os.path.join(directory, "%(id)s.%(ext)s"), url],
+        capture_output=True, text=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr)
+    return proc.stdout, proc.stderr
+
+
+def payloads(stdout: str, stderr: str) -> tuple[dict, dict]:
+    name = "0123456789abcdef.mp4"
+    common = {
+        "job_id": "0" * 32,
+        "download_url": app.signer.sign("files", name),
+        "force_download_url": app.signer.sign("files-download", name),
+        "platform": None,
+    }
+    old = {**common, "stdout": stdout, "stderr": stderr}
+    new = {**common, "log_url": f"/jobs/{'0' * 32}/log", "title": "fixture", "ext": "mp4", "filesize": 983040}
+    return old, new
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--renders", type=int, default=200, help="renders per timing run, best of 5")
+    args = parser.parse_args()
+
+    media = MediaServer(60 * 16 * 1024, segment_bytes=16 * 1024)
+    fixtures = {
+        "progressive": media.url(unique("progressive")),
+        "hls-60seg": media.hls_url(unique("hls")),
+        "dash-9x1500": media.dash_url(unique("dash"), representations=10, fragments=1500),
+    }
+    try:
+        with tempfile.TemporaryDirectory(prefix="svd-fixtures-") as directory:
+            recorded = {name: record(url, directory) for name, url in fixtures.items()}
+    finally:
+        media.close()
+
+    def render_old(payload):
+        return JSONResponse(jsonable_encoder(payload)).body
+
+    def render_new(payload):
+        return app.DefaultResponse(jsonable_encoder(app.DownloadResponse.model_validate(payload))).body
+
+    print(f"{'fixture':<13} {'old bytes':>10} {'old ms':>8} {'new bytes':>10} {'new ms':>8}")
+    for name, (stdout, stderr) in recorded.items():
+        old, new = payloads(stdout, stderr)
+        row = []
+        for render, payload in ((render_old, old), (render_new, new)):
+            best = min(timeit.repeat(lambda: render(payload), number=args.renders, repeat=5)) / args.renders
+            row += [len(render(payload)), best * 1000]
+        print(f"{name:<13} {row[0]:>10} {row[1]:>8.3f} {row[2]:>10} {row[3]:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Peak RSS of the API process while many jobs run at once.
+
+``--jobs`` blocking POST /download requests run together. Each extracts and
+downloads a DASH manifest from the local media server whose info dict is
+about 1.6 MB, because every representation lists its fragments. yt-dlp runs
+through the subprocess engine by default, so whatever it prints passes
+through the API process. The table shows that process's RSS after a warm-up
+job and its peak (VmHWM) once all jobs are done. yt-dlp's own processes
+are not counted.
+
+With ``--before REV`` the tree at that revision is measured as well, e.g.
+the parent of the commit that replaced ``--print-json`` with ``--print``
+result lines.
+
+    python -m backend.bench.rss_jobs [--jobs 50] [--before <rev>]
+"""
+import argparse
+import contextlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import httpx
+
+from backend.bench.cold_start import checkout
+from backend.bench.common import ROOT, serving
+from backend.tests.stubs import MediaServer, unique
+
+
+def memory(pid: int) -> dict[str, int]:
+    """VmRSS and VmHWM of ``pid``, in bytes."""
+    fields = {}
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        name, _, value = line.partition(":")
+        if name in ("VmRSS", "VmHWM"):
+            fields[name] = int(value.split()[0]) * 1024
+    return fields
+
+
+def download(base: str, url: str, i: int) -> None:
+    # One address per job so the per-client queue limit does not apply
+    response = httpx.post(
+        f"{base}/download", json={"url": url}, headers={"X-Forwarded-For": f"198.51.100.{i}"}, timeout=600
+    )
+    if response.is_error:
+        raise RuntimeError(f"{response.status_code}: {response.text[:500]}")
+
+
+def run(root: Path, media: MediaServer, engine: str, jobs: int) -> tuple[int, int, float]:
+    """RSS after warm-up, peak RSS, and seconds for all jobs."""
+    env = {
+        "YTDLP_ENGINE": engine,
+        "YTDLP_WORKERS": "2",
+        "JOB_MAX_RUNNING": str(jobs),
+        "JOB_CONCURRENCY": str(jobs),
+        "JOB_MAX_QUEUED": str(jobs),
+        # 50 extractions share the CPU; this measures memory, not deadlines
+        "EXTRACT_TIMEOUT_SECONDS": "900",
+    }
+    with serving(env, root=root) as (proc, base, _):
+        download(base, media.dash_url(unique("warmup")), 0)
+        before = memory(proc.pid)["VmRSS"]
+        started = time.perf_counter()
+        with ThreadPoolExecutor(jobs) as pool:
+            list(pool.map(lambda i: download(base, media.dash_url(unique("dash")), i), range(1, jobs + 1)))
+        return before, memory(proc.pid)["VmHWM"], time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--jobs", type=int, default=50)
+    parser.add_argument("--engine", default="subprocess", choices=("inprocess", "subprocess"))
+    parser.add_argument("--before", help="git revision to compare against")
+    args = parser.parse_args()
+
+    media = MediaServer(256 * 1024)
+    try:
+        with contextlib.ExitStack() as stack:
+            trees = {"this tree": ROOT}
+            if args.before:
+                trees[args.before] = stack.enter_context(checkout(args.before))
+                # The stub needs no cookies, and older trees let concurrent
+                # CLI runs rewrite the one shared cookie file
+                (trees[args.before] / "cookies.txt").unlink(missing_ok=True)
+            print(f"{args.jobs} concurrent DASH jobs, {args.engine} engine")
+            print(f"{'tree':<12} {'start MiB':>10} {'peak MiB':>9} {'seconds':>8}")
+            for name, root in trees.items():
+                before, peak, seconds = run(root, media, args.engine, args.jobs)
+                print(f"{name[:12]:<12} {before / 2**20:>10.0f} {peak / 2**20:>9.0f} {seconds:>8.1f}")
+    finally:
+        media.close()
+
+
+if __name__ == "__main__":
+    main()
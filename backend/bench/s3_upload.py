@@ -0,0 +1,145 @@
+"""Time to publish and memory of S3 multipart uploads, while downloading vs after.
+
+A fake download writes ``--size`` bytes at ``--rate`` bytes/s. The object
+goes to moto's S3 server, run in its own process so that its memory is
+not counted here. Each concurrency setting runs two ways:
+
+- after: upload the finished file, as a plain upload would;
+- while: ``MultipartUpload.follow`` uploads full parts as the file grows,
+  and ``complete`` sends only the tail.
+
+"publish s" is the time from the end of the download until the object
+exists. "peak MiB" is this process's peak RSS above its level before the
+run, which is roughly ``concurrency * part_size`` of part buffers.
+
+    python -m backend.bench.s3_upload [--size 134217728] [--concurrency 1 4]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+from backend.bench.common import free_port
+from backend.storage import MIN_PART_SIZE, S3Storage
+
+
+@contextlib.contextmanager
+def moto_server():
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        started = time.perf_counter()
+        while True:
+            try:
+                httpx.get(url, timeout=1)
+                break
+            except httpx.HTTPError:
+                if proc.poll() is not None or time.perf_counter() - started > 30:
+                    raise RuntimeError("moto's server did not start")
+                time.sleep(0.05)
+        yield url
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def rss() -> int:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class PeakRss:
+    """Samples this process's RSS every ``interval`` seconds until closed."""
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.base = self.peak = rss()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def _sample(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.peak = max(self.peak, rss())
+
+    def close(self) -> int:
+        self._stop.set()
+        self._thread.join()
+        return self.peak - self.base
+
+
+async def fake_download(path: Path, size: int, rate: float, chunk: int = 1024 * 1024) -> None:
+    data = os.urandom(chunk)
+    started = time.perf_counter()
+    with open(path, "wb") as f:
+        for written in range(0, size, chunk):
+            f.write(data[:min(chunk, size - written)])
+            f.flush()
+            lag = (written + chunk) / rate - (time.perf_counter() - started)
+            if lag > 0:
+                await asyncio.sleep(lag)
+
+
+async def run(storage: S3Storage, directory: Path, size: int, rate: float, tail: bool) -> tuple[float, int]:
+    """Seconds from the end of the download to the published object, and peak RSS growth in bytes."""
+    path = directory / f"{os.urandom(4).hex()}.mp4"
+    upload = storage.begin(path.name)
+    memory = PeakRss()
+    finished = False
+    follower = None
+    if tail:
+        follower = asyncio.create_task(upload.follow(lambda: path if path.exists() else None, lambda: finished, 0.05))
+    await fake_download(path, size, rate)
+    started = time.perf_counter()
+    finished = True
+    if follower is not None:
+        await follower
+    if not await upload.complete(path):
+        raise RuntimeError("upload failed")
+    elapsed = time.perf_counter() - started
+    path.unlink()
+    return elapsed, memory.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=128 * 1024 * 1024, help="bytes per file")
+    parser.add_argument("--rate", type=float, default=32 * 1024 * 1024, help="download speed, bytes/s")
+    parser.add_argument("--part-size", type=int, default=8 * 1024 * 1024)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+
+    for name, value in (("AWS_ACCESS_KEY_ID", "bench"), ("AWS_SECRET_ACCESS_KEY", "bench")):
+        os.environ.setdefault(name, value)
+    directory = Path(tempfile.mkdtemp(prefix="svd-s3-"))
+    try:
+        with moto_server() as endpoint:
+            print(f"{args.size / 2**20:.0f} MiB downloaded at {args.rate / 2**20:g} MiB/s, "
+                  f"{max(MIN_PART_SIZE, args.part_size) / 2**20:g} MiB parts, moto at {endpoint}")
+            print(f"{'upload':<7} {'concurrency':>11} {'publish s':>10} {'MiB/s':>7} {'peak MiB':>9}")
+            for concurrency in args.concurrency:
+                storage = S3Storage("bench", endpoint_url=endpoint, region="us-east-1",
+                                    part_size=args.part_size, concurrency=concurrency)
+                storage._client.create_bucket(Bucket="bench")
+                for label, tail in (("after", False), ("while", True)):
+                    seconds, peak = asyncio.run(run(storage, directory, args.size, args.rate, tail))
+                    # While downloading, only the tail is left once the download ends
+                    speed = f"{args.size / 2**20 / seconds:>7.0f}" if not tail else f"{'-':>7}"
+                    print(f"{label:<7} {concurrency:>11} {seconds:>10.2f} {speed} {peak / 2**20:>9.0f}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Throughput and server CPU per GB of segmented downloads against yt-dlp's single stream.
+
+Runs ``--downloads`` POST /download requests, one after another, for a
+``--size``-byte file on a local media server that holds each connection to
+``--bandwidth`` bytes/s, as throttling CDNs do. Each setting gets a fresh
+server process:
+
+- single: ``SEGMENTED_CONNECTIONS=1``, the file goes through yt-dlp's HttpFD;
+- N connections: the segmented fetcher with N workers;
+- no ranges: 4 connections against a server that ignores Range, which must
+  fall back to one stream at the single-stream speed.
+
+CPU is that of the app's process tree (uvicorn and the engine workers),
+not of the media server, and includes each job's extraction; requests are
+upstream requests per download, the extraction's included.
+
+    python -m backend.bench.segmented [--size 67108864] [--connections 4 8]
+"""
+import argparse
+import time
+
+import httpx
+
+from backend.bench.common import serving, tree_cpu_seconds
+from backend.tests.stubs import MediaServer, unique
+
+
+def download(base: str, url: str) -> None:
+    httpx.post(f"{base}/download", json={"url": url}, timeout=600).raise_for_status()
+
+
+def run(media: MediaServer, connections: int, downloads: int, ranged: bool = True) -> tuple[float, float, int]:
+    """Seconds per download, CPU seconds per GB and upstream requests per download."""
+    env = {
+        "SEGMENTED_CONNECTIONS": str(connections),
+        "SEGMENTED_MIN_BYTES": "0",
+    }
+    with serving(env) as (proc, base, _):
+        # Worker start-up and imports are not part of a download
+        download(base, media.url(unique("warmup"), ranged))
+        names = [unique("segmented") for _ in range(downloads)]
+        cpu, started = tree_cpu_seconds(proc.pid), time.perf_counter()
+        for name in names:
+            download(base, media.url(name, ranged))
+        elapsed, cpu = time.perf_counter() - started, tree_cpu_seconds(proc.pid) - cpu
+    requests = sum(n for path, n in media.hits.items() if any(f"/{name}." in path for name in names))
+    return elapsed / downloads, cpu / (len(media.data) * downloads / 1e9), requests // downloads
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=64 * 1024 * 1024, help="bytes per file")
+    parser.add_argument("--bandwidth", type=int, default=4 * 1024 * 1024, help="bytes/s per connection")
+    parser.add_argument("--downloads", type=int, default=2, help="downloads per setting")
+    parser.add_argument("--connections", type=int, nargs="+", default=[4, 8])
+    args = parser.parse_args()
+
+    media = MediaServer(args.size, args.bandwidth)
+    try:
+        print(f"{args.downloads} downloads of {args.size / 2**20:.0f} MiB per setting, "
+              f"{args.bandwidth / 2**20:g} MiB/s per connection")
+        print(f"{'setting':<16} {'s/download':>11} {'MiB/s':>7} {'CPU s/GB':>9} {'requests':>9}")
+        settings = [("single", 1, True)]
+        settings += [(f"{n} connections", n, True) for n in args.connections]
+        settings += [("no ranges", 4, False)]
+        for label, connections, ranged in settings:
+            seconds, cpu, requests = run(media, connections, args.downloads, ranged)
+            print(f"{label:<16} {seconds:>11.1f} {args.size / 2**20 / seconds:>7.1f} {cpu:>9.2f} {requests:>9}")
+    finally:
+        media.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Content-addressed storage for finished downloads.
+
+A finished file is stored once under ``<blob id>.<ext>`` where the blob id
+hashes ``extractor:id:format``, so different videos sharing a title no
+longer overwrite each other and one video fetched through different URLs
+is kept once. Every job (and every file access) holds a reference; a blob
+is deleted only when its last reference is released.
+
+Changes mark the index dirty; ``run`` writes it at most every
+``save_interval`` seconds, off the event loop, and ``flush`` on shutdown.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any
+
+
+def blob_id_for(extractor: str, media_id: str, format_id: str | None) -> str:
+    raw = f"{extractor}:{media_id}:{format_id or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BlobStore:
+    def __init__(self, root: Path, index_path: Path, verify_content: bool = False, save_interval: float = 5.0) -> None:
+        self.root = root
+        self.incoming = root / ".incoming"
+        self._index_path = index_path
+        self._save_interval = save_interval
+        self._dirty = False
+        self.verify_content = verify_content
+        self._blobs: dict[str, dict[str, Any]] = {}
+        self._by_name: dict[str, str] = {}
+        self._by_content: dict[str, str] = {}
+        self._ref_blob: dict[str, str] = {}
+        self._bytes = 0
+        self.dedup_hits = 0
+        self.deleted = 0
+
+    def load(self) -> None:
+        try:
+            self._blobs = json.loads(self._index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self._blobs = {}
+        for blob_id, blob in list(self._blobs.items()):
+            if not (self.root / blob["name"]).exists():
+                del self._blobs[blob_id]
+                continue
+            self._by_name[blob["name"]] = blob_id
+            self._bytes += blob["size"]
+            for ref in blob["refs"]:
+                self._ref_blob[ref] = blob_id
+            if blob.get("sha256"):
+                self._by_content[blob["sha256"]] = blob_id
+
+    def _write(self, data: str) -> None:
+        self._index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._index_path.with_suffix(".tmp")
+        tmp.write_text(data, encoding="utf-8")
+        os.replace(tmp, self._index_path)
+
+    def _mark_dirty(self) -> None:
+        self._dirty = True
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self._save_interval)
+            if not self._dirty:
+                continue
+            self._dirty = False
+            # Serialized here, so the thread never sees the index mid-change
+            data = json.dumps(self._blobs)
+            try:
+                await asyncio.to_thread(self._write, data)
+            except Exception as e:
+                self._dirty = True
+                print(f"Could not save the blob index: {e}")
+
+    def flush(self) -> None:
+        if self._dirty:
+            self._write(json.dumps(self._blobs))
+            self._dirty = False
+
+    def incoming_dir(self, job_id: str) -> Path:
+        path = self.incoming / job_id
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def discard_incoming(self, job_id: str) -> None:
+        shutil.rmtree(self.incoming / job_id, ignore_errors=True)
+
+    @staticmethod
+    def id_for(info: dict[str, Any], fallback_id: str = "") -> str:
+        downloads = info.get("requested_downloads") or [{}]
+        format_id = downloads[0].get("format_id") or info.get("format_id")
+        return blob_id_for(info.get("extractor_key") or "generic", str(info.get("id") or fallback_id), format_id)
+
+    def ingest(self, src: Path, info: dict[str, Any], ref: str, sha: str | None = None) -> Path:
+        """Move a finished download into the store and take a reference on it.
+
+        ``sha`` is the file's content hash when ``verify_content`` is on; files
+        with identical content are then stored once even across media ids.
+        """
+        blob_id = self.id_for(info, src.stem)
+        existing = self._blobs.get(blob_id)
+        if existing is None and sha and sha in self._by_content:
+            blob_id = self._by_content[sha]
+            existing = self._blobs[blob_id]
+        if existing is not None and (self.root / existing["name"]).exists():
+            self.dedup_hits += 1
+            src.unlink(missing_ok=True)
+        else:
+            ext = src.suffix.lstrip(".") or info.get("ext") or "bin"
+            name = f"{blob_id}.{ext}"
+            os.replace(src, self.root / name)
+            existing = self._blobs[blob_id] = {
+                "name": name,
+                "title": info.get("title") or blob_id,
+                "ext": ext,
+                "size": (self.root / name).stat().st_size,
+                "sha256": sha,
+                "created_at": time.time(),
+                "last_access": time.time(),
+                "refs": [],
+            }
+            self._by_name[name] = blob_id
+            self._bytes += existing["size"]
+            if sha:
+                self._by_content[sha] = blob_id
+        self._add_ref(blob_id, ref)
+        self._mark_dirty()
+        return self.root / existing["name"]
+
+    def _add_ref(self, blob_id: str, ref: str) -> bool:
+        refs = self._blobs[blob_id]["refs"]
+        if ref in refs:
+            return False
+        refs.append(ref)
+        self._ref_blob[ref] = blob_id
+        return True
+
+    def acquire(self, name: str, ref: str) -> bool:
+        blob_id = self._by_name.get(name)
+        if blob_id is None:
+            return False
+        self._blobs[blob_id]["last_access"] = time.time()
+        if self._add_ref(blob_id, ref):
+            self._mark_dirty()
+        return True
+
+    def release(self, ref: str) -> dict[str, Any] | None:
+        """Drop a reference; returns the blob if that deleted it."""
+        blob_id = self._ref_blob.pop(ref, None)
+        blob = self._blobs.get(blob_id or "")
+        if blob is None:
+            return None
+        if ref in blob["refs"]:
+            blob["refs"].remove(ref)
+        deleted = not blob["refs"]
+        if deleted:
+            self._delete(blob_id)
+        self._mark_dirty()
+        return blob if deleted else None
+
+    def mark_remote(self, name: str) -> None:
+        """Record that the blob was also published to object storage."""
+        blob = self.lookup(name)
+        if blob is not None:
+            blob["remote"] = True
+            self._mark_dirty()
+
+    def least_recent(self) -> list[str]:
+        """Blob ids, least recently served first."""
+        return sorted(self._blobs, key=lambda b: self._blobs[b].get("last_access", self._blobs[b]["created_at"]))
+
+    def evict(self, blob_id: str) -> int:
+        """Delete a blob regardless of its references; returns the bytes freed."""
+        blob = self._blobs.get(blob_id)
+        if blob is None:
+            return 0
+        for ref in blob["refs"]:
+            self._ref_blob.pop(ref, None)
+        self._delete(blob_id)
+        self._mark_dirty()
+        return blob["size"]
+
+    @property
+    def bytes(self) -> int:
+        return self._bytes
+
+    def _delete(self, blob_id: str) -> None:
+        blob = self._blobs.pop(blob_id)
+        self._by_name.pop(blob["name"], None)
+        self._bytes -= blob["size"]
+        if blob.get("sha256"):
+            self._by_content.pop(blob["sha256"], None)
+        try:
+            (self.root / blob["name"]).unlink()
+        except OSError:
+            pass
+        self.deleted += 1
+
+    def lookup(self, name: str) -> dict[str, Any] | None:
+        return self._blobs.get(self._by_name.get(name, ""))
+
+    def refs(self) -> list[str]:
+        return list(self._ref_blob)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "blobs": len(self._blobs),
+            "bytes": self._bytes,
+            "refs": len(self._ref_blob),
+            "dedup_hits": self.dedup_hits,
+            "deleted": self.deleted,
+        }
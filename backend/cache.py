@@ -0,0 +1,103 @@
+"""Media metadata cache.
+
+URLs are canonicalised to an ``(extractor, id)`` key so the many spellings
+of one post (tracking params, ``/reel/`` vs ``/p/``, mobile hosts, ...)
+share an entry. Entries hold the slimmed info dict and the downloaded file.
+"""
+import json
+import re
+import time
+from collections import OrderedDict
+from typing import Any
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+# Same ids yt-dlp's extractors use, so keys derived from the URL line up with
+# keys derived from an info dict (extractor_key, id).
+_ID_PATTERNS: list[tuple[str, re.Pattern[str]]] = [
+    ("Instagram", re.compile(r"instagram\.com/(?:[^/?#]+/)?(?:p|tv|reels?)/(?P<id>[^/?#&]+)")),
+    ("TikTok", re.compile(r"tiktok\.com/(?:@[^/?#]+/video|v|embed(?:/v2)?)/(?P<id>\d+)")),
+    ("Facebook", re.compile(r"facebook\.com/(?:[^?#]+/)?(?:videos|reel)/(?:[^/?#]+/)?(?P<id>\d+)")),
+    ("Facebook", re.compile(r"facebook\.com/(?:watch/?\?(?:.*&)?v=|video\.php\?(?:.*&)?v=)(?P<id>\d+)")),
+]
+
+# Query parameters that never change which media a URL points at
+_TRACKING_PARAMS = {"igsh", "igshid", "utm_source", "utm_medium", "utm_campaign", "utm_content",
+                    "utm_term", "fbclid", "mibextid", "is_from_webapp", "sender_device", "_r", "_t"}
+
+
+def canonical_key(url: str) -> str:
+    url = url.strip()
+    for extractor, pattern in _ID_PATTERNS:
+        m = pattern.search(url)
+        if m:
+            return f"{extractor}:{m.group('id')}"
+    # Unknown layout: normalise the URL itself.
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    for prefix in ("www.", "m.", "mobile."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+        if k.lower() not in _TRACKING_PARAMS
+    )
+    return f"url:{host}{parsed.path.rstrip('/')}" + (f"?{urlencode(query)}" if query else "")
+
+
+def info_key(info: dict[str, Any]) -> str | None:
+    extractor, media_id = info.get("extractor_key"), info.get("id")
+    return f"{extractor}:{media_id}" if extractor and media_id else None
+
+
+class InfoCache:
+    """LRU cache bounded by the serialized size of its entries, with a TTL."""
+
+    def __init__(self, max_bytes: int, ttl: float) -> None:
+        self._max_bytes = max_bytes
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, int, dict[str, Any]]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.time():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: str, value: dict[str, Any]) -> None:
+        size = len(json.dumps(value, default=str))
+        if size > self._max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.time() + self._ttl, size, value)
+        self._bytes += size
+        while self._bytes > self._max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def discard(self, key: str) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,244 @@
+"""File responses with HTTP range and conditional request support.
+
+``RangeFileResponse`` answers ``Range`` (single and multiple ranges),
+``If-Range``, ``If-None-Match`` and ``If-Modified-Since``. Bytes are handed to
+the server with the ASGI ``http.response.zerocopysend`` extension when it is
+offered (the kernel's sendfile), and read in large ``pread`` chunks otherwise.
+Behind nginx, ``accel_redirect`` skips Python entirely: the response only
+names the file and nginx serves it, ranges included, with sendfile.
+
+``TailResponse`` streams a file that is still being written.
+"""
+import os
+import secrets
+import stat
+from email.utils import parsedate_to_datetime
+from typing import Callable
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+# More ranges than this are answered with the whole file (RFC 9110 14.2)
+MAX_RANGES = 16
+
+Range = tuple[int, int]  # inclusive start, exclusive end
+
+
+def parse_range(header: str, size: int) -> list[Range] | None:
+    """Satisfiable ranges of a ``Range`` header, sorted and merged.
+
+    Returns None when the header is invalid and must be ignored, and an empty
+    list when it is valid but no range overlaps the file (416).
+    """
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes" or not specs.strip():
+        return None
+    ranges: list[Range] = []
+    for spec in specs.split(","):
+        start_s, sep, end_s = spec.strip().partition("-")
+        start_s, end_s = start_s.strip(), end_s.strip()
+        if not sep or not (start_s.isdigit() or (not start_s and end_s.isdigit())):
+            return None
+        if end_s and not end_s.isdigit():
+            return None
+        if not start_s:
+            suffix = int(end_s)
+            if suffix > 0 and size > 0:
+                ranges.append((max(0, size - suffix), size))
+            continue
+        start = int(start_s)
+        if end_s and int(end_s) < start:
+            return None
+        end = int(end_s) + 1 if end_s else size
+        if start < size:
+            ranges.append((start, min(end, size)))
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged: list[Range] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def pread(fd: int, n: int, pos: int) -> bytes:
+    if hasattr(os, "pread"):
+        return os.pread(fd, n, pos)
+    # Windows: each response has its own descriptor, so seeking is safe
+    os.lseek(fd, pos, os.SEEK_SET)
+    return os.read(fd, n)
+
+
+def _http_date(value: str) -> float | None:
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class RangeFileResponse(FileResponse):
+    chunk_size = 1024 * 1024
+
+    def __init__(self, *args, accel_redirect: str | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.accel_redirect = accel_redirect
+
+    def _not_modified(self, request: Headers, mtime: float) -> bool:
+        etag = self.headers["etag"]
+        if "if-none-match" in request:
+            tags = [t.strip().removeprefix("W/") for t in request["if-none-match"].split(",")]
+            return "*" in tags or etag in tags
+        since = _http_date(request.get("if-modified-since", ""))
+        return since is not None and int(mtime) <= since
+
+    def _range_applies(self, request: Headers, mtime: float) -> bool:
+        if_range = request.get("if-range")
+        if if_range is None:
+            return True
+        if if_range.startswith(('"', "W/")):
+            # Ranges are only valid against a strong validator
+            return if_range == self.headers["etag"]
+        return _http_date(if_range) == int(mtime)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.stat_result is None:
+            try:
+                self.stat_result = await anyio.to_thread.run_sync(os.stat, self.path)
+            except FileNotFoundError:
+                raise RuntimeError(f"File at path {self.path} does not exist.")
+            if not stat.S_ISREG(self.stat_result.st_mode):
+                raise RuntimeError(f"File at path {self.path} is not a file.")
+            self.set_stat_headers(self.stat_result)
+        size, mtime = self.stat_result.st_size, self.stat_result.st_mtime
+        self.headers["accept-ranges"] = "bytes"
+        request = Headers(scope=scope)
+        method = scope["method"].upper()
+
+        if method in ("GET", "HEAD") and self._not_modified(request, mtime):
+            await self._respond(send, 304, {}, b"")
+            return
+
+        if self.accel_redirect:
+            # nginx serves the body (and any Range) from its own location
+            self.headers["x-accel-redirect"] = self.accel_redirect
+            del self.headers["content-length"]
+            await self._respond(send, 200, {}, b"")
+            return
+
+        ranges = None
+        if method == "GET" and "range" in request and self._range_applies(request, mtime):
+            ranges = parse_range(request["range"], size)
+        if ranges is None:
+            await self._send(scope, send, 200, {}, [(0, size)], method)
+        elif not ranges:
+            await self._respond(send, 416, {"content-range": f"bytes */{size}", "content-length": "0"}, b"")
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            headers = {"content-range": f"bytes {start}-{end - 1}/{size}", "content-length": str(end - start)}
+            await self._send(scope, send, 206, headers, ranges, method)
+        else:
+            await self._send_multipart(scope, send, ranges, size, method)
+        if self.background is not None:
+            await self.background()
+
+    def _raw_headers(self, status: int, extra: dict[str, str]) -> list[tuple[bytes, bytes]]:
+        headers = dict(self.headers)
+        if status == 304:
+            # RFC 9110 15.4.5: only validators and caching headers
+            headers = {k: v for k, v in headers.items() if k in ("etag", "last-modified", "cache-control", "vary")}
+        headers.update(extra)
+        return [(k.encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+    async def _respond(self, send: Send, status: int, extra: dict[str, str], body: bytes) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": self._raw_headers(status, extra)})
+        await send({"type": "http.response.body", "body": body, "more_body": False})
+
+    async def _send(
+        self, scope: Scope, send: Send, status: int, extra: dict[str, str], ranges: list[Range], method: str
+    ) -> None:
+        await send({"type": "http.response.start", "status": status, "headers": self._raw_headers(status, extra)})
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if status == 200 and "http.response.pathsend" in scope.get("extensions", {}):
+            await send({"type": "http.response.pathsend", "path": str(self.path)})
+            return
+        await self._send_ranges(scope, send, [(None, r) for r in ranges], b"")
+
+    async def _send_multipart(
+        self, scope: Scope, send: Send, ranges: list[Range], size: int, method: str
+    ) -> None:
+        boundary = secrets.token_hex(16)
+        content_type = self.media_type or "application/octet-stream"
+        parts = [
+            (
+                f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+            ).encode("latin-1")
+            for start, end in ranges
+        ]
+        # Every part after the first starts on a new line
+        parts = [parts[0]] + [b"\r\n" + p for p in parts[1:]]
+        closing = f"\r\n--{boundary}--\r\n".encode("latin-1")
+        length = sum(len(p) for p in parts) + sum(end - start for start, end in ranges) + len(closing)
+        extra = {
+            "content-type": f"multipart/byteranges; boundary={boundary}",
+            "content-length": str(length),
+        }
+        await send({"type": "http.response.start", "status": 206, "headers": self._raw_headers(206, extra)})
+        if method == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await self._send_ranges(scope, send, list(zip(parts, ranges)), closing)
+
+    async def _send_ranges(
+        self, scope: Scope, send: Send, parts: list[tuple[bytes | None, Range]], trailer: bytes
+    ) -> None:
+        zerocopy = "http.response.zerocopysend" in scope.get("extensions", {})
+        fd = await anyio.to_thread.run_sync(os.open, self.path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            for prefix, (start, end) in parts:
+                if prefix:
+                    await send({"type": "http.response.body", "body": prefix, "more_body": True})
+                if zerocopy:
+                    await send({
+                        "type": "http.response.zerocopysend",
+                        "file": fd,
+                        "offset": start,
+                        "count": end - start,
+                        "more_body": True,
+                    })
+                    continue
+                pos = start
+                while pos < end:
+                    chunk = await anyio.to_thread.run_sync(pread, fd, min(self.chunk_size, end - pos), pos)
+                    if not chunk:
+                        break
+                    pos += len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+            await send({"type": "http.response.body", "body": trailer, "more_body": False})
+        finally:
+            os.close(fd)
+
+
+class TailResponse(StreamingResponse):
+    """Streams its body and finishes the response only if ``complete()`` says so.
+
+    A stream that stops early is cut off instead (the server closes the
+    connection), so clients see an incomplete download, not a short file.
+    """
+
+    def __init__(self, content, complete: Callable[[], bool], **kwargs) -> None:
+        super().__init__(content, **kwargs)
+        self.complete = complete
+
+    async def stream_response(self, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        if self.complete():
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
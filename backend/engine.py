@@ -0,0 +1,748 @@
+"""yt-dlp execution engines.
+
+``subprocess`` spawns the yt-dlp CLI for every download. ``inprocess`` runs
+``YoutubeDL`` inside a pool of long-lived worker processes that keep one
+pre-configured instance per option set (cookies, headers and proxy already
+loaded), so a download does not pay the interpreter start-up and extractor
+import cost again.
+
+Both engines split a job into ``extract`` (resolve formats and sizes, write
+the full info dict to disk) and ``download`` (fetch the formats recorded in
+that file), so callers can act on the expected size in between.
+
+Every result carries a ``Failure`` (see errors.py) when yt-dlp failed.
+
+Cancelling the awaiting task (a deadline, a cancelled job) stops yt-dlp:
+the CLI's whole process group is killed, and a worker gets a signal that
+raises inside yt-dlp, or is killed if it does not stop in time.
+"""
+import asyncio
+import collections
+import contextlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, NamedTuple
+
+from pydantic import BaseModel
+
+from . import errors, updater
+from .errors import Failure
+from .progress import PROGRESS_TEMPLATE, parse_progress_line, progress_event
+
+OnProgress = Callable[[dict[str, Any]], None]
+# Returns the directory of a staged yt-dlp (see updater.py), or None for the installed one
+PathResolver = Callable[[], str | None]
+
+# Fields of the info dict the API needs; everything else stays in the worker.
+INFO_FIELDS = (
+    "id", "title", "ext", "extractor_key", "webpage_url", "duration",
+    "format_id", "filesize", "filesize_approx", "tbr", "protocol",
+)
+DOWNLOAD_FIELDS = ("filepath", "ext", "format_id")
+FORMAT_FIELDS = ("format_id", "filesize", "filesize_approx", "tbr", "protocol")
+
+# The CLI reports results through --print templates that select just these
+# fields: one short JSON line each, instead of the whole info dict
+RESULT_PREFIX = "[result] "
+FORMATS_PREFIX = "[formats] "
+RESULT_TEMPLATE = RESULT_PREFIX + "%(.{" + ",".join((*INFO_FIELDS, "filepath")) + "})j"
+FORMATS_TEMPLATE = FORMATS_PREFIX + "%(requested_formats.:.{" + ",".join(FORMAT_FIELDS) + "})j"
+# Lines of other output kept per run, for error messages
+OUTPUT_TAIL_LINES = 200
+
+
+class DownloadOptions(BaseModel):
+    outtmpl: str
+    headers: dict[str, str] = {}
+    cookie_file: str | None = None
+    proxy: str | None = None
+    sleep_requests: float = 1
+    retries: int = 3
+    # Format selection (see formats.py); None keeps yt-dlp's default
+    format: str | None = None
+    format_sort: list[str] = []
+    max_filesize: int | None = None
+    # Download tuning (see profiles.py); None leaves yt-dlp's default
+    concurrent_fragments: int = 1
+    http_chunk_size: int | None = None
+    buffer_size: int | None = None
+
+
+class EngineResult(NamedTuple):
+    code: int
+    info: dict[str, Any] | None
+    stdout: str
+    stderr: str
+    # Set when yt-dlp failed, or skipped the file as too large
+    error: Failure | None = None
+
+
+def slim_info(info: dict[str, Any]) -> dict[str, Any]:
+    slim = {k: info.get(k) for k in INFO_FIELDS if info.get(k) is not None}
+    slim["requested_downloads"] = [
+        {k: d.get(k) for k in DOWNLOAD_FIELDS if d.get(k) is not None}
+        for d in info.get("requested_downloads") or []
+    ]
+    # Merged formats (video+audio) carry their sizes per component
+    slim["requested_formats"] = [
+        {k: f.get(k) for k in FORMAT_FIELDS if f.get(k) is not None}
+        for f in info.get("requested_formats") or []
+    ]
+    return slim
+
+
+class SubprocessEngine:
+    name = "subprocess"
+
+    def __init__(self, line_limit: int = 1024 * 1024, ytdlp_path: PathResolver | None = None) -> None:
+        self._line_limit = line_limit
+        self._ytdlp_path = ytdlp_path or (lambda: None)
+
+    def start(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    def _base(self, opts: DownloadOptions, staged: bool) -> list[str]:
+        cmd: list[str] = [
+            *([sys.executable, "-m", "yt_dlp"] if staged else ["yt-dlp"]),
+            "--no-playlist",
+            "--restrict-filenames",
+            "--windows-filenames",
+        ]
+        for name, value in opts.headers.items():
+            cmd.extend(["--add-header", f"{name}: {value}"])
+        cmd.extend([
+            "--sleep-requests",
+            str(opts.sleep_requests),
+            "--retries",
+            str(opts.retries),
+            "--ignore-config",
+        ])
+        if opts.cookie_file:
+            cmd.extend(["--cookies", opts.cookie_file])
+        if opts.proxy:
+            cmd.extend(["--proxy", opts.proxy])
+        if opts.format:
+            cmd.extend(["-f", opts.format])
+        if opts.format_sort:
+            cmd.extend(["-S", ",".join(opts.format_sort)])
+        if opts.max_filesize:
+            cmd.extend(["--max-filesize", str(opts.max_filesize)])
+        return cmd
+
+    def extract_command(
+        self, url: str, opts: DownloadOptions, staged: bool = False, source: str | None = None, info_path: str = ""
+    ) -> list[str]:
+        # ``source``: an info file from an earlier extraction to select formats from
+        return [
+            *self._base(opts, staged),
+            "--skip-download",
+            # yt-dlp writes the full info dict itself; only the slim fields come back over stdout
+            "--print-to-file",
+            "%()j",
+            info_path,
+            "--print",
+            RESULT_TEMPLATE,
+            "--print",
+            FORMATS_TEMPLATE,
+            *(["--load-info-json", source] if source else [url]),
+        ]
+
+    def command(self, url: str, opts: DownloadOptions, staged: bool = False, info_path: str | None = None) -> list[str]:
+        return [
+            *self._base(opts, staged),
+            "--newline",
+            # Printed once the file has its final name
+            "--print",
+            "after_move:" + RESULT_TEMPLATE,
+            "--print",
+            "after_move:" + FORMATS_TEMPLATE,
+            # --print implies --quiet; keep yt-dlp's log (it alone reports a
+            # file skipped for --max-filesize) and machine-readable progress lines
+            "--no-quiet",
+            "--progress",
+            "--progress-template",
+            PROGRESS_TEMPLATE,
+            "-o",
+            opts.outtmpl,
+            "--concurrent-fragments",
+            str(opts.concurrent_fragments),
+            *(["--http-chunk-size", str(opts.http_chunk_size)] if opts.http_chunk_size else []),
+            *(["--buffer-size", str(opts.buffer_size)] if opts.buffer_size else []),
+            # Reuse the formats resolved by extract() instead of extracting again
+            *(["--load-info-json", info_path] if info_path else [url]),
+        ]
+
+    @contextlib.contextmanager
+    def _env(self):
+        """(staged, env) of a run; a staged yt-dlp is held in use until the run ends."""
+        path = self._ytdlp_path()
+        if not path:
+            yield False, None
+            return
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (path, env.get("PYTHONPATH")) if p)
+        with updater.hold(path) or contextlib.nullcontext():
+            yield True, env
+
+    @staticmethod
+    @contextlib.asynccontextmanager
+    async def _own_cookies(opts: DownloadOptions):
+        # yt-dlp writes its cookie jar back to --cookies when it exits, so
+        # concurrent runs sharing one file read each other's half-written
+        # copies (and the deployed file changes). Each run gets a copy.
+        if not opts.cookie_file:
+            yield opts
+            return
+        fd, copy = tempfile.mkstemp(prefix="cookies-", suffix=".txt")
+        os.close(fd)
+        try:
+            await asyncio.to_thread(shutil.copyfile, opts.cookie_file, copy)
+            yield opts.model_copy(update={"cookie_file": copy})
+        finally:
+            await asyncio.to_thread(_unlink, copy)
+
+    async def extract(
+        self, job_id: str, url: str, opts: DownloadOptions, info_path: str, source: str | None = None
+    ) -> EngineResult:
+        result: dict[str, Any] = {}
+        # --print-to-file appends
+        await asyncio.to_thread(_unlink, info_path)
+        with self._env() as (staged, env):
+            async with self._own_cookies(opts) as opts:
+                cmd = self.extract_command(url, opts, staged, source, info_path)
+                code, stdout, stderr = await self._run(cmd, lambda line: _result_line(line, result), env)
+        info = slim_info(_merged(result)) if code == 0 and "info" in result else None
+        return EngineResult(code, info, "", stderr.strip(), errors.from_output(code, "", stderr))
+
+    async def download(
+        self, job_id: str, url: str, opts: DownloadOptions, on_progress: OnProgress, info_path: str | None = None
+    ) -> EngineResult:
+        result: dict[str, Any] = {}
+
+        def on_line(line: str) -> None:
+            if _result_line(line, result):
+                return
+            event = parse_progress_line(line)
+            if event is not None:
+                on_progress(event)
+
+        with self._env() as (staged, env):
+            async with self._own_cookies(opts) as opts:
+                code, stdout, stderr = await self._run(self.command(url, opts, staged, info_path), on_line, env)
+        info = None
+        if "info" in result:
+            info = _merged(result)
+            if info.get("filepath"):
+                info["requested_downloads"] = [info]
+            info = slim_info(info)
+        return EngineResult(code, info, stdout.strip(), stderr.strip(), errors.from_output(code, stdout, stderr))
+
+    async def _run(self, cmd: list[str], on_line, env: dict[str, str] | None) -> tuple[int, str, str]:
+        # Run yt-dlp without blocking the event loop so /healthz and file streams
+        # keep being served while downloads are in flight. Output is consumed line
+        # by line so progress can be reported while the download is running.
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env,
+                limit=self._line_limit,
+                # Its own process group, so ffmpeg children can be killed with it
+                start_new_session=True,
+            )
+        except NotImplementedError:
+            # Windows selector loops (e.g. uvicorn --reload) have no subprocess
+            # support; fall back to a worker thread.
+            proc = await asyncio.to_thread(
+                subprocess.run, cmd, capture_output=True, text=True, check=False, env=env
+            )
+            tails = []
+            for text in (proc.stdout, proc.stderr):
+                lines = text.splitlines()
+                for line in lines:
+                    on_line(line)
+                tails.append("\n".join(lines[-OUTPUT_TAIL_LINES:]))
+            return proc.returncode, *tails
+        # Only the tail is kept: memory stays flat however much yt-dlp prints
+        out: collections.deque[str] = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        err: collections.deque[str] = collections.deque(maxlen=OUTPUT_TAIL_LINES)
+        try:
+            await asyncio.gather(
+                _read_lines(proc.stdout, out, on_line),
+                _read_lines(proc.stderr, err, on_line),
+            )
+            code = await proc.wait()
+        except asyncio.CancelledError:
+            _kill_group(proc)
+            await proc.wait()
+            raise
+        return code, "\n".join(out), "\n".join(err)
+
+
+def _kill_group(proc) -> None:
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def _read_lines(stream: asyncio.StreamReader, sink: collections.deque[str], on_line) -> None:
+    dropping = False
+    while True:
+        try:
+            raw = await stream.readuntil(b"\n")
+        except asyncio.IncompleteReadError as e:
+            # The output ended without a line break
+            raw = e.partial
+        except asyncio.LimitOverrunError as e:
+            # Longer than the line limit: drop what is buffered, and the rest
+            # of the line once it arrives, rather than parse a fragment of it
+            await stream.readexactly(e.consumed)
+            dropping = True
+            continue
+        if not raw:
+            return
+        if dropping:
+            dropping = False
+            continue
+        line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+        if not line.startswith((RESULT_PREFIX, FORMATS_PREFIX)):
+            sink.append(line)
+        on_line(line)
+
+
+def _result_line(line: str, result: dict[str, Any]) -> bool:
+    """Fold one ``--print`` result line into ``result``; False for any other line."""
+    for prefix, key in ((RESULT_PREFIX, "info"), (FORMATS_PREFIX, "requested_formats")):
+        if line.startswith(prefix):
+            try:
+                result[key] = json.loads(line[len(prefix):])
+            except ValueError:
+                pass
+            return True
+    return False
+
+
+def _merged(result: dict[str, Any]) -> dict[str, Any]:
+    info = dict(result["info"])
+    if isinstance(result.get("requested_formats"), list):
+        info["requested_formats"] = result["requested_formats"]
+    return info
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _signal(pid: int, signum: int) -> None:
+    try:
+        os.kill(pid, signum)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class InProcessEngine:
+    name = "inprocess"
+
+    def __init__(
+        self,
+        workers: int = 2,
+        progress_interval: float = 0.25,
+        ytdlp_path: PathResolver | None = None,
+        kill_after: float = 10.0,
+    ) -> None:
+        self._workers = max(1, workers)
+        self._ytdlp_path = ytdlp_path or (lambda: None)
+        self._executor_path: str | None = None
+        self._progress_interval = progress_interval
+        self._ctx = multiprocessing.get_context("spawn")
+        self._executor: ProcessPoolExecutor | None = None
+        self._queue = None
+        self._reader: threading.Thread | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._listeners: dict[str, OnProgress] = {}
+        # Worker pid per running job, and the flag files that mark jobs to stop
+        self._pids: dict[str, int] = {}
+        self._cancel_dir: str | None = None
+        self._kill_after = kill_after
+        # Pools broken by killing a worker on purpose; their other jobs are retried
+        self._killed_pools: set[int] = set()
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("yt_dlp") is not None
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._cancel_dir = tempfile.mkdtemp(prefix="ytdlp-cancel-")
+        self._queue = self._ctx.Queue()
+        self._reader = threading.Thread(target=self._read_progress, args=(self._queue,), daemon=True)
+        self._reader.start()
+        self._executor = self._new_executor()
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        self._executor_path = self._ytdlp_path()
+        executor = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=self._ctx,
+            initializer=_worker_init,
+            initargs=(self._queue, self._progress_interval, self._executor_path, self._cancel_dir),
+        )
+        # Warm the pool: spawn every worker and import yt_dlp up front.
+        for _ in range(self._workers):
+            executor.submit(_worker_ping)
+        return executor
+
+    def _current_executor(self) -> ProcessPoolExecutor:
+        if self._ytdlp_path() != self._executor_path:
+            # A new yt-dlp was activated: new jobs go to a fresh pool while
+            # the old one finishes the downloads it already started. Its
+            # workers hold their version until they exit (updater.hold).
+            self._executor.shutdown(wait=False)
+            self._executor = self._new_executor()
+        return self._executor
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._queue is not None:
+            self._queue.put(None)
+            self._queue = None
+        if self._cancel_dir is not None:
+            shutil.rmtree(self._cancel_dir, ignore_errors=True)
+            self._cancel_dir = None
+
+    def _read_progress(self, queue) -> None:
+        while True:
+            try:
+                item = queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            job_id, event = item
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._dispatch, job_id, event)
+
+    def _dispatch(self, job_id: str, event: dict[str, Any]) -> None:
+        if "pid" in event:
+            self._pids[job_id] = event["pid"]
+            return
+        listener = self._listeners.get(job_id)
+        if listener is not None:
+            listener(event)
+
+    def _cancel_path(self, job_id: str) -> str:
+        return os.path.join(self._cancel_dir or tempfile.gettempdir(), job_id)
+
+    async def _call(self, job_id: str, fn, *args) -> EngineResult:
+        for attempt in range(2):
+            executor = self._current_executor()
+            try:
+                future = executor.submit(fn, job_id, *args)
+                try:
+                    return EngineResult(*await asyncio.wrap_future(future))
+                except asyncio.CancelledError:
+                    await self._abort(job_id, future, executor)
+                    raise
+            except BrokenProcessPool as e:
+                # A worker died (OOM, crash); replace the pool for later jobs.
+                if self._executor is executor:
+                    self._executor = self._new_executor()
+                if id(executor) in self._killed_pools and attempt == 0:
+                    # Collateral of killing another job's worker: run it again
+                    continue
+                message = f"ERROR: yt-dlp worker crashed: {e}"
+                return EngineResult(-1, None, "", message, errors.classify(message, errors.FAILED))
+            finally:
+                self._pids.pop(job_id, None)
+                _unlink(self._cancel_path(job_id))
+
+    async def _abort(self, job_id: str, future, executor: ProcessPoolExecutor) -> None:
+        # Not started yet: wrap_future already took it off the pool's queue
+        if future.cancelled():
+            return
+        with open(self._cancel_path(job_id), "w"):
+            pass
+        deadline = time.monotonic() + self._kill_after
+        signalled = 0.0
+        while not future.done() and time.monotonic() < deadline:
+            pid = self._pids.get(job_id)
+            if pid is not None and hasattr(signal, "SIGUSR1") and time.monotonic() - signalled >= 1:
+                # Raises JobCancelled inside yt-dlp (see _on_cancel_signal)
+                signalled = time.monotonic()
+                _signal(pid, signal.SIGUSR1)
+            await asyncio.sleep(0.1)
+        pid = self._pids.get(job_id)
+        if not future.done() and pid is not None:
+            print(f"yt-dlp worker {pid} did not stop within {self._kill_after:.0f}s; killing it")
+            self._killed_pools.add(id(executor))
+            _signal(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+            if self._executor is executor:
+                self._executor = self._new_executor()
+
+    async def extract(
+        self, job_id: str, url: str, opts: DownloadOptions, info_path: str, source: str | None = None
+    ) -> EngineResult:
+        self.start()
+        return await self._call(job_id, _worker_extract, url, opts.model_dump(), info_path, source)
+
+    async def download(
+        self, job_id: str, url: str, opts: DownloadOptions, on_progress: OnProgress, info_path: str | None = None
+    ) -> EngineResult:
+        self.start()
+        self._listeners[job_id] = on_progress
+        try:
+            return await self._call(job_id, _worker_download, url, opts.model_dump(), info_path)
+        finally:
+            self._listeners.pop(job_id, None)
+
+
+def make_engine(kind: str, workers: int, line_limit: int, ytdlp_path: PathResolver | None = None):
+    kind = (kind or "").strip().lower()
+    if kind == "inprocess":
+        if InProcessEngine.available() or (ytdlp_path and ytdlp_path()):
+            return InProcessEngine(workers=workers, ytdlp_path=ytdlp_path)
+        print("yt_dlp is not importable; falling back to the subprocess engine")
+        return SubprocessEngine(line_limit=line_limit, ytdlp_path=ytdlp_path)
+    if kind == "subprocess":
+        return SubprocessEngine(line_limit=line_limit, ytdlp_path=ytdlp_path)
+    raise ValueError(f"Unknown yt-dlp engine: {kind!r}")
+
+
+# --- worker process side -------------------------------------------------
+
+_progress_queue = None
+_progress_interval = 0.25
+_cancel_dir: str | None = None
+# Keeps the staged yt-dlp this worker imports from being pruned while it lives
+_ytdlp_hold = None
+_current_job: str | None = None
+_last_progress = 0.0
+_ydl_pool: dict[str, Any] = {}
+_PER_JOB_OPTS = (
+    "outtmpl", "sleep_requests", "concurrent_fragments", "http_chunk_size", "buffer_size",
+    "format", "format_sort", "max_filesize",
+)
+
+
+class _JobLogger:
+    """Collects the tail of yt-dlp's output for the job being run."""
+
+    def __init__(self) -> None:
+        self.out: collections.deque[str] = collections.deque(maxlen=200)
+        self.err: collections.deque[str] = collections.deque(maxlen=200)
+
+    def reset(self) -> None:
+        self.out.clear()
+        self.err.clear()
+
+    def debug(self, msg: str) -> None:
+        self.out.append(msg)
+
+    def info(self, msg: str) -> None:
+        self.out.append(msg)
+
+    def warning(self, msg: str) -> None:
+        self.err.append(msg)
+
+    def error(self, msg: str) -> None:
+        self.err.append(msg)
+
+
+_logger = _JobLogger()
+
+
+class JobCancelled(BaseException):
+    # Not an Exception, so yt-dlp's own error handling lets it through
+    pass
+
+
+def _worker_init(queue, progress_interval: float, ytdlp_path: str | None, cancel_dir: str | None = None) -> None:
+    global _progress_queue, _progress_interval, _cancel_dir, _ytdlp_hold
+    _progress_queue = queue
+    _progress_interval = progress_interval
+    _cancel_dir = cancel_dir
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, _on_cancel_signal)
+    if ytdlp_path:
+        _ytdlp_hold = updater.hold(ytdlp_path)
+        sys.path.insert(0, ytdlp_path)
+    import yt_dlp  # noqa: F401  (pay the extractor import cost once per worker)
+
+
+def _cancel_requested() -> bool:
+    return bool(_cancel_dir and _current_job and os.path.exists(os.path.join(_cancel_dir, _current_job)))
+
+
+def _on_cancel_signal(signum, frame) -> None:
+    # The flag file tells a late signal for a finished job from one for the current job
+    if _cancel_requested():
+        raise JobCancelled()
+
+
+def _begin_job(job_id: str) -> None:
+    global _current_job, _last_progress
+    _current_job, _last_progress = job_id, 0.0
+    _logger.reset()
+    if _progress_queue is not None:
+        # Lets the engine signal this worker to cancel the job
+        _progress_queue.put((job_id, {"pid": os.getpid()}))
+    if _cancel_requested():
+        raise JobCancelled()
+
+
+def _worker_ping() -> bool:
+    return True
+
+
+def _progress_hook(d: dict[str, Any]) -> None:
+    global _last_progress
+    if _progress_queue is None or _current_job is None:
+        return
+    if _cancel_requested():
+        raise JobCancelled()
+    status = d.get("status")
+    now = time.monotonic()
+    if status == "downloading" and now - _last_progress < _progress_interval:
+        return
+    _last_progress = now
+    event = progress_event(
+        status,
+        d.get("downloaded_bytes"),
+        d.get("total_bytes") or d.get("total_bytes_estimate"),
+        d.get("speed"),
+        d.get("eta"),
+    )
+    _progress_queue.put((_current_job, event))
+
+
+def _get_ydl(opts: dict[str, Any]):
+    # The output template, request pacing, format choice and download
+    # tuning differ per job; they are not part of the pool key
+    key = json.dumps({k: v for k, v in opts.items() if k not in _PER_JOB_OPTS}, sort_keys=True)
+    ydl = _ydl_pool.get(key)
+    if ydl is None:
+        import yt_dlp
+
+        params: dict[str, Any] = {
+            "noplaylist": True,
+            "restrictfilenames": True,
+            "windowsfilenames": True,
+            "outtmpl": {"default": opts["outtmpl"]},
+            "http_headers": dict(opts.get("headers") or {}),
+            "sleep_interval_requests": opts.get("sleep_requests"),
+            "retries": opts.get("retries"),
+            "quiet": True,
+            "noprogress": True,
+            "logger": _logger,
+            "progress_hooks": [_progress_hook],
+        }
+        if opts.get("cookie_file"):
+            params["cookiefile"] = opts["cookie_file"]
+        if opts.get("proxy"):
+            params["proxy"] = opts["proxy"]
+        ydl = _ydl_pool[key] = yt_dlp.YoutubeDL(params)
+    ydl.params["outtmpl"]["default"] = opts["outtmpl"]
+    ydl.params["sleep_interval_requests"] = opts.get("sleep_requests")
+    ydl.params["concurrent_fragment_downloads"] = opts.get("concurrent_fragments") or 1
+    for name, param in (
+        ("http_chunk_size", "http_chunk_size"), ("buffer_size", "buffersize"),
+        ("format", "format"), ("format_sort", "format_sort"), ("max_filesize", "max_filesize"),
+    ):
+        if opts.get(name):
+            ydl.params[param] = opts[name]
+        else:
+            ydl.params.pop(param, None)
+    # YoutubeDL compiles the selector once, in __init__
+    ydl.format_selector = ydl.build_format_selector(opts["format"]) if opts.get("format") else None
+    return ydl
+
+
+def _job_result(
+    code: int, info: dict[str, Any] | None, error: Failure | None
+) -> tuple[int, dict[str, Any] | None, str, str, Failure | None]:
+    out, err = "\n".join(_logger.out), "\n".join(_logger.err)
+    # A file skipped for max_filesize is not an exception
+    return code, info, out, err, error or errors.from_output(code, out, err)
+
+
+def _worker_extract(
+    job_id: str, url: str, opts: dict[str, Any], info_path: str, source: str | None = None
+) -> tuple[int, dict[str, Any] | None, str, str, Failure | None]:
+    global _current_job
+    error = None
+    try:
+        _begin_job(job_id)
+        ydl = _get_ydl(opts)
+        if source:
+            # Select formats from an earlier extraction, without network access
+            with open(source, encoding="utf-8") as f:
+                info = ydl.process_ie_result(json.load(f), download=False)
+        else:
+            info = ydl.extract_info(url, download=False)
+        info = ydl.sanitize_info(info)
+        with open(info_path, "w", encoding="utf-8") as f:
+            json.dump(info, f)
+        code, info = 0, slim_info(info)
+    except JobCancelled:
+        code, info, error = -2, None, Failure(errors.CANCELLED, "ERROR: Cancelled", None, True)
+        _logger.error(error.message)
+    except Exception as e:
+        code, info, error = 1, None, errors.from_exception(e)
+        if not _logger.err:
+            _logger.error(error.message)
+    finally:
+        _current_job = None
+    return _job_result(code, info, error)
+
+
+def _worker_download(
+    job_id: str, url: str, opts: dict[str, Any], info_path: str | None = None
+) -> tuple[int, dict[str, Any] | None, str, str, Failure | None]:
+    global _current_job
+    error = None
+    try:
+        _begin_job(job_id)
+        ydl = _get_ydl(opts)
+        if info_path:
+            with open(info_path, encoding="utf-8") as f:
+                info = ydl.process_ie_result(json.load(f), download=True)
+        else:
+            info = ydl.extract_info(url, download=True)
+        # slim_info copies only plain fields; no need to sanitize the whole dict
+        code, info = 0, slim_info(info) if info else None
+    except JobCancelled:
+        code, info, error = -2, None, Failure(errors.CANCELLED, "ERROR: Cancelled", None, True)
+        _logger.error(error.message)
+    except Exception as e:
+        code, info, error = 1, None, errors.from_exception(e)
+        if not _logger.err:
+            _logger.error(error.message)
+    finally:
+        _current_job = None
+    return _job_result(code, info, error)
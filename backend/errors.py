@@ -0,0 +1,191 @@
+"""What went wrong in a yt-dlp run.
+
+A failed run is reduced to a ``Failure``: its kind, yt-dlp's message, the
+HTTP status behind it and whether yt-dlp expected it (a normal error
+message rather than a bug). The worker engine reads the exception itself:
+``UnsupportedError``, ``GeoRestrictedError``, ``ExtractorError.expected``
+and the status of an underlying ``HTTPError``. The CLI leaves only its
+output, so there the last ``ERROR:`` line is read; it carries the same
+message, the status as ``HTTP Error NNN`` and a bug-report request for
+unexpected errors.
+
+Failures that say the media itself is gone (``PERMANENT``) are remembered
+for a short while, so a dead link is answered without running yt-dlp.
+"""
+import collections
+import re
+import time
+from typing import NamedTuple
+
+RATE_LIMITED = "rate_limited"
+LOGIN_REQUIRED = "login_required"
+PRIVATE = "private"
+UNAVAILABLE = "unavailable"
+UNSUPPORTED = "unsupported"
+GEO_RESTRICTED = "geo_restricted"
+FORMAT_UNAVAILABLE = "format_unavailable"
+TOO_LARGE = "too_large"
+NETWORK = "network"
+CANCELLED = "cancelled"
+FAILED = "failed"
+
+# kind -> (status code, detail); a None detail passes yt-dlp's message on
+RESPONSES: dict[str, tuple[int, str | None]] = {
+    TOO_LARGE: (413, "The video is larger than max_filesize."),
+    FORMAT_UNAVAILABLE: (422, "No format matches the requested quality and size."),
+    RATE_LIMITED: (429, "Rate limited by platform. Try again later or use a new IP."),
+    LOGIN_REQUIRED: (403, "Login required. Please update cookies."),
+    PRIVATE: (403, "This video is private."),
+    UNAVAILABLE: (404, "The video is unavailable or has been removed."),
+    UNSUPPORTED: (400, "Unsupported URL."),
+    GEO_RESTRICTED: (451, "The video is not available in the server's region."),
+    NETWORK: (502, None),
+    CANCELLED: (499, "Cancelled"),
+    FAILED: (500, None),
+}
+# The media is gone or unreachable for everyone; retrying soon cannot help
+PERMANENT = frozenset({PRIVATE, UNAVAILABLE, UNSUPPORTED})
+
+_STATUS_KINDS = {404: UNAVAILABLE, 407: NETWORK, 410: UNAVAILABLE, 429: RATE_LIMITED}
+# Wording of yt-dlp's messages, checked in order: "Private video. Sign in if
+# you've been granted access" is private, not a login problem
+_MESSAGES = (
+    (TOO_LARGE, ("larger than max-filesize",)),
+    (FORMAT_UNAVAILABLE, ("requested format is not available",)),
+    (UNSUPPORTED, ("unsupported url",)),
+    (RATE_LIMITED, ("too many requests", "rate limit", "rate-limit")),
+    (GEO_RESTRICTED, ("from your location", "in your country", "geo restrict", "geo-restrict")),
+    (PRIVATE, ("private video", "video is private", "account is private")),
+    (LOGIN_REQUIRED, ("login required", "sign in", "log in", "logged-in", "registered users", "--cookies")),
+    (UNAVAILABLE, (
+        "video unavailable", "video is unavailable", "has been removed", "has been deleted",
+        "no longer available", "does not exist", "content isn't available", "content is not available",
+    )),
+    (NETWORK, (
+        "proxy", "tunnel connection failed", "connection refused", "connection reset", "timed out",
+        "network is unreachable", "name or service not known", "temporary failure in name resolution",
+        "getaddrinfo failed",
+    )),
+)
+_HTTP_STATUS = re.compile(r"HTTP Error (\d{3})")
+# yt-dlp appends this to errors it did not expect (see bug_reports_message)
+_BUG_REPORT = "please report this issue"
+
+
+class Failure(NamedTuple):
+    kind: str
+    message: str
+    status: int | None = None
+    expected: bool = False
+
+    @property
+    def permanent(self) -> bool:
+        return self.expected and self.kind in PERMANENT
+
+
+def classify(message: str, kind: str | None = None, status: int | None = None, expected: bool = False) -> Failure:
+    """The type of the exception decides first, then the HTTP status, then the wording."""
+    if kind is None and status is not None:
+        kind = _STATUS_KINDS.get(status)
+    if kind is None:
+        lower = message.lower()
+        kind = next((k for k, words in _MESSAGES if any(w in lower for w in words)), FAILED)
+    return Failure(kind, message, status, expected)
+
+
+def from_exception(e: BaseException) -> Failure:
+    """Classify an exception raised by ``YoutubeDL`` (worker side)."""
+    from yt_dlp.networking.exceptions import HTTPError, TransportError
+    from yt_dlp.utils import ExtractorError, GeoRestrictedError, UnsupportedError
+
+    kind, status, expected = None, None, False
+    for exc in _chain(e):
+        if isinstance(exc, ExtractorError):
+            expected = expected or exc.expected
+        if kind is None and isinstance(exc, UnsupportedError):
+            kind = UNSUPPORTED
+        elif kind is None and isinstance(exc, GeoRestrictedError):
+            kind = GEO_RESTRICTED
+        elif status is None and isinstance(exc, HTTPError):
+            status = exc.status
+        elif kind is None and isinstance(exc, TransportError):
+            kind = NETWORK
+    message = str(e).strip() or type(e).__name__
+    if not message.startswith("ERROR:"):
+        message = f"ERROR: {message}"
+    return classify(message, kind, status, expected)
+
+
+def _chain(e: BaseException):
+    # DownloadError and ExtractorError keep the original exception in
+    # exc_info; ExtractorError may also name a cause
+    seen: set[int] = set()
+    pending = [e]
+    while pending:
+        exc = pending.pop(0)
+        if exc is None or id(exc) in seen:
+            continue
+        seen.add(id(exc))
+        yield exc
+        exc_info = getattr(exc, "exc_info", None)
+        pending += [
+            exc_info[1] if isinstance(exc_info, tuple) and len(exc_info) > 1 else None,
+            getattr(exc, "cause", None) if isinstance(getattr(exc, "cause", None), BaseException) else None,
+            exc.__cause__,
+            exc.__context__,
+        ]
+
+
+def from_output(code: int, stdout: str, stderr: str) -> Failure | None:
+    """Classify a run from the tail of its output (CLI side); None if it succeeded."""
+    # yt-dlp skips an oversized file without failing
+    for text in (stderr, stdout):
+        if "larger than max-filesize" in text:
+            return Failure(TOO_LARGE, _last_error(text), None, True)
+    if code == 0:
+        return None
+    message = _last_error(stderr) or _last_error(stdout) or f"ERROR: yt-dlp exited with code {code}"
+    match = _HTTP_STATUS.search(message)
+    return classify(message, None, int(match.group(1)) if match else None, _BUG_REPORT not in message.lower())
+
+
+def _last_error(output: str) -> str:
+    lines = [line.strip() for line in output.splitlines() if line.strip()]
+    errors = [line for line in lines if line.startswith("ERROR:")]
+    return (errors or lines or [""])[-1]
+
+
+class ErrorStats:
+    """Outcomes of yt-dlp runs by failure kind, in total and over the last ``window`` seconds."""
+
+    def __init__(self, window: float = 300.0) -> None:
+        self._window = window
+        self._recent: collections.deque[tuple[float, str | None]] = collections.deque()
+        self.runs = 0
+        self.failures: collections.Counter[str] = collections.Counter()
+
+    def record(self, failure: Failure | None) -> None:
+        now = time.monotonic()
+        kind = failure.kind if failure is not None else None
+        self.runs += 1
+        if kind is not None:
+            self.failures[kind] += 1
+        self._recent.append((now, kind))
+        self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._recent and self._recent[0][0] < now - self._window:
+            self._recent.popleft()
+
+    def stats(self) -> dict:
+        self._trim(time.monotonic())
+        recent = collections.Counter(kind for _, kind in self._recent if kind is not None)
+        runs = len(self._recent)
+        return {
+            "runs": self.runs,
+            "failures": dict(self.failures),
+            "window_seconds": self._window,
+            "window_runs": runs,
+            # Share of the window's runs that failed with each kind
+            "rates": {kind: round(n / runs, 4) for kind, n in sorted(recent.items())},
+        }
@@ -0,0 +1,120 @@
+"""Deadline-based expiry of downloaded files.
+
+One asyncio task sleeps until the earliest deadline in a min-heap instead of
+parking a thread per file. Deadlines are persisted so a restart picks up
+where it left off.
+"""
+import asyncio
+import heapq
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable
+
+
+class ExpiryScheduler:
+    def __init__(self, on_expire: Callable[[str], None], state_path: Path, save_interval: float = 5.0) -> None:
+        self._on_expire = on_expire
+        self._state_path = state_path
+        self._save_interval = save_interval
+        self._heap: list[tuple[float, str]] = []
+        self._deadlines: dict[str, float] = {}
+        self._wake: asyncio.Event | None = None
+        self._dirty = False
+        self._last_save = 0.0
+        self._expired = 0
+
+    def load(self) -> int:
+        try:
+            data = json.loads(self._state_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return 0
+        for key, deadline in data.items():
+            self._set(key, float(deadline))
+        self._dirty = False
+        return len(data)
+
+    def _save(self, snapshot: dict[str, float]) -> None:
+        self._state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self._state_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(snapshot), encoding="utf-8")
+        os.replace(tmp, self._state_path)
+
+    def _set(self, key: str, deadline: float) -> None:
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        self._dirty = True
+        # Superseded heap entries are skipped lazily; compact if they pile up.
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = [(d, k) for k, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+        if self._wake is not None and self._heap[0] == (deadline, key):
+            self._wake.set()
+
+    def schedule(self, key: str, ttl: float) -> None:
+        """Expire ``key`` in ``ttl`` seconds unless it is already due later."""
+        deadline = time.time() + max(0.0, ttl)
+        if self._deadlines.get(key, 0.0) < deadline:
+            self._set(key, deadline)
+
+    def touch(self, key: str, ttl: float) -> None:
+        """Extend the deadline of an already scheduled key."""
+        if key in self._deadlines:
+            self.schedule(key, ttl)
+
+    def cancel(self, key: str) -> None:
+        if self._deadlines.pop(key, None) is not None:
+            self._dirty = True
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._deadlines
+
+    def stats(self) -> dict[str, float | int | None]:
+        # Drop superseded entries so the heap top is the real next deadline
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        next_in = round(max(0.0, self._heap[0][0] - time.time()), 1) if self._heap else None
+        return {"pending": len(self._deadlines), "expired": self._expired, "next_in_seconds": next_in}
+
+    def _pop_due(self, now: float) -> list[str]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if self._deadlines.get(key) == deadline:
+                del self._deadlines[key]
+                due.append(key)
+        if due:
+            self._dirty = True
+        return due
+
+    async def run(self) -> None:
+        self._wake = asyncio.Event()
+        while True:
+            self._wake.clear()
+            now = time.time()
+            for key in self._pop_due(now):
+                self._expired += 1
+                try:
+                    self._on_expire(key)
+                except Exception:
+                    pass
+            if self._dirty and now - self._last_save >= self._save_interval:
+                self._dirty = False
+                self._last_save = now
+                try:
+                    await asyncio.to_thread(self._save, dict(self._deadlines))
+                except Exception:
+                    self._dirty = True
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if self._dirty:
+                timeout = self._save_interval if timeout is None else min(timeout, self._save_interval)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=None if timeout is None else max(0.0, timeout))
+            except asyncio.TimeoutError:
+                pass
+
+    def flush(self) -> None:
+        if self._dirty:
+            self._save(dict(self._deadlines))
+            self._dirty = False
@@ -0,0 +1,100 @@
+"""Quality presets.
+
+Each preset maps to a yt-dlp format selector (``-f``) and sort order
+(``-S``). Capped presets take a pre-muxed format within the cap before
+merging separate video and audio streams, which saves a second download
+and the ffmpeg merge. ``max_filesize`` adds a size filter to every part of
+the selector; formats of unknown size still pass and are checked by the
+downloader instead.
+"""
+import re
+from typing import Any
+
+from fastapi import HTTPException
+
+# name -> (selector, sort); "{f}" marks where the size filter goes
+PRESETS: dict[str, tuple[str, tuple[str, ...]]] = {
+    # Uncapped "best" is yt-dlp's own default (None), see selector()
+    "best": ("bv*{f}+ba{f}/b{f}", ()),
+    "1080p": ("b[height<=?1080]{f}/bv*[height<=?1080]{f}+ba{f}/w{f}", ()),
+    "720p": ("b[height<=?720]{f}/bv*[height<=?720]{f}+ba{f}/w{f}", ()),
+    "480p": ("b[height<=?480]{f}/bv*[height<=?480]{f}+ba{f}/w{f}", ()),
+    "audio": ("ba{f}/b{f}", ()),
+    # Smallest first: "b" then means the smallest pre-muxed format
+    "smallest": ("b{f}/bv*{f}+ba{f}", ("+size", "+br", "+res")),
+}
+DEFAULT_PRESET = "best"
+# A format id from /info, or two joined by "+" to merge them
+_FORMAT_ID = re.compile(r"[\w.-]+(\+[\w.-]+)?")
+# Fields of each format /info lists
+LISTING_FIELDS = ("format_id", "ext", "resolution", "height", "fps", "vcodec", "acodec", "tbr", "filesize", "protocol")
+# Keys yt-dlp adds when it selects formats; dropped so a stored info dict can be selected from again
+SELECTION_KEYS = ("requested_formats", "requested_downloads", "requested_subtitles")
+
+
+def check(quality: str | None, format_id: str | None = None) -> str | None:
+    if quality is not None and quality not in PRESETS:
+        raise HTTPException(status_code=400, detail=f"Unknown quality {quality!r}; use one of {', '.join(PRESETS)}")
+    if format_id is not None and not _FORMAT_ID.fullmatch(format_id):
+        raise HTTPException(status_code=400, detail=f"Invalid format_id {format_id!r}")
+    return quality
+
+
+def selector(
+    quality: str | None, max_filesize: int | None, can_merge: bool = True, format_id: str | None = None
+) -> tuple[str | None, list[str]]:
+    """``(format, format_sort)`` for yt-dlp; ``(None, [])`` keeps yt-dlp's default.
+
+    An explicit ``format_id`` (picked from /info) wins over the preset.
+    Without ffmpeg (``can_merge=False``) alternatives that need a merge are
+    dropped, as yt-dlp's default selector does.
+    """
+    if format_id:
+        return format_id, []
+    if (quality or DEFAULT_PRESET) == DEFAULT_PRESET and max_filesize is None:
+        return None, []
+    spec, sort = PRESETS[quality or DEFAULT_PRESET]
+    if not can_merge:
+        spec = "/".join(alt for alt in spec.split("/") if "+" not in alt)
+    size = f"[filesize<=?{max_filesize}][filesize_approx<=?{max_filesize}]" if max_filesize else ""
+    return spec.format(f=size), list(sort)
+
+
+def variant(quality: str | None, max_filesize: int | None, format_id: str | None = None) -> str:
+    """Suffix that keeps jobs and cached files of different presets apart."""
+    if format_id:
+        return f"|f={format_id}" + (f"<={max_filesize}" if max_filesize else "")
+    if (quality or DEFAULT_PRESET) == DEFAULT_PRESET and max_filesize is None:
+        return ""
+    return f"|{quality or DEFAULT_PRESET}" + (f"<={max_filesize}" if max_filesize else "")
+
+
+def _size_estimate(f: dict[str, Any], duration: float | None) -> int | None:
+    size = f.get("filesize") or f.get("filesize_approx")
+    if not size and f.get("tbr") and duration:
+        size = f["tbr"] * 1000 / 8 * duration
+    return int(size) if size else None
+
+
+def listing(info: dict[str, Any]) -> dict[str, Any]:
+    """What /info returns: the media's metadata and a slim list of its formats."""
+    duration = info.get("duration")
+    listed = []
+    for f in info.get("formats") or [info]:
+        # Storyboards and other image-only "formats"
+        if f.get("protocol") == "mhtml" or (f.get("vcodec") == "none" and f.get("acodec") == "none"):
+            continue
+        entry = {k: f.get(k) for k in LISTING_FIELDS if f.get(k) is not None}
+        entry["size_estimate"] = _size_estimate(f, duration)
+        listed.append(entry)
+    return {
+        "id": info.get("id"),
+        "title": info.get("title"),
+        "duration": duration,
+        "thumbnail": info.get("thumbnail"),
+        "uploader": info.get("uploader"),
+        "extractor_key": info.get("extractor_key"),
+        "webpage_url": info.get("webpage_url"),
+        "formats": listed,
+        "presets": list(PRESETS),
+    }
@@ -0,0 +1,55 @@
+"""yt-dlp output of recent jobs, kept for debugging.
+
+API responses carry only the result. The output tail of each phase of a
+job goes to a small text file here, served by ``GET /jobs/{id}/log``, and
+is removed after ``ttl_seconds``.
+"""
+import time
+from pathlib import Path
+
+
+class JobLogs:
+    def __init__(self, directory: Path, ttl_seconds: float, prune_interval: float = 60.0) -> None:
+        self._dir = directory
+        self._ttl = ttl_seconds
+        self._prune_interval = prune_interval
+        self._last_prune = 0.0
+        self.written = 0
+        self.pruned = 0
+
+    def _path(self, job_id: str) -> Path:
+        return self._dir / f"{job_id}.log"
+
+    def append(self, job_id: str, phase: str, code: int, stdout: str, stderr: str) -> None:
+        self._dir.mkdir(parents=True, exist_ok=True)
+        with open(self._path(job_id), "a", encoding="utf-8") as f:
+            f.write(f"== {phase} (exit {code}) ==\n")
+            for name, text in (("stdout", stdout), ("stderr", stderr)):
+                if text:
+                    f.write(f"-- {name} --\n{text.rstrip()}\n")
+        self.written += 1
+        if time.monotonic() - self._last_prune >= self._prune_interval:
+            self.prune()
+
+    def read(self, job_id: str) -> str | None:
+        try:
+            return self._path(job_id).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def prune(self) -> int:
+        self._last_prune = time.monotonic()
+        cutoff = time.time() - self._ttl
+        removed = 0
+        for path in self._dir.glob("*.log"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except OSError:
+                pass
+        self.pruned += removed
+        return removed
+
+    def stats(self) -> dict[str, int]:
+        return {"written": self.written, "pruned": self.pruned}
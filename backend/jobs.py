@@ -0,0 +1,541 @@
+"""Background download jobs.
+
+A job is submitted with POST /jobs, executed under a global concurrency cap
+and per-platform caps, and polled with GET /jobs/{id}. Within a platform,
+queued jobs are taken round-robin by client so one heavy user cannot starve
+the others. Job state lives in a pluggable store so queued/running jobs are
+picked up again after a restart.
+
+Coalesced submissions share one job, so a job is only cancelled once no
+client wants it any more. Every client that submitted or followed it holds
+an interest: DELETE /jobs/{id} drops the caller's, and so does a client
+whose connections (progress stream, blocking /download, partial-file
+stream) have all been gone for ``cancel_after_disconnect`` seconds. A
+client that submitted and only polls keeps its interest, so such jobs run
+to the end.
+"""
+import asyncio
+import json
+import math
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+from fastapi import HTTPException
+from pydantic import BaseModel, Field
+
+from .metrics import DEPTH_BUCKETS, TIME_BUCKETS, Histogram
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+ERROR = "error"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, ERROR, CANCELLED)
+# Reported for cancelled jobs, as nginx does for requests the client dropped
+CANCELLED_STATUS_CODE = 499
+
+
+class Job(BaseModel):
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    url: str
+    platform: str | None = None
+    # Identity of the media being fetched; concurrent submissions with the
+    # same key share one job (single-flight)
+    key: str | None = None
+    # Who submitted it (client IP); used for fair scheduling
+    client: str | None = None
+    # Requested quality preset, exact format and size cap (see formats.py)
+    quality: str | None = None
+    format_id: str | None = None
+    max_filesize: int | None = None
+    status: str = QUEUED
+    result: dict[str, Any] | None = None
+    error: str | None = None
+    status_code: int | None = None
+    created_at: float = Field(default_factory=time.time)
+    updated_at: float = Field(default_factory=time.time)
+
+
+class JobStore:
+    def get(self, job_id: str) -> Job | None:
+        raise NotImplementedError
+
+    def save(self, job: Job) -> None:
+        raise NotImplementedError
+
+    def unfinished(self) -> list[Job]:
+        raise NotImplementedError
+
+    def prune(self, before: float) -> int:
+        """Delete finished jobs last updated before ``before``; returns how many."""
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self) -> None:
+        self._jobs: dict[str, Job] = {}
+
+    def get(self, job_id: str) -> Job | None:
+        job = self._jobs.get(job_id)
+        return job.model_copy() if job else None
+
+    def save(self, job: Job) -> None:
+        self._jobs[job.id] = job.model_copy()
+
+    def unfinished(self) -> list[Job]:
+        return [j.model_copy() for j in self._jobs.values() if j.status not in FINISHED_STATES]
+
+    def prune(self, before: float) -> int:
+        old = [j.id for j in list(self._jobs.values()) if j.status in FINISHED_STATES and j.updated_at < before]
+        for job_id in old:
+            self._jobs.pop(job_id, None)
+        return len(old)
+
+
+class SqliteJobStore(JobStore):
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated_at)")
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.model_validate_json(row[0]) if row else None
+
+    def save(self, job: Job) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, data, updated_at) VALUES (?, ?, ?, ?)",
+                (job.id, job.status, job.model_dump_json(), job.updated_at),
+            )
+
+    def unfinished(self) -> list[Job]:
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT data FROM jobs WHERE status NOT IN ({placeholders}) ORDER BY updated_at",
+                FINISHED_STATES,
+            ).fetchall()
+        return [Job.model_validate_json(r[0]) for r in rows]
+
+    def prune(self, before: float) -> int:
+        placeholders = ",".join("?" for _ in FINISHED_STATES)
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*FINISHED_STATES, before),
+            )
+        return cursor.rowcount
+
+
+def make_store(kind: str, path: Path) -> JobStore:
+    kind = (kind or "").strip().lower()
+    if kind == "memory":
+        return MemoryJobStore()
+    if kind == "sqlite":
+        return SqliteJobStore(path)
+    raise ValueError(f"Unknown job store: {kind!r}")
+
+
+def job_event(job: Job) -> dict[str, Any]:
+    """The progress-stream event describing the job's current state."""
+    if job.status == DONE:
+        return {"type": "done", "result": job.result}
+    if job.status in (ERROR, CANCELLED):
+        return {"type": "error", "error": job.error, "status_code": job.status_code}
+    return {"type": "status", "status": job.status}
+
+
+Runner = Callable[[Job], Awaitable[dict[str, Any]]]
+Notify = Callable[[str, dict[str, Any]], None]
+
+
+class JobQueue:
+    """Runs jobs under a global cap and per-platform caps.
+
+    ``concurrency`` maps a platform name to its number of concurrent jobs;
+    platforms not listed (and unknown hosts) use ``default_concurrency``.
+    At most ``max_running`` jobs run in total. Submissions beyond
+    ``max_queued`` waiting jobs (or ``max_queued_per_client`` for one client)
+    are rejected with 503 and a Retry-After estimate. Finished jobs are
+    deleted from the store ``retention`` seconds after they finished.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        runner: Runner,
+        default_concurrency: int = 2,
+        concurrency: dict[str, int] | None = None,
+        notify: Notify | None = None,
+        max_running: int = 4,
+        max_queued: int = 100,
+        max_queued_per_client: int = 10,
+        cancel_after_disconnect: float = 10,
+        retention: float = 0,
+    ) -> None:
+        self.store = store
+        self._runner = runner
+        self._notify = notify
+        self._default_concurrency = max(1, default_concurrency)
+        self._concurrency = concurrency or {}
+        self._max_running = max(1, max_running)
+        self._max_queued = max_queued
+        self._max_queued_per_client = max_queued_per_client
+        # 0 disables cancelling jobs whose clients went away
+        self._cancel_after_disconnect = cancel_after_disconnect
+        # 0 keeps finished jobs forever
+        self._retention = retention
+        # pool -> client -> job ids; both levels rotate for round-robin
+        self._pending: OrderedDict[str, OrderedDict[str, deque[str]]] = OrderedDict()
+        self._queued_at: dict[str, float] = {}
+        self._running: dict[str, int] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._done_events: dict[str, asyncio.Event] = {}
+        self._inflight: dict[str, str] = {}
+        # Runner task of each running job, and why a job is being cancelled
+        self._runners: dict[str, asyncio.Task] = {}
+        self._cancelling: dict[str, str] = {}
+        # Interested clients per job: client -> open connections (0 for one
+        # that submitted and polls), and the pending withdrawal of clients
+        # whose connections are all gone
+        self._interest: dict[str, dict[str, int]] = {}
+        self._abandon_timers: dict[str, dict[str, asyncio.TimerHandle]] = {}
+        self.coalesced = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.pruned = 0
+        self.wait_seconds = Histogram(TIME_BUCKETS)
+        self.run_seconds = Histogram(TIME_BUCKETS)
+        self.queue_depth = Histogram(DEPTH_BUCKETS)
+
+    def _pool_for(self, platform: str | None) -> str:
+        return platform or "default"
+
+    def _cap(self, pool: str) -> int:
+        return max(1, self._concurrency.get(pool, self._default_concurrency))
+
+    def queued(self, client: str | None = None) -> int:
+        if client is None:
+            return len(self._queued_at)
+        return sum(len(clients.get(client, ())) for clients in self._pending.values())
+
+    def _retry_after(self) -> int:
+        # Time for the jobs ahead to drain at the current average run time
+        per_job = self.run_seconds.mean() or 30.0
+        return max(1, min(600, math.ceil(per_job * (self.queued() + 1) / self._max_running)))
+
+    def _admit(self, client: str | None) -> None:
+        reason = None
+        if self._max_queued and self.queued() >= self._max_queued:
+            reason = "Server is busy. Try again later."
+        elif client and self._max_queued_per_client and self.queued(client) >= self._max_queued_per_client:
+            reason = "Too many downloads queued from your address. Try again later."
+        if reason:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail=reason, headers={"Retry-After": str(self._retry_after())})
+
+    def recover(self) -> int:
+        # Re-enqueue whatever was queued or running when the process stopped.
+        jobs = self.store.unfinished()
+        for job in jobs:
+            job.status = QUEUED
+            job.updated_at = time.time()
+            self.store.save(job)
+            self._enqueue(job)
+        return len(jobs)
+
+    async def prune(self) -> int:
+        if self._retention <= 0:
+            return 0
+        removed = await asyncio.to_thread(self.store.prune, time.time() - self._retention)
+        self.pruned += removed
+        return removed
+
+    async def run_retention(self, interval: float) -> None:
+        """Prune finished jobs every ``interval`` seconds."""
+        while True:
+            try:
+                await self.prune()
+            except Exception as e:
+                print(f"Could not prune finished jobs: {e}")
+            await asyncio.sleep(interval)
+
+    def _publish(self, job: Job) -> None:
+        if self._notify is not None:
+            self._notify(job.id, job_event(job))
+
+    def _enqueue(self, job: Job) -> None:
+        self._done_events.setdefault(job.id, asyncio.Event())
+        if job.key:
+            self._inflight[job.key] = job.id
+        self._publish(job)
+        pool = self._pending.setdefault(self._pool_for(job.platform), OrderedDict())
+        pool.setdefault(job.client or "", deque()).append(job.id)
+        self._queued_at[job.id] = time.monotonic()
+        self.queue_depth.observe(self.queued())
+        self._dispatch()
+
+    def submit(
+        self,
+        url: str,
+        platform: str | None,
+        key: str | None = None,
+        client: str | None = None,
+        quality: str | None = None,
+        format_id: str | None = None,
+        max_filesize: int | None = None,
+    ) -> Job:
+        if key and key in self._inflight:
+            job = self.store.get(self._inflight[key])
+            if job is not None and job.status not in FINISHED_STATES:
+                self.coalesced += 1
+                self._interest.setdefault(job.id, {}).setdefault(client or "", 0)
+                return job
+        self._admit(client)
+        job = Job(
+            url=url, platform=platform, key=key, client=client,
+            quality=quality, format_id=format_id, max_filesize=max_filesize,
+        )
+        self.store.save(job)
+        self._interest[job.id] = {client or "": 0}
+        self._enqueue(job)
+        return job
+
+    def complete(self, url: str, platform: str | None, result: dict[str, Any]) -> Job:
+        """Record a job that was answered without running (e.g. from cache)."""
+        job = Job(url=url, platform=platform, status=DONE, result=result)
+        self.store.save(job)
+        self._publish(job)
+        return job
+
+    def fail(self, url: str, platform: str | None, status_code: int, error: str) -> Job:
+        """Record a job that failed without running (e.g. a link known to be dead)."""
+        job = Job(url=url, platform=platform, status=ERROR, status_code=status_code, error=error)
+        self.store.save(job)
+        self._publish(job)
+        return job
+
+    async def withdraw(self, job_id: str, client: str | None, reason: str = "Cancelled") -> Job | None:
+        """Drop ``client``'s interest in the job; cancel it if no other client wants it."""
+        interest = self._interest.get(job_id)
+        if interest:
+            interest.pop(client or "", None)
+            timer = self._abandon_timers.get(job_id, {}).pop(client or "", None)
+            if timer is not None:
+                timer.cancel()
+            if interest:
+                return self.store.get(job_id)
+        return await self.cancel(job_id, reason)
+
+    async def cancel(self, job_id: str, reason: str = "Cancelled") -> Job | None:
+        """Stop a queued or running job; returns it once its cleanup is done."""
+        job = self.store.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            return job
+        self._cancelling[job_id] = reason
+        runner = self._runners.get(job_id)
+        if runner is not None:
+            runner.cancel()
+        elif self._dequeue(job_id):
+            self._cancelled(job)
+        # Otherwise it was dispatched and _run() sees _cancelling first
+        await self.wait(job_id)
+        return self.store.get(job_id)
+
+    def _dequeue(self, job_id: str) -> bool:
+        for pool, clients in list(self._pending.items()):
+            for client, job_ids in list(clients.items()):
+                if job_id not in job_ids:
+                    continue
+                job_ids.remove(job_id)
+                if not job_ids:
+                    del clients[client]
+                if not clients:
+                    del self._pending[pool]
+                self._queued_at.pop(job_id, None)
+                return True
+        return False
+
+    def _cancelled(self, job: Job) -> None:
+        job.status = CANCELLED
+        job.status_code = CANCELLED_STATUS_CODE
+        job.error = self._cancelling.pop(job.id, None) or "Cancelled"
+        job.updated_at = time.time()
+        self.cancelled += 1
+        self.store.save(job)
+        self._publish(job)
+        self._finish(job.id, job.key)
+
+    def attach(self, job_id: str, client: str | None = None) -> None:
+        """A client opened a connection following the job (see detach).
+
+        Only jobs still queued or running are tracked: a finished or unknown
+        job has nothing to cancel, and an entry for it would never be removed.
+        """
+        if job_id not in self._done_events:
+            return
+        key = client or ""
+        interest = self._interest.setdefault(job_id, {})
+        interest[key] = interest.get(key, 0) + 1
+        timer = self._abandon_timers.get(job_id, {}).pop(key, None)
+        if timer is not None:
+            timer.cancel()
+
+    def detach(self, job_id: str, client: str | None = None) -> None:
+        """A connection closed; once all of a client's are gone, it withdraws after a grace period."""
+        key = client or ""
+        if job_id not in self._done_events:
+            self._interest.pop(job_id, None)
+            return
+        interest = self._interest.get(job_id)
+        if interest is None or key not in interest:
+            return
+        interest[key] = max(0, interest[key] - 1)
+        if interest[key] or self._cancel_after_disconnect <= 0:
+            return
+        # The grace period covers reloads and EventSource reconnects
+        self._abandon_timers.setdefault(job_id, {})[key] = asyncio.get_running_loop().call_later(
+            self._cancel_after_disconnect, self._abandon, job_id, key
+        )
+
+    def _abandon(self, job_id: str, client: str) -> None:
+        self._abandon_timers.get(job_id, {}).pop(client, None)
+        if (self._interest.get(job_id) or {}).get(client) != 0 or job_id not in self._done_events:
+            return
+        task = asyncio.create_task(self.withdraw(job_id, client, "Cancelled: every client disconnected"))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def wait(self, job_id: str) -> Job:
+        event = self._done_events.get(job_id)
+        if event is not None:
+            await event.wait()
+        job = self.store.get(job_id)
+        if job is None:
+            raise KeyError(job_id)
+        return job
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": {pool: sum(map(len, clients.values())) for pool, clients in self._pending.items()},
+            "running": dict(self._running),
+            "clients_waiting": len({c for clients in self._pending.values() for c in clients}),
+            "inflight": len(self._inflight),
+            "coalesced": self.coalesced,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "pruned": self.pruned,
+            "watched": sum(1 for clients in self._interest.values() if any(clients.values())),
+            "queue_depth": self.queue_depth.snapshot(),
+            "wait_seconds": self.wait_seconds.snapshot(),
+            "run_seconds": self.run_seconds.snapshot(),
+        }
+
+    def _next(self) -> tuple[str, str] | None:
+        for pool in list(self._pending):
+            clients = self._pending[pool]
+            if self._running.get(pool, 0) >= self._cap(pool):
+                continue
+            # This pool and this client go to the back of the line
+            self._pending.move_to_end(pool)
+            client, job_ids = next(iter(clients.items()))
+            job_id = job_ids.popleft()
+            if job_ids:
+                clients.move_to_end(client)
+            else:
+                del clients[client]
+            if not clients:
+                del self._pending[pool]
+            return pool, job_id
+        return None
+
+    def _dispatch(self) -> None:
+        while sum(self._running.values()) < self._max_running:
+            picked = self._next()
+            if picked is None:
+                return
+            pool, job_id = picked
+            queued_at = self._queued_at.pop(job_id, None)
+            if queued_at is not None:
+                self.wait_seconds.observe(time.monotonic() - queued_at)
+            self._running[pool] = self._running.get(pool, 0) + 1
+            task = asyncio.create_task(self._slot(pool, job_id))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _slot(self, pool: str, job_id: str) -> None:
+        started = time.monotonic()
+        try:
+            await self._run(job_id)
+        finally:
+            self.run_seconds.observe(time.monotonic() - started)
+            self._running[pool] -= 1
+            self._dispatch()
+
+    async def _run(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None or job.status in FINISHED_STATES:
+            self._finish(job_id, job.key if job else None)
+            return
+        if job_id in self._cancelling:
+            self._cancelled(job)
+            return
+        job.status = RUNNING
+        job.updated_at = time.time()
+        self.store.save(job)
+        self._publish(job)
+        # The runner gets its own task so cancel() can stop it without
+        # touching this slot's bookkeeping
+        runner = self._runners[job_id] = asyncio.ensure_future(self._runner(job))
+        try:
+            job.result = await runner
+            job.status = DONE
+        except asyncio.CancelledError:
+            if job_id not in self._cancelling:
+                # Shutdown: leave the job unfinished so recover() re-queues it
+                raise
+            self._cancelled(job)
+            return
+        except HTTPException as e:
+            job.status = ERROR
+            job.status_code = e.status_code
+            job.error = e.detail if isinstance(e.detail, str) else json.dumps(e.detail)
+        except Exception as e:
+            job.status = ERROR
+            job.status_code = 500
+            job.error = str(e) or "Download failed"
+        finally:
+            self._runners.pop(job_id, None)
+        job.updated_at = time.time()
+        self.store.save(job)
+        self._publish(job)
+        self._finish(job_id, job.key)
+
+    def _finish(self, job_id: str, key: str | None = None) -> None:
+        if key and self._inflight.get(key) == job_id:
+            del self._inflight[key]
+        self._cancelling.pop(job_id, None)
+        self._interest.pop(job_id, None)
+        for timer in self._abandon_timers.pop(job_id, {}).values():
+            timer.cancel()
+        event = self._done_events.pop(job_id, None)
+        if event is not None:
+            event.set()
@@ -1,23 +1,51 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi import Request
-from pydantic import BaseModel
+from fastapi import Request, Response
+from pydantic import BaseModel, Field
 import os
 from pathlib import Path
-from fastapi.responses import FileResponse
 from fastapi.responses import JSONResponse
+from fastapi.responses import PlainTextResponse
+from fastapi.responses import RedirectResponse
+from fastapi.responses import StreamingResponse
 import time
 import base64
 import shutil
-import subprocess
+import hashlib
 import json
-from urllib.parse import urlparse
+import sys
+from urllib.parse import quote, urlparse
+import re
 import httpx
 import asyncio
+import contextlib
 
-app = FastAPI()
+from .jobs import CANCELLED, DONE, ERROR, FINISHED_STATES, Job, JobQueue, job_event, make_store
+from . import errors, formats, segmented, updater
+from .blobs import BlobStore, file_sha256
+from .cache import InfoCache, canonical_key, info_key
+from .delivery import RangeFileResponse, TailResponse
+from .engine import DownloadOptions, make_engine, slim_info
+from .errors import ErrorStats
+from .expiry import ExpiryScheduler
+from .joblogs import JobLogs
+from .profiles import DownloadProfiles
+from .progress import ProgressHub
+from .proxies import ProxyPool, parse_proxies
+from .quota import DiskQuota, estimate_size
+from .ratelimit import AdaptiveLimiter
+from .signing import UrlSigner, load_key
+from .storage import make_storage
+
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
+
+app = FastAPI(default_response_class=DefaultResponse)
 
 # CORS configuration
 origins = [
@@ -34,6 +62,42 @@ app.add_middleware(
 
 class VideoURL(BaseModel):
     url: str
+    # Preset from formats.PRESETS ("audio", "480p", "720p", "best", ...)
+    quality: str | None = None
+    # A format listed by /info; overrides quality
+    format_id: str | None = None
+    max_filesize: int | None = Field(default=None, gt=0)
+
+
+class DownloadResult(BaseModel):
+    # A job's result; yt-dlp's own output is served by /jobs/{id}/log
+    download_url: str | None = None
+    force_download_url: str | None = None
+    platform: str | None = None
+    title: str | None = None
+    ext: str | None = None
+    filesize: int | None = None
+    cached: bool = False
+
+
+class DownloadResponse(DownloadResult):
+    job_id: str
+    log_url: str
+
+
+class JobResponse(BaseModel):
+    job_id: str
+    status: str
+    url: str
+    platform: str | None = None
+    quality: str | None = None
+    format_id: str | None = None
+    max_filesize: int | None = None
+    result: DownloadResult | None = None
+    error: str | None = None
+    status_code: int | None = None
+    created_at: float
+    updated_at: float
 
 """Filesystem layout
 - BASE_DIR is the project root (mounted as /app in Docker)
@@ -46,6 +110,212 @@ DOWNLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
 # Deletion TTL (seconds) for downloaded files
 CLEANUP_TTL_SECONDS = int(os.getenv("DOWNLOAD_TTL_SECONDS", "900"))
+# Minimum time a file stays around after a /files-download hit
+FILES_DOWNLOAD_TTL_SECONDS = int(os.getenv("FILES_DOWNLOAD_TTL_SECONDS", "900"))
+
+# Server-side state (job store, ...) lives outside the publicly served downloads dir
+STATE_DIR = Path(os.getenv("STATE_DIR", str(BASE_DIR / "state")))
+
+# Job queue: "sqlite" keeps jobs across restarts, "memory" is process-local
+JOB_STORE = os.getenv("JOB_STORE", "sqlite")
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", str(STATE_DIR / "jobs.sqlite3")))
+# Finished jobs are deleted from the store this long after they finished
+# (0 = kept forever), checked every JOB_PRUNE_INTERVAL_SECONDS
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+JOB_PRUNE_INTERVAL_SECONDS = float(os.getenv("JOB_PRUNE_INTERVAL_SECONDS", "600"))
+EXPIRY_STATE_PATH = STATE_DIR / "expiry.json"
+BLOBS_INDEX_PATH = STATE_DIR / "blobs.json"
+# Also hash file contents so identical media from different ids is stored once
+BLOB_VERIFY_CONTENT = os.getenv("BLOB_VERIFY_CONTENT", "0") == "1"
+
+# Disk quota for DOWNLOAD_DIR. 0 = use the free space of the volume, minus
+# DOWNLOAD_DIR_MIN_FREE_BYTES. Least recently served files are evicted above
+# the high-water mark; jobs wait up to QUOTA_WAIT_SECONDS for space.
+DOWNLOAD_DIR_MAX_BYTES = int(os.getenv("DOWNLOAD_DIR_MAX_BYTES", "0"))
+DOWNLOAD_DIR_MIN_FREE_BYTES = int(os.getenv("DOWNLOAD_DIR_MIN_FREE_BYTES", str(256 * 1024 * 1024)))
+QUOTA_HIGH_WATER = float(os.getenv("QUOTA_HIGH_WATER", "0.9"))
+QUOTA_LOW_WATER = float(os.getenv("QUOTA_LOW_WATER", "0.75"))
+QUOTA_WAIT_SECONDS = float(os.getenv("QUOTA_WAIT_SECONDS", "60"))
+# Reserved for media whose size yt-dlp cannot predict
+QUOTA_DEFAULT_ESTIMATE_BYTES = int(os.getenv("QUOTA_DEFAULT_ESTIMATE_BYTES", str(64 * 1024 * 1024)))
+
+# Info cache keyed by canonical media id; entries are LRU-evicted by size
+INFO_CACHE_MAX_BYTES = int(os.getenv("INFO_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+INFO_CACHE_TTL_SECONDS = int(os.getenv("INFO_CACHE_TTL_SECONDS", str(CLEANUP_TTL_SECONDS)))
+info_cache = InfoCache(INFO_CACHE_MAX_BYTES, INFO_CACHE_TTL_SECONDS)
+# Links whose extraction failed for good (private, removed, unsupported) are
+# answered from here, without running yt-dlp, for NEGATIVE_CACHE_TTL_SECONDS
+NEGATIVE_CACHE_TTL_SECONDS = int(os.getenv("NEGATIVE_CACHE_TTL_SECONDS", "300"))
+failure_cache = InfoCache(1024 * 1024, NEGATIVE_CACHE_TTL_SECONDS)
+# /metrics reports failure rates per kind over this many recent seconds
+ERROR_RATE_WINDOW_SECONDS = float(os.getenv("ERROR_RATE_WINDOW_SECONDS", "300"))
+error_stats = ErrorStats(ERROR_RATE_WINDOW_SECONDS)
+# Full info dicts from /info, kept so a download that follows within
+# INFO_REUSE_SECONDS selects its format without extracting again. Media URLs
+# in them expire, so this is kept well below the platforms' URL lifetimes.
+INFO_DIR = STATE_DIR / "info"
+INFO_REUSE_SECONDS = int(os.getenv("INFO_REUSE_SECONDS", "300"))
+# Tail of yt-dlp's output per job, for GET /jobs/{id}/log
+JOB_LOG_TTL_SECONDS = int(os.getenv("JOB_LOG_TTL_SECONDS", "3600"))
+job_logs = JobLogs(STATE_DIR / "logs", JOB_LOG_TTL_SECONDS)
+# Workers per platform pool; override per platform with e.g. JOB_CONCURRENCY_TIKTOK=4
+JOB_CONCURRENCY = int(os.getenv("JOB_CONCURRENCY", "2"))
+JOB_CONCURRENCY_BY_PLATFORM = {
+    name: int(os.getenv(f"JOB_CONCURRENCY_{name.upper()}", str(JOB_CONCURRENCY)))
+    for name in ("instagram", "facebook", "tiktok", "default")
+}
+# Jobs running at once across all platforms, and how many may wait. Past the
+# limits (overall or per client IP) submissions get 503 with Retry-After.
+JOB_MAX_RUNNING = int(os.getenv("JOB_MAX_RUNNING", "4"))
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+JOB_MAX_QUEUED_PER_CLIENT = int(os.getenv("JOB_MAX_QUEUED_PER_CLIENT", "10"))
+# Proxies in front of the app that append the address they saw to
+# X-Forwarded-For (Render: 1). The client is the entry the outermost of them
+# added; anything left of it was sent by the client and is ignored. 0 = use
+# the peer address.
+TRUSTED_PROXY_COUNT = int(os.getenv("TRUSTED_PROXY_COUNT", "1"))
+# Deadlines per phase of a job (0 = none); past one yt-dlp is killed and the
+# job fails with 504. The download phase includes yt-dlp's own merging and
+# post-processors; post-processing here is hashing, ingest and upload.
+EXTRACT_TIMEOUT_SECONDS = float(os.getenv("EXTRACT_TIMEOUT_SECONDS", "120"))
+DOWNLOAD_TIMEOUT_SECONDS = float(os.getenv("DOWNLOAD_TIMEOUT_SECONDS", "3600"))
+POSTPROCESS_TIMEOUT_SECONDS = float(os.getenv("POSTPROCESS_TIMEOUT_SECONDS", "600"))
+# A job whose last connected client (progress stream, blocking /download,
+# partial-file stream) left this long ago is cancelled; 0 = never
+CANCEL_ON_DISCONNECT_SECONDS = float(os.getenv("CANCEL_ON_DISCONNECT_SECONDS", "10"))
+
+# Job starts per (platform, egress) are paced by token buckets whose rate
+# halves on upstream 429s and creeps back on success. Per-platform start
+# rates: RATE_LIMIT_<PLATFORM>_PER_MINUTE. yt-dlp's --sleep-requests scales
+# with the current rate, from RATE_LIMIT_BASE_SLEEP upwards.
+RATE_LIMIT_PER_MINUTE = float(os.getenv("RATE_LIMIT_PER_MINUTE", "30"))
+RATE_LIMIT_RETRIES = int(os.getenv("RATE_LIMIT_RETRIES", "2"))
+rate_limiter = AdaptiveLimiter(
+    per_minute=RATE_LIMIT_PER_MINUTE,
+    min_per_minute=float(os.getenv("RATE_LIMIT_MIN_PER_MINUTE", "2")),
+    max_per_minute=float(os.getenv("RATE_LIMIT_MAX_PER_MINUTE", "120")),
+    overrides={
+        name: float(os.getenv(f"RATE_LIMIT_{name.upper()}_PER_MINUTE", str(RATE_LIMIT_PER_MINUTE)))
+        for name in ("instagram", "facebook", "tiktok", "default")
+    },
+    recover_per_minute=float(os.getenv("RATE_LIMIT_RECOVER_PER_MINUTE", "1")),
+    cooldown=float(os.getenv("RATE_LIMIT_COOLDOWN_SECONDS", "30")),
+    base_sleep=float(os.getenv("RATE_LIMIT_BASE_SLEEP", "1")),
+)
+
+# Download tuning by the protocol of the chosen formats: HLS/DASH jobs fetch
+# DOWNLOAD_FRAGMENTS fragments in parallel (DOWNLOAD_FRAGMENTS_<PLATFORM>);
+# progressive files are requested in DOWNLOAD_CHUNK_BYTES ranges when set
+# (DOWNLOAD_CHUNK_BYTES_<PLATFORM>), which helps against throttling CDNs.
+DOWNLOAD_FRAGMENTS = int(os.getenv("DOWNLOAD_FRAGMENTS", "4"))
+DOWNLOAD_CHUNK_BYTES = int(os.getenv("DOWNLOAD_CHUNK_BYTES", "0"))
+download_profiles = DownloadProfiles(
+    fragments=DOWNLOAD_FRAGMENTS,
+    fragment_buffer=int(os.getenv("DOWNLOAD_FRAGMENT_BUFFER_BYTES", str(64 * 1024))),
+    chunk_bytes=DOWNLOAD_CHUNK_BYTES,
+    progressive_buffer=int(os.getenv("DOWNLOAD_BUFFER_BYTES", str(1024 * 1024))),
+    fragments_by_platform={
+        name: int(os.getenv(f"DOWNLOAD_FRAGMENTS_{name.upper()}", str(DOWNLOAD_FRAGMENTS)))
+        for name in ("instagram", "facebook", "tiktok", "default")
+    },
+    chunk_bytes_by_platform={
+        name: int(os.getenv(f"DOWNLOAD_CHUNK_BYTES_{name.upper()}", str(DOWNLOAD_CHUNK_BYTES)))
+        for name in ("instagram", "facebook", "tiktok", "default")
+    },
+)
+
+# Merging separate video and audio streams needs ffmpeg (installed in Docker)
+FFMPEG_AVAILABLE = shutil.which("ffmpeg") is not None
+
+# Large progressive HTTP(S) formats are fetched by the backend itself over
+# SEGMENTED_CONNECTIONS parallel range requests (1 disables this) instead of
+# yt-dlp's single stream; yt-dlp takes over if anything goes wrong.
+SEGMENTED_CONNECTIONS = int(os.getenv("SEGMENTED_CONNECTIONS", "4"))
+SEGMENTED_SEGMENT_BYTES = int(os.getenv("SEGMENTED_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+SEGMENTED_MIN_BYTES = int(os.getenv("SEGMENTED_MIN_BYTES", str(16 * 1024 * 1024)))
+
+# Outbound proxies: PROXY_URLS (or PROXY_POOL_FILE, one per line) lists
+# whitespace-separated proxy URLs, "direct" for the host's own address, each
+# optionally limited to platforms with a "#instagram,tiktok" suffix. The
+# single PROXY_URL is still honoured when neither is set. Proxies failing
+# PROXY_EJECT_AFTER jobs or health checks in a row are ejected for
+# PROXY_EJECT_SECONDS, doubling on each repeat.
+PROXY_URLS = os.getenv("PROXY_URLS", "")
+PROXY_POOL_FILE = os.getenv("PROXY_POOL_FILE", "")
+PROXY_HEALTH_INTERVAL_SECONDS = float(os.getenv("PROXY_HEALTH_INTERVAL_SECONDS", "60"))
+if PROXY_POOL_FILE:
+    PROXY_URLS = Path(PROXY_POOL_FILE).read_text(encoding="utf-8")
+proxy_pool = ProxyPool(
+    parse_proxies(PROXY_URLS or os.getenv("PROXY_URL", "")),
+    eject_after=int(os.getenv("PROXY_EJECT_AFTER", "3")),
+    eject_seconds=float(os.getenv("PROXY_EJECT_SECONDS", "60")),
+    max_eject_seconds=float(os.getenv("PROXY_MAX_EJECT_SECONDS", "900")),
+    sticky_seconds=float(os.getenv("PROXY_STICKY_SECONDS", "900")),
+    health_url=os.getenv("PROXY_HEALTH_URL", "https://www.gstatic.com/generate_204"),
+)
+
+# Progress events are coalesced to at most one update per interval per job
+PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", "0.5"))
+progress_hub = ProgressHub(min_interval=PROGRESS_MIN_INTERVAL)
+
+# yt-dlp engine: "inprocess" keeps warm YoutubeDL instances in worker
+# processes, "subprocess" spawns the yt-dlp CLI per download
+YTDLP_ENGINE = os.getenv("YTDLP_ENGINE", "inprocess")
+YTDLP_WORKERS = int(os.getenv("YTDLP_WORKERS", str(max(1, os.cpu_count() or 1))))
+# Max size of a single yt-dlp output line; longer lines are dropped
+YT_DLP_LINE_LIMIT = int(os.getenv("YT_DLP_LINE_LIMIT", str(1024 * 1024)))
+engine = make_engine(YTDLP_ENGINE, YTDLP_WORKERS, YT_DLP_LINE_LIMIT, ytdlp_path=updater.active_path)
+# yt-dlp updates run out of band (python -m backend.updater); this schedules
+# them in the background. Set the interval to 0 to rely on an external cron.
+YTDLP_UPDATE_INTERVAL_HOURS = float(os.getenv("YTDLP_UPDATE_INTERVAL_HOURS", "24"))
+YTDLP_UPDATE_DELAY_SECONDS = int(os.getenv("YTDLP_UPDATE_DELAY_SECONDS", "300"))
+
+# Blob names are content-derived, so a name always maps to the same bytes
+FILES_CACHE_CONTROL = os.getenv("FILES_CACHE_CONTROL", f"public, max-age={FILES_DOWNLOAD_TTL_SECONDS}")
+# Behind nginx, hand file bodies to an internal location (e.g. "/_downloads/")
+# so nginx serves them with sendfile instead of Python
+FILES_ACCEL_REDIRECT_PREFIX = os.getenv("FILES_ACCEL_REDIRECT_PREFIX", "")
+
+# "local" serves files from this instance's DOWNLOAD_DIR. "s3" also uploads
+# each finished file to an S3-compatible bucket (multipart, while yt-dlp is
+# still downloading) and links redirect there, so any replica can serve them.
+# Credentials come from the usual AWS_* variables.
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local")
+storage = make_storage(
+    STORAGE_BACKEND,
+    bucket=os.getenv("S3_BUCKET", ""),
+    prefix=os.getenv("S3_PREFIX", ""),
+    endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+    region=os.getenv("S3_REGION") or None,
+    public_base_url=os.getenv("S3_PUBLIC_BASE_URL") or None,
+    part_size=int(os.getenv("S3_PART_SIZE", str(8 * 1024 * 1024))),
+    concurrency=int(os.getenv("S3_UPLOAD_CONCURRENCY", "4")),
+) if STORAGE_BACKEND == "s3" else make_storage(STORAGE_BACKEND)
+
+# Result links are HMAC-signed /signed/... URLs with the expiry embedded.
+# Expiries are rounded up to SIGNED_URL_STEP_SECONDS so a file keeps one URL
+# for a while and edge caches can serve repeats. The unsigned /files and
+# /files-download/{name} routes stay public unless REQUIRE_SIGNED_URLS=1
+# (opt-in, so unsigned links clients already hold keep working). With object
+# storage or REPLICAS > 1 instances, URL_SIGNING_KEY is required: a generated
+# key is per instance, and the others would reject its links.
+URL_SIGNING_KEY = os.getenv("URL_SIGNING_KEY", "")
+REPLICAS = int(os.getenv("REPLICAS", "1"))
+SIGNED_URL_TTL_SECONDS = int(os.getenv("SIGNED_URL_TTL_SECONDS", str(FILES_DOWNLOAD_TTL_SECONDS)))
+SIGNED_URL_STEP_SECONDS = int(os.getenv("SIGNED_URL_STEP_SECONDS", "300"))
+REQUIRE_SIGNED_URLS = os.getenv("REQUIRE_SIGNED_URLS", "0") == "1"
+signer = UrlSigner(
+    load_key(URL_SIGNING_KEY, STATE_DIR / "url-signing.key", shared=storage.remote or REPLICAS > 1),
+    ttl=SIGNED_URL_TTL_SECONDS,
+    step=SIGNED_URL_STEP_SECONDS,
+)
+
+# /files-download/{job_id} tails the file while yt-dlp is still writing it.
+# Until the first bytes (or the finished file) are there it waits up to
+# STREAM_WAIT_SECONDS (0 = no limit), then answers 504.
+STREAM_POLL_SECONDS = float(os.getenv("STREAM_POLL_SECONDS", "0.1"))
+STREAM_WAIT_SECONDS = float(os.getenv("STREAM_WAIT_SECONDS", "300"))
+STREAM_CHUNK_BYTES = 256 * 1024
 
 # Static and templates for the simple UI
 TEMPLATES_DIR = BASE_DIR / "templates"
@@ -83,8 +353,32 @@ for _, (env_name, file_path) in COOKIES_ENV_MAP.items():
         # best-effort only
         pass
 
+class _ExpiringStaticFiles(StaticFiles):
+    # Serving a file extends its TTL, like /files-download does
+    async def get_response(self, path: str, scope):
+        if REQUIRE_SIGNED_URLS:
+            raise HTTPException(status_code=403, detail="Signed link required")
+        if path.startswith("."):
+            # in-progress downloads (.incoming/) are not public
+            raise HTTPException(status_code=404, detail="Not Found")
+        response = await super().get_response(path, scope)
+        if response.status_code < 400:
+            _touch_file(path, CLEANUP_TTL_SECONDS)
+        return response
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        # Adds Range / If-Range handling; conditional requests are answered
+        # by the response itself
+        return RangeFileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            headers={"Cache-Control": FILES_CACHE_CONTROL},
+        )
+
+
 # Serve downloaded files at /files
-app.mount("/files", StaticFiles(directory=str(DOWNLOAD_DIR)), name="files")
+app.mount("/files", _ExpiringStaticFiles(directory=str(DOWNLOAD_DIR)), name="files")
 
 
 @app.get("/healthz")
@@ -92,6 +386,30 @@ async def healthz():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "expiry": expiry.stats(),
+        "blobs": blobs.stats(),
+        "quota": quota.stats(),
+        "storage": storage.stats(),
+        "disk": _disk_usage(),
+        "info_cache": info_cache.stats(),
+        "jobs": job_queue.stats(),
+        "rate_limits": rate_limiter.stats(),
+        "download_profiles": download_profiles.stats(),
+        "proxies": proxy_pool.stats(),
+        "progress": progress_hub.stats(),
+        "job_logs": job_logs.stats(),
+        "errors": {**error_stats.stats(), "negative_cache": failure_cache.stats()},
+    }
+
+
+def _disk_usage() -> dict:
+    usage = shutil.disk_usage(DOWNLOAD_DIR)
+    return {"total_bytes": usage.total, "used_bytes": usage.used, "free_bytes": usage.free}
+
+
 @app.get("/simple")
 async def simple_page(request: Request):
     if not templates:
@@ -109,12 +427,55 @@ def _delete_file_after(path_str: str) -> None:
         pass
 
 
-def _delayed_delete(path_str: str, delay_seconds: int = 1800) -> None:
-    try:
-        time.sleep(max(0, delay_seconds))
-        _delete_file_after(path_str)
-    except Exception:
-        pass
+blobs = BlobStore(DOWNLOAD_DIR, BLOBS_INDEX_PATH, verify_content=BLOB_VERIFY_CONTENT)
+quota = DiskQuota(
+    blobs,
+    max_bytes=DOWNLOAD_DIR_MAX_BYTES,
+    min_free_bytes=DOWNLOAD_DIR_MIN_FREE_BYTES,
+    high_water=QUOTA_HIGH_WATER,
+    low_water=QUOTA_LOW_WATER,
+    wait_timeout=QUOTA_WAIT_SECONDS,
+    default_estimate=QUOTA_DEFAULT_ESTIMATE_BYTES,
+)
+
+
+def _expire(key: str) -> None:
+    # Expiry keys are either blob references (job:<id>, access:<name>) or,
+    # for files outside the blob store, plain paths.
+    if key.startswith(("job:", "access:")):
+        deleted = blobs.release(key)
+        quota.freed()
+        if deleted and deleted.get("remote"):
+            asyncio.get_running_loop().run_in_executor(None, storage.delete, deleted["name"])
+    else:
+        _delete_file_after(key)
+
+
+expiry = ExpiryScheduler(_expire, EXPIRY_STATE_PATH)
+
+
+def _touch_file(name: str, ttl: int) -> None:
+    # Hold an access reference so the blob outlives the job that fetched it
+    if blobs.acquire(name, f"access:{name}"):
+        expiry.schedule(f"access:{name}", ttl)
+    else:
+        expiry.touch(str(DOWNLOAD_DIR / name), ttl)
+
+
+def _adopt_untracked_files() -> None:
+    # References and files written before a crash (or before this scheduler
+    # existed) get a deadline so they cannot leak.
+    for ref in blobs.refs():
+        if ref not in expiry:
+            expiry.schedule(ref, CLEANUP_TTL_SECONDS)
+    shutil.rmtree(blobs.incoming, ignore_errors=True)
+    for p in DOWNLOAD_DIR.iterdir():
+        if p.is_file() and p.name not in blobs and str(p) not in expiry:
+            try:
+                age = time.time() - p.stat().st_mtime
+            except OSError:
+                continue
+            expiry.schedule(str(p), CLEANUP_TTL_SECONDS - age)
 
 
 def _detect_platform(url: str) -> str | None:
@@ -142,32 +503,201 @@ def _cookie_path_for(platform: str) -> Path | None:
     return path if path and path.exists() else None
 
 
-def _update_yt_dlp() -> None:
+def _result_payload(final_path: Path | None, platform: str | None, info: dict | None = None) -> dict:
     try:
-        subprocess.run(
-            ["python", "-m", "pip", "install", "--upgrade", "yt-dlp"],
-            check=False,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-    except Exception:
+        size = final_path.stat().st_size if final_path else None
+    except OSError:
+        size = None
+    exists = size is not None
+    info = info or {}
+    return DownloadResult(
+        download_url=signer.sign("files", final_path.name) if exists else None,
+        force_download_url=signer.sign("files-download", final_path.name) if exists else None,
+        platform=platform,
+        title=info.get("title"),
+        ext=info.get("ext"),
+        filesize=size,
+    ).model_dump()
+
+
+def _cached_result(url: str, platform: str | None, variant: str = "") -> dict | None:
+    # A repeat submission whose file is still on disk is answered from the
+    # cache without invoking yt-dlp at all. Each preset caches its own file.
+    entry = info_cache.get(canonical_key(url) + variant)
+    if not entry or not entry.get("filepath"):
+        return None
+    final_path = Path(entry["filepath"])
+    if not final_path.exists():
+        return None
+    _touch_file(final_path.name, CLEANUP_TTL_SECONDS)
+    return {**_result_payload(final_path, platform, entry.get("info")), "cached": True}
+
+
+def _remember(url: str, info: dict | None, final_path: Path | None, variant: str = "") -> None:
+    if not info or not final_path:
+        return
+    entry = {"info": slim_info(info), "filepath": str(final_path)}
+    info_cache.put(canonical_key(url) + variant, entry)
+    key = info_key(info)
+    if key and key != canonical_key(url):
+        info_cache.put(key + variant, entry)
+
+
+def _info_path(url: str) -> Path:
+    return INFO_DIR / (hashlib.sha1(canonical_key(url).encode("utf-8")).hexdigest() + ".json")
+
+
+def _stored_info(url: str) -> Path | None:
+    path = _info_path(url)
+    try:
+        if time.time() - path.stat().st_mtime < INFO_REUSE_SECONDS:
+            return path
+    except OSError:
         pass
+    return None
 
 
-# Update yt-dlp in the background during startup
-try:
-    _update_yt_dlp()
-except Exception:
-    pass
+def _forget_info(url: str) -> None:
+    _info_path(url).unlink(missing_ok=True)
 
 
-@app.post("/download", response_class=JSONResponse)
-async def download_video(video_url: VideoURL, background_tasks: BackgroundTasks):
-    url = video_url.url.strip()
+def _store_info(tmp: Path, path: Path) -> dict:
+    # Keep the full info for a download to select from; return the listing
+    with open(tmp, encoding="utf-8") as f:
+        info = json.load(f)
+    for key in formats.SELECTION_KEYS:
+        info.pop(key, None)
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(info, f)
+    os.replace(tmp, path)
+    cutoff = time.time() - INFO_REUSE_SECONDS
+    for old in INFO_DIR.glob("*.json"):
+        try:
+            if old.stat().st_mtime < cutoff:
+                old.unlink()
+        except OSError:
+            pass
+    return formats.listing(info)
+
+
+# /info extractions in flight, by canonical key (single-flight)
+_info_tasks: dict[str, asyncio.Task] = {}
+
+
+async def _media_info(url: str) -> dict:
+    url = url.strip()
     if not url:
         raise HTTPException(status_code=400, detail="URL is required")
+    key = canonical_key(url)
+    entry = info_cache.get(key + "|info")
+    if entry is not None:
+        return {**entry, "cached": True}
+    failed = failure_cache.get(key)
+    if failed is not None:
+        raise HTTPException(status_code=failed["status_code"], detail=failed["detail"])
+    task = _info_tasks.get(key)
+    if task is None:
+        task = _info_tasks[key] = asyncio.create_task(_fetch_info(url))
+        task.add_done_callback(lambda _: _info_tasks.pop(key, None))
+    # A client going away must not cancel the extraction other callers share
+    return await asyncio.shield(task)
+
 
+async def _fetch_info(url: str) -> dict:
     platform = _detect_platform(url)
+    INFO_DIR.mkdir(parents=True, exist_ok=True)
+    path = _info_path(url)
+    tmp = path.with_name(f"{path.stem}.{os.urandom(4).hex()}.tmp")
+    options = _download_options(platform, str(INFO_DIR / "%(id)s.%(ext)s"))
+    proxy = proxy_pool.pick(platform, canonical_key(url))
+    proxy_pool.started(proxy)
+    options.proxy = proxy.url if proxy is not None else None
+    egress_ok, limited = True, False
+    try:
+        async with _deadline("Extraction", EXTRACT_TIMEOUT_SECONDS) as deadline:
+            extracted, proxy, egress_ok, limited = await _extract(
+                "info", url, platform, options, str(tmp), proxy, deadline
+            )
+        _remember_failure(url, extracted.error)
+        _raise_for_ytdlp(extracted)
+        listing = await asyncio.to_thread(_store_info, tmp, path)
+    finally:
+        proxy_pool.finished(proxy, egress_ok, limited)
+        tmp.unlink(missing_ok=True)
+    listing["platform"] = platform
+    info_cache.put(canonical_key(url) + "|info", listing)
+    return listing
+
+
+# Jobs currently downloading: job id -> {"incoming", "info", "ok", "closed"},
+# plus "readable" (bytes of the file safe to read) for segmented downloads
+_streams: dict[str, dict] = {}
+
+
+def _http_error(failure: errors.Failure) -> HTTPException:
+    status_code, detail = errors.RESPONSES[failure.kind]
+    # None: yt-dlp's own message; the full output is in the job log
+    return HTTPException(status_code=status_code, detail=detail or failure.message or "Download failed")
+
+
+def _raise_for_ytdlp(result) -> None:
+    # Also set when yt-dlp skipped an oversized file without failing
+    if result.error is not None:
+        raise _http_error(result.error)
+
+
+def _remember_failure(url: str, failure: errors.Failure | None) -> None:
+    # Extraction failures only: a download may fail on a media URL that expired
+    if failure is not None and failure.permanent:
+        error = _http_error(failure)
+        failure_cache.put(canonical_key(url), {"kind": failure.kind, "status_code": error.status_code, "detail": error.detail})
+
+
+def _is_egress_failure(failure: errors.Failure | None) -> bool:
+    # Errors that say nothing about the media: the egress was throttled or could not reach the platform
+    return failure is not None and failure.kind in (errors.RATE_LIMITED, errors.NETWORK)
+
+
+def _begin_upload(live: dict):
+    # Publish to object storage while yt-dlp downloads. The object is named
+    # like the blob the file will become, so replicas agree on the key.
+    if not storage.remote or live["info"].get("requested_formats"):
+        return None
+    info = live["info"]
+    name = f"{blobs.id_for(info)}.{info.get('ext') or 'bin'}"
+    if name in blobs:
+        return None
+    multipart = storage.begin(name, _friendly_name(info.get("title") or name, info.get("ext") or "bin"))
+    task = asyncio.create_task(multipart.follow(
+        lambda: _partial_file(live["incoming"]),
+        lambda: bool(live.get("downloaded") or live.get("closed")),
+        available=lambda: live["readable"]() if live.get("readable") else None,
+    ))
+    return multipart, task
+
+
+async def _publish(upload, final_path: Path) -> None:
+    # Finish the upload started by _begin_upload, or upload the finished file
+    multipart = None
+    if upload is not None:
+        multipart, task = upload
+        try:
+            await task
+        except Exception:
+            await multipart.abort()
+            multipart = None
+        if multipart is not None and multipart.key != final_path.name:
+            await multipart.abort()
+            multipart = None
+    if multipart is None:
+        if (blobs.lookup(final_path.name) or {}).get("remote"):
+            return
+        multipart = storage.begin(final_path.name, _friendly_filename(final_path.name))
+    if await multipart.complete(final_path):
+        blobs.mark_remote(final_path.name)
+
+
+def _download_options(platform: str | None, outtmpl: str) -> DownloadOptions:
     # choose platform-specific cookies; fall back to legacy cookies.txt if present
     cookie_file = _cookie_path_for(platform) if platform else None
     legacy_cookie = BASE_DIR / "cookies.txt"
@@ -179,126 +709,615 @@ async def download_video(video_url: VideoURL, background_tasks: BackgroundTasks)
                 "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"
     )
 
-    # Limit filename length to avoid Windows MAX_PATH and excessive titles
-    default_limit = 100 if os.name == "nt" else 180
-    title_limit = int(os.getenv("OUTPUT_TITLE_LIMIT", str(default_limit)))
-    # Use byte-length limiter (.%dB) so multibyte chars are accounted for
-    outtmpl = str(DOWNLOAD_DIR / f"%(title).{title_limit}B.%(ext)s")
-    cmd: list[str] = [
-        "yt-dlp",
-        url,
-        "--no-playlist",
-        "--restrict-filenames",
-        "--windows-filenames",
-        "--newline",
-        "--print-json",
-        "-o",
-        outtmpl,
-        "--add-header",
-        f"User-Agent: {user_agent}",
-        "--add-header",
-        "Accept-Language: en-US,en;q=0.9",
-        "--sleep-requests",
-        "1",
-        "--retries",
-        "3",
-        "--ignore-config",
-    ]
-    if cookie_file:
-        cmd.extend(["--cookies", str(cookie_file)])
-    proxy_url = os.getenv("PROXY_URL")
-    if proxy_url:
-        cmd.extend(["--proxy", proxy_url])
+    return DownloadOptions(
+        outtmpl=outtmpl,
+        headers={
+            "User-Agent": user_agent,
+            "Accept-Language": "en-US,en;q=0.9",
+        },
+        cookie_file=str(cookie_file) if cookie_file else None,
+        retries=3,
+    )
+
 
+@contextlib.asynccontextmanager
+async def _deadline(phase: str, seconds: float):
+    # Cancels whatever the phase awaits; the engines kill yt-dlp on cancellation
     try:
-        proc = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            check=False,
-        )
+        async with asyncio.timeout(seconds or None) as timeout:
+            yield timeout
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail=f"{phase} did not finish within {seconds:.0f}s.")
 
-        stdout, stderr, code = proc.stdout.strip(), proc.stderr.strip(), proc.returncode
-
-        # Error mapping
-        combined = "\n".join([stderr, stdout])
-        if code != 0:
-            lower = combined.lower()
-            if "http error 429" in lower or "too many requests" in lower or "rate limit" in lower:
-                raise HTTPException(status_code=429, detail="Rate limited by platform. Try again later or use a new IP.")
-            if "login required" in lower or "this video is private" in lower or "sign in" in lower:
-                raise HTTPException(status_code=403, detail="Login required. Please update cookies.")
-            # otherwise return actual error
-            raise HTTPException(status_code=500, detail=combined or "Download failed")
-
-        # Try to locate the last JSON object line for filename info
-        parsed_info = None
-        for line in stdout.splitlines()[::-1]:
-            line = line.strip()
-            if line.startswith("{") and line.endswith("}"):
-                try:
-                    parsed_info = json.loads(line)
-                    break
-                except Exception:
-                    continue
-
-        filename = None
-        if parsed_info:
-            # yt-dlp may put filename under requested_downloads[0]['_filename'] or 'filename'
-            try:
-                rd = parsed_info.get("requested_downloads") or []
-                if rd:
-                    filename = rd[0].get("_filename") or rd[0].get("filepath")
-            except Exception:
-                pass
-            if not filename:
-                filename = parsed_info.get("filename") or parsed_info.get("_filename")
-
-        final_path = Path(filename) if filename else None
-        if not final_path or not final_path.exists():
-            # best-effort guess from title/ext
-            if parsed_info:
-                title = parsed_info.get("title") or "video"
-                ext = parsed_info.get("ext") or "mp4"
-                guess = DOWNLOAD_DIR / f"{title}.{ext}"
-                final_path = guess if guess.exists() else None
-
-        # Schedule auto-deletion regardless of which link is clicked
-        if final_path and final_path.exists():
-            background_tasks.add_task(_delayed_delete, str(final_path), CLEANUP_TTL_SECONDS)
-
-        response_payload = {
-            "download_url": f"/files/{final_path.name}" if final_path and final_path.exists() else None,
-            "force_download_url": f"/files-download/{final_path.name}" if final_path and final_path.exists() else None,
-            "stdout": stdout,
-            "stderr": stderr,
-            "platform": platform,
-        }
-        return JSONResponse(response_payload)
+
+@contextlib.asynccontextmanager
+async def _size_cap(max_bytes: int | None):
+    """Yields a progress listener that stops the download once it reports more than ``max_bytes``; 413 then."""
+    loop = asyncio.get_running_loop()
+    exceeded = False
+    try:
+        async with asyncio.timeout(None) as cap:
+            def check(event: dict) -> None:
+                nonlocal exceeded
+                if max_bytes and not exceeded and (event.get("downloaded_bytes") or 0) > max_bytes:
+                    exceeded = True
+                    cap.reschedule(loop.time())
+            yield check
+    except TimeoutError:
+        if not exceeded:
+            raise
+        raise HTTPException(status_code=413, detail=errors.RESPONSES[errors.TOO_LARGE][1])
+
+
+def _fragmented(info: dict) -> bool:
+    # HLS, DASH and the like: every format that is not a single HTTP(S) file
+    return any(f.get("protocol") not in (None, "http", "https") for f in info.get("requested_formats") or [info])
+
+
+async def _paused(deadline: asyncio.Timeout | None, awaitable):
+    """Await ``awaitable`` with ``deadline`` stopped, e.g. while waiting on our own request pacing."""
+    if deadline is None or deadline.when() is None or deadline.expired():
+        return await awaitable
+    loop = asyncio.get_running_loop()
+    remaining = deadline.when() - loop.time()
+    deadline.reschedule(None)
+    try:
+        return await awaitable
+    finally:
+        deadline.reschedule(loop.time() + remaining)
+
+
+async def _extract(
+    job_id: str, url: str, platform: str | None, options: DownloadOptions, info_path: str, proxy,
+    deadline: asyncio.Timeout | None = None,
+):
+    """Resolve ``url`` into ``info_path``, moving to another egress after 429s and proxy errors.
+
+    Returns the engine result, the proxy last used and whether the egress
+    was fine (and if not, whether it was rate-limited). Time spent waiting
+    for the rate limiter does not count against ``deadline``.
+    """
+    egress = proxy.label if proxy is not None else None
+    egress_ok, limited = True, False
+    for attempt in range(RATE_LIMIT_RETRIES + 1):
+        # Waits out the egress's pace; after a 429 that is the backed-off rate
+        await _paused(deadline, rate_limiter.acquire(platform, egress))
+        options.sleep_requests = rate_limiter.sleep_requests(platform, egress)
+        extracted = await engine.extract(job_id, url, options, info_path)
+        error_stats.record(extracted.error)
+        limited = extracted.error is not None and extracted.error.kind == errors.RATE_LIMITED
+        egress_ok = not _is_egress_failure(extracted.error)
+        if egress_ok or (proxy is None and not limited):
+            break
+        if limited:
+            rate_limiter.rate_limited(platform, egress)
+        if attempt < RATE_LIMIT_RETRIES:
+            # Retry through another egress when the pool has one
+            proxy = proxy_pool.reassign(proxy, platform, canonical_key(url), limited)
+            options.proxy = proxy.url if proxy is not None else None
+            egress = proxy.label if proxy is not None else None
+    return extracted, proxy, egress_ok, limited
+
+
+async def _perform_download(job: Job) -> dict:
+    url = job.url
+    platform = job.platform
+    variant = formats.variant(job.quality, job.max_filesize, job.format_id)
+    cached = _cached_result(url, platform, variant)
+    if cached:
+        return cached
+
+    # Each job downloads into its own directory; the finished file is then
+    # moved into the content-addressed store
+    incoming = blobs.incoming_dir(job.id)
+    options = _download_options(platform, str(incoming / "%(extractor_key)s-%(id)s.%(ext)s"))
+    options.max_filesize = job.max_filesize
+    options.format, options.format_sort = formats.selector(
+        job.quality, job.max_filesize, FFMPEG_AVAILABLE, job.format_id
+    )
+    # One egress for the whole job, and for later jobs on the same media
+    proxy = proxy_pool.pick(platform, canonical_key(url))
+    proxy_pool.started(proxy)
+    options.proxy = proxy.url if proxy is not None else None
+
+    info_path = str(incoming / "info.json")
+    # (multipart upload, task feeding it) while publishing to object storage
+    upload = None
+    # Whether the job's outcome reflects on the egress, and how
+    egress_ok, limited = True, False
+    stored = _stored_info(url)
+    try:
+        # Resolve formats first so the expected size can be reserved before
+        # anything is written to disk
+        extracted = None
+        async with _deadline("Extraction", EXTRACT_TIMEOUT_SECONDS) as deadline:
+            if stored is not None:
+                # /info extracted this media moments ago; select from its formats
+                extracted = await engine.extract(job.id, url, options, info_path, source=str(stored))
+                error_stats.record(extracted.error)
+                if extracted.code != 0:
+                    extracted = None
+            if extracted is None:
+                extracted, proxy, egress_ok, limited = await _extract(
+                    job.id, url, platform, options, info_path, proxy, deadline
+                )
+        await _log_output(job.id, "extract", extracted)
+        egress = proxy.label if proxy is not None else None
+        _remember_failure(url, extracted.error)
+        _raise_for_ytdlp(extracted)
+        await quota.reserve(job.id, estimate_size(extracted.info or {}))
+        live = _streams[job.id] = {"incoming": incoming, "info": extracted.info or {}}
+        upload = _begin_upload(live)
+        profile = download_profiles.choose(platform, extracted.info or {})
+        options.concurrent_fragments, options.http_chunk_size, options.buffer_size = profile
+        if _fragmented(extracted.info or {}):
+            # yt-dlp holds each fragment to max_filesize, never their total,
+            # and fails without saying why on one that is over; the size cap
+            # below applies instead
+            options.max_filesize = None
+
+        result = None
+        async with _deadline("Download", DOWNLOAD_TIMEOUT_SECONDS), _size_cap(job.max_filesize) as cap:
+            def on_progress(event: dict) -> None:
+                cap(event)
+                progress_hub.publish(job.id, event)
+
+            if SEGMENTED_CONNECTIONS > 1 and segmented.eligible(extracted.info or {}, SEGMENTED_MIN_BYTES):
+                result = await segmented.download(
+                    info_path, incoming, options.proxy, SEGMENTED_CONNECTIONS, SEGMENTED_SEGMENT_BYTES, on_progress,
+                    # Written out of order: streams may only read the finished prefix
+                    on_start=lambda download: live.update(readable=lambda: download.contiguous),
+                    max_bytes=job.max_filesize,
+                )
+                if result is None:
+                    live.pop("readable", None)
+            if result is None:
+                result = await engine.download(job.id, url, options, on_progress, info_path=info_path)
+        await _log_output(job.id, "download", result)
+        error_stats.record(result.error)
+        live["downloaded"] = True
+        if result.code != 0:
+            limited = result.error is not None and result.error.kind == errors.RATE_LIMITED
+            egress_ok = not _is_egress_failure(result.error)
+            if limited:
+                rate_limiter.rate_limited(platform, egress)
+            if stored is not None:
+                # Its media URLs may have expired; the next attempt extracts afresh
+                _forget_info(url)
+        _raise_for_ytdlp(result)
+        rate_limiter.success(platform, egress)
+
+        parsed_info = result.info
+
+        # The engine reports the final path (after merging and renaming)
+        downloads = (parsed_info or {}).get("requested_downloads") or [{}]
+        filename = downloads[0].get("filepath")
+
+        src = Path(filename) if filename else None
+        if not src or not src.exists():
+            # Never derived from the title: the job directory holds nothing
+            # but this download
+            finished = [
+                p for p in incoming.iterdir()
+                if p.is_file() and p.suffix not in (".part", ".ytdl") and p.name != "info.json"
+            ]
+            src = finished[0] if len(finished) == 1 else None
+
+        final_path = None
+        if src and parsed_info:
+            async with _deadline("Post-processing", POSTPROCESS_TIMEOUT_SECONDS):
+                sha = await asyncio.to_thread(file_sha256, src) if blobs.verify_content else None
+                final_path = blobs.ingest(src, parsed_info, f"job:{job.id}", sha)
+                # Schedule auto-deletion regardless of which link is clicked
+                expiry.schedule(f"job:{job.id}", CLEANUP_TTL_SECONDS)
+                _remember(url, parsed_info, final_path, variant)
+                if storage.remote:
+                    upload, pending = None, upload
+                    await _publish(pending, final_path)
+
+        live["ok"] = final_path is not None
+        return _result_payload(final_path, platform, parsed_info)
 
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        proxy_pool.finished(proxy, egress_ok, limited)
+        live = _streams.pop(job.id, None)
+        if live is not None:
+            live["closed"] = True
+        if upload is not None:
+            upload[1].cancel()
+            await upload[0].abort()
+        quota.release(job.id)
+        blobs.discard_incoming(job.id)
+        # The real size may exceed the estimate
+        quota.evict()
+
+
+async def _log_output(job_id: str, phase: str, result) -> None:
+    try:
+        await asyncio.to_thread(job_logs.append, job_id, phase, result.code, result.stdout, result.stderr)
+    except OSError as e:
+        print(f"Could not write the log of job {job_id}: {e}")
+
+
+job_queue = JobQueue(
+    make_store(JOB_STORE, JOB_DB_PATH),
+    _perform_download,
+    default_concurrency=JOB_CONCURRENCY,
+    concurrency=JOB_CONCURRENCY_BY_PLATFORM,
+    notify=progress_hub.publish,
+    max_running=JOB_MAX_RUNNING,
+    max_queued=JOB_MAX_QUEUED,
+    max_queued_per_client=JOB_MAX_QUEUED_PER_CLIENT,
+    cancel_after_disconnect=CANCEL_ON_DISCONNECT_SECONDS,
+    retention=JOB_RETENTION_SECONDS,
+)
+
+
+def _client_id(request: Request) -> str | None:
+    # Behind Render's proxy the peer is the proxy. The first hop is whatever
+    # the client put in the header, so count trusted hops from the right.
+    hops = [hop.strip() for hop in request.headers.get("x-forwarded-for", "").split(",") if hop.strip()]
+    if TRUSTED_PROXY_COUNT > 0 and hops:
+        return hops[-min(TRUSTED_PROXY_COUNT, len(hops))]
+    return request.client.host if request.client else None
+
+
+def _submit_job(video_url: VideoURL, client: str | None = None) -> Job:
+    url = video_url.url.strip()
+    if not url:
+        raise HTTPException(status_code=400, detail="URL is required")
+    platform = _detect_platform(url)
+    quality = formats.check(video_url.quality, video_url.format_id)
+    variant = formats.variant(quality, video_url.max_filesize, video_url.format_id)
+    cached = _cached_result(url, platform, variant)
+    if cached:
+        return job_queue.complete(url, platform, cached)
+    failed = failure_cache.get(canonical_key(url))
+    if failed is not None:
+        return job_queue.fail(url, platform, failed["status_code"], failed["detail"])
+    return job_queue.submit(
+        url, platform, key=canonical_key(url) + variant, client=client,
+        quality=quality, format_id=video_url.format_id, max_filesize=video_url.max_filesize,
+    )
+
+
+def _job_payload(job: Job) -> JobResponse:
+    return JobResponse(
+        job_id=job.id,
+        status=job.status,
+        url=job.url,
+        platform=job.platform,
+        quality=job.quality,
+        format_id=job.format_id,
+        max_filesize=job.max_filesize,
+        # Results stored before the slim schema still carry stdout/stderr; dropped here
+        result=DownloadResult.model_validate(job.result) if job.result else None,
+        error=job.error,
+        status_code=job.status_code,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+    )
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(video_url: VideoURL, request: Request):
+    job = _submit_job(video_url, _client_id(request))
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.id}",
+        "stream_url": f"/files-download/{job.id}",
+    }
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    job = job_queue.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_payload(job)
+
+
+@app.get("/jobs/{job_id}/log", response_class=PlainTextResponse)
+async def job_log(job_id: str):
+    # Opt-in debug detail: the tail of yt-dlp's output for each phase
+    if not job_queue.store.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    text = await asyncio.to_thread(job_logs.read, job_id)
+    if text is None:
+        raise HTTPException(status_code=404, detail="No log for this job")
+    return PlainTextResponse(text)
+
+
+@app.delete("/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str, request: Request, response: Response):
+    # Withdraws the caller's interest. The job (shared by coalesced
+    # submissions) stops, and its partial files go, once nobody else wants it;
+    # until then it keeps running and the answer is 202.
+    job = job_queue.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status in FINISHED_STATES:
+        raise HTTPException(status_code=409, detail=f"Job already {job.status}")
+    job = await job_queue.withdraw(job_id, _client_id(request), "Cancelled by request")
+    if job.status not in FINISHED_STATES:
+        response.status_code = 202
+    return _job_payload(job)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request):
+    if not job_queue.store.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    client = _client_id(request)
+
+    async def stream():
+        # A finished job is answered from the store: subscribing first would
+        # open a channel no final event is ever published to
+        job = job_queue.store.get(job_id)
+        if job and job.status in FINISHED_STATES:
+            yield _sse(job_event(job))
+            return
+        # Nothing is awaited since the store read, and the queue saves a
+        # job before publishing its final event, so that event cannot be missed
+        events = progress_hub.subscribe(job_id)
+        # Starlette cancels this generator when the client goes away
+        job_queue.attach(job_id, client)
+        try:
+            async for event in events:
+                yield _sse(event) if event is not None else ": keepalive\n\n"
+        finally:
+            job_queue.detach(job_id, client)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-store", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse(event: dict) -> str:
+    return f"event: {event.get('type', 'message')}\ndata: {json.dumps(event)}\n\n"
+
+
+@app.get("/info")
+async def media_info(url: str):
+    # Metadata and formats only; pick a format_id or quality, then POST /jobs
+    return await _media_info(url)
 
-@app.get("/files-download/{filename}")
-async def files_download(filename: str, background_tasks: BackgroundTasks):
-    # Force a browser download with Content-Disposition
+
+@app.post("/info")
+async def media_info_post(video_url: VideoURL):
+    return await _media_info(video_url.url)
+
+
+@app.post("/download", response_model=DownloadResponse)
+async def download_video(video_url: VideoURL, request: Request):
+    # Back-compat: submit a job and hold the connection until it finishes.
+    client = _client_id(request)
+    job = await _wait_connected(request, _submit_job(video_url, client).id, client)
+    if job.status in (ERROR, CANCELLED):
+        status_code = job.status_code or 500
+        headers = None
+        if status_code == 503:
+            headers = {"Retry-After": str(max(1, int(QUOTA_WAIT_SECONDS)))}
+        elif status_code == 429:
+            # A retry may be sent through any usable egress
+            retry_after = min(rate_limiter.retry_after(job.platform, e) for e in proxy_pool.egresses(job.platform))
+            headers = {"Retry-After": str(retry_after)}
+        raise HTTPException(status_code=status_code, detail=job.error or "Download failed", headers=headers)
+    # Unknown keys (stdout/stderr of results stored by older versions) are dropped
+    return DownloadResponse.model_validate({**(job.result or {}), "job_id": job.id, "log_url": f"/jobs/{job.id}/log"})
+
+
+async def _wait_connected(request: Request, job_id: str, client: str | None) -> Job:
+    """Wait for the job while the client stays connected (see JobQueue.detach)."""
+    job = job_queue.store.get(job_id)
+    if job is not None and job.status in FINISHED_STATES:
+        # Answered from a cache: nothing to wait for or to cancel
+        return job
+    job_queue.attach(job_id, client)
+    finished = asyncio.ensure_future(job_queue.wait(job_id))
+    gone = asyncio.ensure_future(_disconnected(request))
+    try:
+        await asyncio.wait({finished, gone}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        gone.cancel()
+        if not finished.done():
+            finished.cancel()
+        job_queue.detach(job_id, client)
+    if not finished.done() or finished.cancelled():
+        # Nobody is listening; the status code only shows up in access logs
+        raise HTTPException(status_code=499, detail="Client disconnected")
+    return finished.result()
+
+
+async def _disconnected(request: Request) -> None:
+    # The body has been read, so the next message is the disconnect
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+@app.api_route("/files-download/{filename}", methods=["GET", "HEAD"])
+async def files_download(filename: str, request: Request):
+    if _JOB_ID.fullmatch(filename) and not (DOWNLOAD_DIR / filename).exists():
+        return await _job_download(request, filename, _client_id(request))
+    if REQUIRE_SIGNED_URLS:
+        raise HTTPException(status_code=403, detail="Signed link required")
+    return _file_response(filename, True, FILES_CACHE_CONTROL)
+
+
+@app.api_route("/signed/{kind}/{expires}/{sig}/{filename}", methods=["GET", "HEAD"])
+async def signed_file(kind: str, expires: int, sig: str, filename: str):
+    # Checked before touching the disk, so forged links cost one HMAC
+    if kind not in ("files", "files-download") or not signer.verify(kind, filename, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired link")
+    # The bytes behind a signed name never change; caches may keep them until the link expires
+    max_age = max(0, expires - int(time.time()))
+    return _file_response(filename, kind == "files-download", f"public, max-age={max_age}, immutable", max_age)
+
+
+def _file_response(filename: str, attachment: bool, cache_control: str, expires_in: int = SIGNED_URL_TTL_SECONDS):
     safe_path = (DOWNLOAD_DIR / filename).resolve()
-    if not str(safe_path).startswith(str(DOWNLOAD_DIR.resolve())):
+    if not str(safe_path).startswith(str(DOWNLOAD_DIR.resolve())) or safe_path.name.startswith("."):
         raise HTTPException(status_code=400, detail="Invalid filename")
-    if not safe_path.exists():
+    blob = blobs.lookup(safe_path.name)
+    if storage.remote and (blob is None or blob.get("remote")):
+        # Published blobs (possibly by another replica) are served by the bucket
+        if blob is not None:
+            _touch_file(safe_path.name, FILES_DOWNLOAD_TTL_SECONDS if attachment else CLEANUP_TTL_SECONDS)
+        return RedirectResponse(
+            storage.url(safe_path.name, attachment, expires_in),
+            status_code=307,
+            headers={"Cache-Control": cache_control},
+        )
+    if not safe_path.is_file():
         raise HTTPException(status_code=404, detail="File not found")
-    # Schedule deletion with a delay to support download managers / retries
-    background_tasks.add_task(_delayed_delete, str(safe_path), 900)
-    return FileResponse(
+    # Keep the file around a while longer to support download managers / retries
+    _touch_file(safe_path.name, FILES_DOWNLOAD_TTL_SECONDS if attachment else CLEANUP_TTL_SECONDS)
+    return RangeFileResponse(
         path=str(safe_path),
+        # Force a browser download with Content-Disposition
+        media_type="application/octet-stream" if attachment else None,
+        filename=_friendly_filename(safe_path.name) if attachment else None,
+        headers={"Cache-Control": cache_control},
+        accel_redirect=FILES_ACCEL_REDIRECT_PREFIX + safe_path.name if FILES_ACCEL_REDIRECT_PREFIX else None,
+    )
+
+
+async def _job_download(request: Request, job_id: str, client: str | None = None):
+    # Stream a job's file while it is being downloaded; once the job is done
+    # this is the same as /files-download/{name}. While waiting for the first
+    # bytes the client counts as following the job, like a blocking /download.
+    if not job_queue.store.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    job_queue.attach(job_id, client)
+    gone = asyncio.ensure_future(_disconnected(request))
+    try:
+        async with asyncio.timeout(STREAM_WAIT_SECONDS or None):
+            while True:
+                job = job_queue.store.get(job_id)
+                if not job:
+                    raise HTTPException(status_code=404, detail="Job not found")
+                if job.status in (ERROR, CANCELLED):
+                    raise HTTPException(status_code=job.status_code or 500, detail=job.error or "Download failed")
+                if job.status == DONE:
+                    name = ((job.result or {}).get("force_download_url") or "").rsplit("/", 1)[-1]
+                    if not name or _JOB_ID.fullmatch(name):
+                        raise HTTPException(status_code=404, detail="File not found")
+                    return _file_response(name, True, "no-store")
+                live = _streams.get(job_id)
+                # Merged formats are written to separate files and muxed at the end,
+                # so only single-file downloads can be streamed early.
+                if live and not live["info"].get("requested_formats"):
+                    src = _partial_file(live["incoming"])
+                    if src is not None:
+                        try:
+                            f = open(src, "rb")
+                            break
+                        except OSError:
+                            # Renamed between listing and opening; the next poll finds it
+                            pass
+                await asyncio.wait({gone}, timeout=STREAM_POLL_SECONDS)
+                if gone.done():
+                    raise HTTPException(status_code=499, detail="Client disconnected")
+    except TimeoutError:
+        raise HTTPException(status_code=504, detail=f"The file was not ready within {STREAM_WAIT_SECONDS:.0f}s.")
+    finally:
+        gone.cancel()
+        # _tail attaches again for the stream, within the grace period
+        job_queue.detach(job_id, client)
+    info = live["info"]
+    outcome = {"complete": False}
+    return TailResponse(
+        _tail(f, live, job_id, client, outcome),
+        complete=lambda: outcome["complete"],
         media_type="application/octet-stream",
-        filename=filename,
-        headers={"Cache-Control": "no-store"},
-        background=background_tasks,
+        headers={
+            "Content-Disposition": _content_disposition(_friendly_name(info.get("title") or job_id, info.get("ext") or "bin")),
+            "Cache-Control": "no-store",
+        },
     )
 
+
+def _partial_file(incoming: Path) -> Path | None:
+    try:
+        names = [
+            p for p in incoming.iterdir()
+            if p.is_file() and p.name != "info.json" and p.suffix != ".ytdl" and "-Frag" not in p.name
+        ]
+    except OSError:
+        return None
+    return names[0] if len(names) == 1 else None
+
+
+async def _tail(f, live: dict, job_id: str, client: str | None, outcome: dict):
+    # The descriptor follows the file through yt-dlp's rename and the move
+    # into the blob store. At EOF, wait for more bytes until the job closes.
+    # outcome["complete"] is set once every byte of a successful job is sent;
+    # otherwise TailResponse cuts the response off.
+    pos = 0
+    readable = live.get("readable")
+    job_queue.attach(job_id, client)
+    try:
+        while True:
+            if live.get("readable") is not readable:
+                print(f"Stream of job {job_id} cut off: segmented download abandoned")
+                return
+            size = STREAM_CHUNK_BYTES if readable is None else min(STREAM_CHUNK_BYTES, readable() - pos)
+            chunk = await asyncio.to_thread(f.read, size) if size > 0 else b""
+            if chunk:
+                pos += len(chunk)
+                yield chunk
+                continue
+            if live.get("closed"):
+                break
+            if os.fstat(f.fileno()).st_size < pos:
+                print(f"Stream of job {job_id} cut off: yt-dlp restarted the download")
+                return
+            await asyncio.sleep(STREAM_POLL_SECONDS)
+        if not live.get("ok"):
+            print(f"Stream of job {job_id} cut off: the download failed")
+            return
+        outcome["complete"] = True
+    finally:
+        job_queue.detach(job_id, client)
+        f.close()
+
+
+def _content_disposition(filename: str) -> str:
+    # Same header FileResponse builds for the filename= argument
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"attachment; filename*=utf-8''{quoted}"
+    return f'attachment; filename="{filename}"'
+
+
+def _friendly_filename(name: str) -> str:
+    # Blobs are stored under hashes; offer the video title as the filename
+    blob = blobs.lookup(name)
+    if not blob:
+        return name
+    return _friendly_name(blob["title"], blob["ext"])
+
+
+def _friendly_name(title: str, ext: str) -> str:
+    title = "".join(c for c in title if c not in '\\/:*?"<>|' and ord(c) >= 32).strip() or "video"
+    # Limit filename length to avoid Windows MAX_PATH and excessive titles
+    default_limit = 100 if os.name == "nt" else 180
+    title_limit = int(os.getenv("OUTPUT_TITLE_LIMIT", str(default_limit)))
+    # Byte-length limit so multibyte chars are accounted for
+    title = title.encode("utf-8")[:title_limit].decode("utf-8", errors="ignore")
+    return f"{title}.{ext}"
+
 # Serve the built Next.js static site from frontend/out at the root path (if present)
 FRONTEND_BUILD_DIR = BASE_DIR / "frontend" / "out"
 if FRONTEND_BUILD_DIR.exists():
@@ -317,7 +1336,45 @@ async def ping_server():
         except Exception as e:
             print(f"Keep-alive error: {e} at {time.time()}")
 
+async def update_yt_dlp_periodically():
+    await asyncio.sleep(YTDLP_UPDATE_DELAY_SECONDS)
+    while True:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, "-m", "backend.updater",
+                cwd=str(BASE_DIR),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+            )
+            out, _ = await proc.communicate()
+            print(f"yt-dlp updater: {out.decode('utf-8', errors='replace').strip()}")
+        except Exception as e:
+            print(f"yt-dlp updater error: {e}")
+        await asyncio.sleep(YTDLP_UPDATE_INTERVAL_HOURS * 3600)
+
 @app.on_event("startup")
 async def startup_event():
+    engine.start()
+    blobs.load()
+    expiry.load()
+    _adopt_untracked_files()
+    asyncio.create_task(expiry.run())
+    asyncio.create_task(blobs.run())
+    recovered = job_queue.recover()
+    if recovered:
+        print(f"Re-queued {recovered} unfinished job(s) from the job store")
+    if JOB_RETENTION_SECONDS > 0:
+        asyncio.create_task(job_queue.run_retention(JOB_PRUNE_INTERVAL_SECONDS))
     print(f"Keep-alive service started. Pinging {BACKEND_URL}/healthz every {PING_INTERVAL / 60} minutes...")
-    asyncio.create_task(ping_server())
\ No newline at end of file
+    asyncio.create_task(ping_server())
+    if proxy_pool.proxies and PROXY_HEALTH_INTERVAL_SECONDS > 0:
+        asyncio.create_task(proxy_pool.run(PROXY_HEALTH_INTERVAL_SECONDS))
+    if YTDLP_UPDATE_INTERVAL_HOURS > 0:
+        asyncio.create_task(update_yt_dlp_periodically())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    engine.close()
+    expiry.flush()
+    blobs.flush()
@@ -0,0 +1,32 @@
+"""Small in-process metric types for /metrics."""
+import bisect
+from typing import Sequence
+
+# Seconds; suits waits and job durations from sub-second cache hits to long videos
+TIME_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Fixed-bucket histogram; ``snapshot`` reports cumulative counts like Prometheus."""
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self._bounds = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def mean(self) -> float | None:
+        return self.sum / self.count if self.count else None
+
+    def snapshot(self) -> dict:
+        buckets, total = {}, 0
+        for bound, n in zip((*self._bounds, "+Inf"), self._counts):
+            total += n
+            buckets[str(bound)] = total
+        return {"buckets": buckets, "count": self.count, "sum": round(self.sum, 3)}
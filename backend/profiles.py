@@ -0,0 +1,67 @@
+"""Per-platform download tuning.
+
+Left alone, yt-dlp fetches HLS/DASH fragments one at a time and reads
+progressive files through a buffer that starts at 1 KiB. A profile sets
+fragment concurrency, HTTP chunk size and the initial read buffer for the
+protocol of the formats a job is about to download.
+"""
+from typing import Any, NamedTuple
+
+# yt-dlp protocols whose media comes as many small requests
+FRAGMENTED_PROTOCOLS = frozenset({
+    "m3u8", "m3u8_native", "http_dash_segments", "http_dash_segments_generator", "ism", "f4m",
+})
+
+
+class Profile(NamedTuple):
+    concurrent_fragments: int = 1
+    http_chunk_size: int | None = None
+    buffer_size: int | None = None
+
+
+def protocols(info: dict[str, Any]) -> set[str]:
+    formats = info.get("requested_formats") or [info]
+    # A merged format reports e.g. "m3u8_native+https"; its parts report their own
+    return {p for f in formats for p in str(f.get("protocol") or "https").split("+")}
+
+
+class DownloadProfiles:
+    """Profiles keyed by platform; values are ``{"fragmented": Profile, "progressive": Profile}``."""
+
+    def __init__(
+        self,
+        fragments: int = 4,
+        fragment_buffer: int = 64 * 1024,
+        chunk_bytes: int = 0,
+        progressive_buffer: int = 1024 * 1024,
+        fragments_by_platform: dict[str, int] | None = None,
+        chunk_bytes_by_platform: dict[str, int] | None = None,
+    ) -> None:
+        self._fragments = fragments
+        self._fragment_buffer = fragment_buffer
+        self._chunk_bytes = chunk_bytes
+        self._progressive_buffer = progressive_buffer
+        self._fragments_by_platform = fragments_by_platform or {}
+        self._chunk_bytes_by_platform = chunk_bytes_by_platform or {}
+        self.chosen: dict[str, int] = {}
+
+    def choose(self, platform: str | None, info: dict[str, Any]) -> Profile:
+        platform = platform or "default"
+        if protocols(info) & FRAGMENTED_PROTOCOLS:
+            kind = "fragmented"
+            profile = Profile(
+                concurrent_fragments=max(1, self._fragments_by_platform.get(platform, self._fragments)),
+                buffer_size=self._fragment_buffer,
+            )
+        else:
+            kind = "progressive"
+            # Chunked requests only help against CDNs that throttle long
+            # responses; each chunk is one more upstream request
+            chunk = self._chunk_bytes_by_platform.get(platform, self._chunk_bytes)
+            profile = Profile(http_chunk_size=chunk or None, buffer_size=self._progressive_buffer)
+        key = f"{platform}:{kind}"
+        self.chosen[key] = self.chosen.get(key, 0) + 1
+        return profile
+
+    def stats(self) -> dict[str, int]:
+        return dict(self.chosen)
@@ -0,0 +1,145 @@
+"""Job progress: yt-dlp progress line parsing and a coalescing fan-out hub."""
+import asyncio
+import time
+from typing import Any, AsyncIterator
+
+# Machine-readable progress line emitted by yt-dlp (--progress-template).
+# Missing fields are rendered as "NA".
+PROGRESS_PREFIX = "[progress]"
+PROGRESS_TEMPLATE = (
+    f"download:{PROGRESS_PREFIX} %(progress.status)s %(progress.downloaded_bytes)s "
+    "%(progress.total_bytes)s %(progress.total_bytes_estimate)s "
+    "%(progress.speed)s %(progress.eta)s"
+)
+
+FINAL_EVENTS = ("done", "error")
+
+
+def _num(value: str) -> float | None:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def progress_event(
+    status: str | None,
+    downloaded: float | None,
+    total: float | None,
+    speed: float | None,
+    eta: float | None,
+) -> dict[str, Any]:
+    percent = None
+    if status == "finished":
+        percent = 100.0
+    elif downloaded is not None and total:
+        percent = round(min(100.0, downloaded * 100.0 / total), 1)
+    return {
+        "type": "progress",
+        "status": status,
+        "percent": percent,
+        "downloaded_bytes": int(downloaded) if downloaded is not None else None,
+        "total_bytes": int(total) if total else None,
+        "speed": speed,
+        "eta": int(eta) if eta is not None else None,
+    }
+
+
+def parse_progress_line(line: str) -> dict[str, Any] | None:
+    line = line.strip()
+    if not line.startswith(PROGRESS_PREFIX):
+        return None
+    parts = line[len(PROGRESS_PREFIX):].split()
+    if len(parts) != 6:
+        return None
+    status, downloaded, total, estimate, speed, eta = parts
+    return progress_event(
+        status,
+        _num(downloaded),
+        _num(total) or _num(estimate),
+        _num(speed),
+        _num(eta),
+    )
+
+
+class _Channel:
+    def __init__(self) -> None:
+        self.latest: dict[str, Any] | None = None
+        self.version = 0
+        self.flushed_version = 0
+        self.last_flush = 0.0
+        self.pending: asyncio.TimerHandle | None = None
+        self.changed = asyncio.Event()
+
+
+class ProgressHub:
+    """Fans job events out to any number of watchers.
+
+    Publishers only overwrite the latest event; watchers are woken at most
+    once per ``min_interval`` per job, so a chatty download costs the same
+    regardless of how many clients are listening. Final events flush at once.
+    """
+
+    def __init__(self, min_interval: float = 0.5, linger: float = 60.0) -> None:
+        self._min_interval = max(0.0, min_interval)
+        self._linger = linger
+        self._channels: dict[str, _Channel] = {}
+
+    def _channel(self, job_id: str) -> _Channel:
+        channel = self._channels.get(job_id)
+        if channel is None:
+            channel = self._channels[job_id] = _Channel()
+        return channel
+
+    def publish(self, job_id: str, event: dict[str, Any]) -> None:
+        channel = self._channel(job_id)
+        channel.latest = event
+        channel.version += 1
+        final = event.get("type") in FINAL_EVENTS
+        wait = channel.last_flush + self._min_interval - time.monotonic()
+        if final or wait <= 0:
+            self._flush(channel)
+        elif channel.pending is None:
+            channel.pending = asyncio.get_running_loop().call_later(wait, self._flush, channel)
+        if final:
+            # Keep the final event around briefly for late subscribers.
+            asyncio.get_running_loop().call_later(self._linger, self._drop, job_id, channel)
+
+    def _flush(self, channel: _Channel) -> None:
+        if channel.pending is not None:
+            channel.pending.cancel()
+            channel.pending = None
+        channel.last_flush = time.monotonic()
+        channel.flushed_version = channel.version
+        changed, channel.changed = channel.changed, asyncio.Event()
+        changed.set()
+
+    def _drop(self, job_id: str, channel: _Channel) -> None:
+        if self._channels.get(job_id) is channel:
+            del self._channels[job_id]
+
+    def subscribe(self, job_id: str, keepalive: float = 15.0) -> AsyncIterator[dict[str, Any] | None]:
+        """Yield coalesced events until a final one; ``None`` marks a keepalive tick.
+
+        The channel is attached immediately, not on first iteration, so
+        events published after this call are never missed.
+        """
+        return self._iterate(self._channel(job_id), keepalive)
+
+    async def _iterate(self, channel: _Channel, keepalive: float) -> AsyncIterator[dict[str, Any] | None]:
+        seen = 0
+        while True:
+            if channel.flushed_version > seen and channel.latest is not None:
+                # latest may already be ahead of the last flush; don't resend it
+                seen = channel.version
+                event = channel.latest
+                yield event
+                if event.get("type") in FINAL_EVENTS:
+                    return
+            try:
+                await asyncio.wait_for(channel.changed.wait(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield None
+
+    def stats(self) -> dict[str, int]:
+        return {"channels": len(self._channels)}
@@ -0,0 +1,237 @@
+"""Outbound proxy pool.
+
+Entries are proxy URLs (``http://``, ``https://``, ``socks5://``...) or
+``direct`` for the host's own address; a ``#instagram,tiktok`` suffix limits
+an entry to those platforms. Each job gets one proxy for all of its
+requests. The same media keeps its proxy across jobs while that proxy stays
+healthy, otherwise a new one is drawn by rendezvous hashing weighted by
+health score (latency and recent errors). Proxies that fail repeatedly are
+ejected for an exponentially growing cooldown, then given one trial job.
+"""
+import asyncio
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Iterable
+from urllib.parse import urlparse
+
+import httpx
+
+# Stickiness entries kept; the oldest are dropped first
+MAX_STICKY = 10000
+
+
+def label_for(url: str | None) -> str:
+    # Proxies are named by address; never put credentials in metrics
+    if not url:
+        return "direct"
+    parsed = urlparse(url)
+    return f"{parsed.hostname}:{parsed.port}" if parsed.port else str(parsed.hostname)
+
+
+def parse_proxies(text: str) -> list[tuple[str | None, frozenset[str] | None]]:
+    """``(url, platforms)`` pairs from whitespace-separated entries; ``#`` lines are comments."""
+    entries = []
+    for line in text.splitlines():
+        if line.lstrip().startswith("#"):
+            continue
+        for token in line.split():
+            url, _, tags = token.partition("#")
+            platforms = frozenset(t.strip().lower() for t in tags.split(",") if t.strip()) or None
+            entries.append((None if url.lower() == "direct" else url, platforms))
+    return entries
+
+
+class Proxy:
+    def __init__(self, url: str | None, platforms: frozenset[str] | None = None) -> None:
+        self.url = url
+        self.label = label_for(url)
+        self.platforms = platforms
+        # Smoothed health-check latency (seconds) and error rate (0..1)
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.active = 0
+        self.jobs = 0
+        self.failed = 0
+        self.rate_limited = 0
+        self.checks = 0
+        self.check_failures = 0
+
+    def serves(self, platform: str | None) -> bool:
+        return self.platforms is None or (platform or "default") in self.platforms
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+    def weight(self) -> float:
+        # 1.0 for a fast, clean proxy; slow or erroring ones get fewer new keys
+        latency = self.latency if self.latency is not None else 1.0
+        return max(0.01, (1.0 - self.error_rate) / (1.0 + latency))
+
+    def stats(self, now: float) -> dict[str, Any]:
+        return {
+            "healthy": self.healthy(now),
+            "ejected_for": round(max(0.0, self.ejected_until - now), 1),
+            "ejections": self.ejections,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000),
+            "error_rate": round(self.error_rate, 3),
+            "weight": round(self.weight(), 3),
+            "active": self.active,
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "rate_limited": self.rate_limited,
+            "checks": self.checks,
+            "check_failures": self.check_failures,
+        }
+
+
+class ProxyPool:
+    def __init__(
+        self,
+        entries: Iterable[tuple[str | None, frozenset[str] | None]],
+        eject_after: int = 3,
+        eject_seconds: float = 60,
+        max_eject_seconds: float = 900,
+        sticky_seconds: float = 900,
+        health_url: str = "https://www.gstatic.com/generate_204",
+        health_timeout: float = 10,
+        smoothing: float = 0.3,
+    ) -> None:
+        self.proxies = {p.label: p for p in (Proxy(url, platforms) for url, platforms in entries)}
+        self._eject_after = max(1, eject_after)
+        self._eject_seconds = eject_seconds
+        self._max_eject_seconds = max_eject_seconds
+        self._sticky_seconds = sticky_seconds
+        self._health_url = health_url
+        self._health_timeout = health_timeout
+        self._alpha = smoothing
+        # media key -> (proxy label, expires at)
+        self._sticky: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self.sticky_hits = 0
+
+    def candidates(self, platform: str | None) -> list[Proxy]:
+        """Healthy proxies for ``platform``; if all are ejected, the one back soonest."""
+        now = time.monotonic()
+        serving = [p for p in self.proxies.values() if p.serves(platform)] or list(self.proxies.values())
+        healthy = [p for p in serving if p.healthy(now)]
+        if healthy or not serving:
+            return healthy
+        return [min(serving, key=lambda p: p.ejected_until)]
+
+    def pick(self, platform: str | None, key: str, avoid: Proxy | None = None) -> Proxy | None:
+        """Proxy for one job on media ``key``, or None when no pool is configured."""
+        candidates = [p for p in self.candidates(platform) if p is not avoid] or self.candidates(platform)
+        if not candidates:
+            return None
+        now = time.monotonic()
+        sticky = self._sticky.get(key)
+        if sticky and sticky[1] > now:
+            proxy = self.proxies.get(sticky[0])
+            if proxy in candidates:
+                self.sticky_hits += 1
+                self._stick(key, proxy, now)
+                return proxy
+        proxy = max(candidates, key=lambda p: self._rendezvous(key, p))
+        self._stick(key, proxy, now)
+        return proxy
+
+    @staticmethod
+    def _rendezvous(key: str, proxy: Proxy) -> float:
+        # Weighted rendezvous hashing: removing a proxy only moves its own keys
+        digest = hashlib.blake2b(f"{key}\0{proxy.label}".encode("utf-8"), digest_size=8).digest()
+        u = (int.from_bytes(digest, "big") + 1) / (2 ** 64 + 2)
+        return -proxy.weight() / math.log(u)
+
+    def _stick(self, key: str, proxy: Proxy, now: float) -> None:
+        self._sticky[key] = (proxy.label, now + self._sticky_seconds)
+        self._sticky.move_to_end(key)
+        while len(self._sticky) > MAX_STICKY:
+            self._sticky.popitem(last=False)
+
+    def egresses(self, platform: str | None) -> list[str | None]:
+        """Labels a new job for ``platform`` may use; ``[None]`` without a pool."""
+        return [p.label for p in self.candidates(platform)] or [None]
+
+    def reassign(self, proxy: Proxy | None, platform: str | None, key: str, rate_limited: bool) -> Proxy | None:
+        """Give up on ``proxy`` for this job and move the job to another one, if any."""
+        if proxy is None:
+            return None
+        self.finished(proxy, False, rate_limited)
+        proxy = self.pick(platform, key, avoid=proxy)
+        self.started(proxy)
+        return proxy
+
+    def started(self, proxy: Proxy | None) -> None:
+        if proxy is not None:
+            proxy.active += 1
+            proxy.jobs += 1
+
+    def finished(self, proxy: Proxy | None, ok: bool, rate_limited: bool = False) -> None:
+        """Outcome of a job; ``ok`` is False only for failures blamed on the egress."""
+        if proxy is None:
+            return
+        proxy.active = max(0, proxy.active - 1)
+        if rate_limited:
+            proxy.rate_limited += 1
+        if not ok:
+            proxy.failed += 1
+        self._record(proxy, ok)
+
+    def _record(self, proxy: Proxy, ok: bool) -> None:
+        proxy.error_rate += self._alpha * ((0.0 if ok else 1.0) - proxy.error_rate)
+        if ok:
+            proxy.failures = 0
+            if proxy.healthy(time.monotonic()):
+                proxy.ejections = 0
+            return
+        proxy.failures += 1
+        # Jobs that started before an ejection must not extend it
+        if proxy.failures >= self._eject_after and proxy.healthy(time.monotonic()):
+            self._eject(proxy)
+
+    def _eject(self, proxy: Proxy) -> None:
+        cooldown = min(self._max_eject_seconds, self._eject_seconds * 2 ** proxy.ejections)
+        proxy.ejected_until = time.monotonic() + cooldown
+        proxy.ejections += 1
+        # Back from ejection on probation: one more failure ejects it again
+        proxy.failures = self._eject_after - 1
+        print(f"Proxy {proxy.label} ejected for {cooldown:.0f}s")
+
+    async def check(self, proxy: Proxy) -> None:
+        started = time.monotonic()
+        try:
+            async with httpx.AsyncClient(proxy=proxy.url, timeout=self._health_timeout) as client:
+                response = await client.get(self._health_url)
+            ok = response.status_code < 500
+        except ImportError:
+            # socks:// needs httpx[socks]; such proxies are judged by jobs only
+            return
+        except Exception:
+            ok = False
+        proxy.checks += 1
+        if ok:
+            elapsed = time.monotonic() - started
+            proxy.latency = elapsed if proxy.latency is None else proxy.latency + self._alpha * (elapsed - proxy.latency)
+        else:
+            proxy.check_failures += 1
+        # Checks never end an ejection early: the proxy may be reachable yet
+        # still rate-limited by the platform
+        if proxy.healthy(time.monotonic()):
+            self._record(proxy, ok)
+
+    async def run(self, interval: float) -> None:
+        while True:
+            await asyncio.gather(*(self.check(p) for p in self.proxies.values()))
+            await asyncio.sleep(interval)
+
+    def stats(self) -> dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "sticky_keys": len(self._sticky),
+            "sticky_hits": self.sticky_hits,
+            "proxies": {label: p.stats(now) for label, p in self.proxies.items()},
+        }
@@ -0,0 +1,160 @@
+"""Disk quota for the downloads directory.
+
+Before a job downloads anything it reserves the size yt-dlp expects the file
+to have. When finished files plus reservations cross the high-water mark,
+the least recently served blobs are evicted down to the low-water mark. A job
+that still does not fit waits for space, and fails with 503 if none frees up
+in time. A job that could never fit fails with 507.
+"""
+import asyncio
+import os
+import shutil
+import time
+from typing import Any
+
+from fastapi import HTTPException
+
+from .blobs import BlobStore
+
+
+def estimate_size(info: dict[str, Any]) -> int | None:
+    """Expected download size in bytes from a slimmed info dict, if known."""
+    def size_of(d: dict[str, Any]) -> int | None:
+        size = d.get("filesize") or d.get("filesize_approx")
+        if not size and d.get("tbr") and info.get("duration"):
+            # tbr is in KBit/s
+            size = d["tbr"] * 1000 / 8 * info["duration"]
+        return int(size) if size else None
+
+    parts = [size_of(f) for f in info.get("requested_formats") or []]
+    if parts and all(parts):
+        return sum(parts)
+    return size_of(info)
+
+
+class DiskQuota:
+    def __init__(
+        self,
+        blobs: BlobStore,
+        max_bytes: int = 0,
+        min_free_bytes: int = 0,
+        high_water: float = 0.9,
+        low_water: float = 0.75,
+        wait_timeout: float = 60.0,
+        default_estimate: int = 64 * 1024 * 1024,
+    ) -> None:
+        self._blobs = blobs
+        self._max_bytes = max_bytes
+        self._min_free_bytes = min_free_bytes
+        self._high_water = high_water
+        self._low_water = low_water
+        self._wait_timeout = wait_timeout
+        self._default_estimate = default_estimate
+        self._reservations: dict[str, int] = {}
+        self._changed: asyncio.Event | None = None
+        self.evictions = 0
+        self.evicted_bytes = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def capacity(self) -> int:
+        if self._max_bytes:
+            return self._max_bytes
+        # Without a configured quota, finished files may grow into the free
+        # space of the volume (minus a safety margin). What running jobs have
+        # already written is gone from the free space but still counted in
+        # their reservations, so it is added back.
+        free = shutil.disk_usage(self._blobs.root).free
+        written = sum(min(self._written(job_id), size) for job_id, size in self._reservations.items())
+        return max(0, self._blobs.bytes + free + written - self._min_free_bytes)
+
+    def _written(self, job_id: str) -> int:
+        # Allocated blocks, which is what the free space counts (the segmented
+        # fetcher preallocates the whole file up front)
+        total = 0
+        try:
+            entries = list(os.scandir(self._blobs.incoming / job_id))
+        except OSError:
+            return 0
+        for entry in entries:
+            try:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_blocks * 512
+            except OSError:
+                pass
+        return total
+
+    def used(self) -> int:
+        return self._blobs.bytes + sum(self._reservations.values())
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    def evict(self, incoming: int = 0) -> int:
+        """Evict LRU blobs if usage (plus ``incoming``) is over the high-water mark."""
+        capacity = self.capacity()
+        if self.used() + incoming <= capacity * self._high_water:
+            return 0
+        freed = 0
+        for blob_id in self._blobs.least_recent():
+            if self.used() + incoming <= capacity * self._low_water:
+                break
+            size = self._blobs.evict(blob_id)
+            freed += size
+            self.evictions += 1
+        self.evicted_bytes += freed
+        return freed
+
+    async def reserve(self, job_id: str, size: int | None) -> None:
+        """Reserve ``size`` bytes for a job, evicting or waiting as needed.
+
+        An unknown size reserves a default guess, capped so it alone never
+        rejects the job.
+        """
+        if size is None:
+            size = min(self._default_estimate, int(self.capacity() * self._low_water))
+        if size > self.capacity() * self._high_water:
+            self.rejected += 1
+            raise HTTPException(status_code=507, detail="Video is too large for the available storage.")
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        deadline = time.monotonic() + self._wait_timeout
+        while True:
+            self.evict(size)
+            if self.used() + size <= self.capacity() * self._high_water:
+                self._reservations[job_id] = size
+                return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.timeouts += 1
+                raise HTTPException(
+                    status_code=503,
+                    detail="Storage is full. Try again later.",
+                    headers={"Retry-After": str(max(1, int(self._wait_timeout)))},
+                )
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def release(self, job_id: str) -> None:
+        if self._reservations.pop(job_id, None) is not None:
+            self._notify()
+
+    def freed(self) -> None:
+        """Call when blobs were deleted outside the quota (expiry)."""
+        self._notify()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "capacity_bytes": self.capacity(),
+            "used_bytes": self._blobs.bytes,
+            "reserved_bytes": sum(self._reservations.values()),
+            "reservations": len(self._reservations),
+            "evictions": self.evictions,
+            "evicted_bytes": self.evicted_bytes,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+        }
@@ -0,0 +1,124 @@
+"""Adaptive per-platform rate limiting.
+
+Each (platform, egress) pair has a token bucket that paces job starts. Its
+rate follows AIMD: every upstream 429 / "rate limit" halves it and pauses
+the bucket for a cooldown, every success adds a small step back, between a
+floor and a ceiling. The same rate scales the ``--sleep-requests`` handed to
+yt-dlp, so requests inside a job slow down together with job starts.
+"""
+import asyncio
+import time
+from typing import Any
+
+
+class AdaptiveBucket:
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float) -> None:
+        self.rate = rate
+        self._min_rate = min_rate
+        self._max_rate = max_rate
+        self._burst = max(1.0, burst)
+        self._tokens = self._burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+        self.successes = 0
+        self.limited = 0
+        self.waited = 0.0
+
+    def _refill(self, now: float) -> None:
+        start = max(self._updated, self._paused_until)
+        if now > start:
+            self._tokens = min(self._burst, self._tokens + (now - start) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # The lock makes waiters take tokens in arrival order
+        async with self._lock:
+            started = time.monotonic()
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    self.waited += now - started
+                    return
+                delay = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+                await asyncio.sleep(max(0.01, delay))
+
+    def on_success(self, step: float) -> None:
+        self.successes += 1
+        self.rate = min(self._max_rate, self.rate + step)
+
+    def on_rate_limited(self, factor: float, cooldown: float) -> None:
+        self.limited += 1
+        self.rate = max(self._min_rate, self.rate * factor)
+        self._tokens = 0
+        self._paused_until = max(self._paused_until, time.monotonic() + cooldown)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "per_minute": round(self.rate * 60, 2),
+            "paused_for": round(max(0.0, self._paused_until - time.monotonic()), 1),
+            "successes": self.successes,
+            "rate_limited": self.limited,
+            "wait_seconds": round(self.waited, 1),
+        }
+
+
+class AdaptiveLimiter:
+    """Buckets keyed by (platform, egress); rates are in jobs per minute."""
+
+    def __init__(
+        self,
+        per_minute: float = 30,
+        min_per_minute: float = 2,
+        max_per_minute: float = 120,
+        overrides: dict[str, float] | None = None,
+        burst: float = 3,
+        backoff: float = 0.5,
+        recover_per_minute: float = 1,
+        cooldown: float = 30,
+        base_sleep: float = 1.0,
+    ) -> None:
+        self._per_minute = per_minute
+        self._min = min_per_minute / 60
+        self._max = max_per_minute / 60
+        self._overrides = overrides or {}
+        self._burst = burst
+        self._backoff = backoff
+        self._step = recover_per_minute / 60
+        self._cooldown = cooldown
+        self._base_sleep = base_sleep
+        self._buckets: dict[tuple[str, str], AdaptiveBucket] = {}
+
+    def _bucket(self, platform: str | None, egress: str | None) -> AdaptiveBucket:
+        key = (platform or "default", egress or "direct")
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            rate = self._overrides.get(key[0], self._per_minute) / 60
+            bucket = self._buckets[key] = AdaptiveBucket(
+                min(max(rate, self._min), self._max), self._min, self._max, self._burst
+            )
+        return bucket
+
+    async def acquire(self, platform: str | None, egress: str | None) -> None:
+        await self._bucket(platform, egress).acquire()
+
+    def sleep_requests(self, platform: str | None, egress: str | None) -> float:
+        """Seconds between yt-dlp requests: ``base_sleep`` at the start rate, more when backed off."""
+        bucket = self._bucket(platform, egress)
+        start = self._overrides.get(platform or "default", self._per_minute) / 60
+        return round(self._base_sleep * max(1.0, start / bucket.rate), 2)
+
+    def retry_after(self, platform: str | None, egress: str | None) -> int:
+        bucket = self._bucket(platform, egress)
+        return max(1, round(max(bucket.stats()["paused_for"], 1 / bucket.rate)))
+
+    def success(self, platform: str | None, egress: str | None) -> None:
+        self._bucket(platform, egress).on_success(self._step)
+
+    def rate_limited(self, platform: str | None, egress: str | None) -> None:
+        self._bucket(platform, egress).on_rate_limited(self._backoff, self._cooldown)
+
+    def stats(self) -> dict[str, Any]:
+        return {f"{p}@{e}": b.stats() for (p, e), b in self._buckets.items()}
@@ -0,0 +1,321 @@
+"""Multi-connection download of progressive HTTP(S) formats.
+
+Several CDNs throttle each connection, so one long response (yt-dlp's
+``HttpFD``) runs far below the link speed. Here the file is split into
+fixed-size byte ranges fetched over a small pool of keep-alive connections
+and written in place with ``pwrite`` into a preallocated ``.part`` file.
+Workers take segments in order, so the complete prefix (``contiguous``)
+grows steadily and can be streamed while the rest is still arriving.
+
+The first request doubles as the probe: a 200 instead of 206 means the
+server ignores ranges, and that response is simply read to the end.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+import httpx
+
+from . import errors
+from .engine import EngineResult, OnProgress, slim_info
+from .errors import Failure
+from .progress import progress_event
+
+# Attributes yt-dlp appends to each cookie in an info dict's "cookies" field
+_COOKIE_ATTRS = {"domain", "path", "secure", "expires", "version"}
+_CONTENT_RANGE = re.compile(r"bytes (\d+)-(\d+)/(\d+)")
+# Bytes buffered per connection before each pwrite
+WRITE_BYTES = 1024 * 1024
+
+
+class TooLarge(Exception):
+    pass
+
+
+def pwrite(fd: int, data: bytes, pos: int) -> None:
+    if hasattr(os, "pwrite"):
+        while data:
+            n = os.pwrite(fd, data, pos)
+            data, pos = data[n:], pos + n
+        return
+    # Windows: every worker has its own descriptor, so seeking is safe
+    os.lseek(fd, pos, os.SEEK_SET)
+    while data:
+        data = data[os.write(fd, data):]
+
+
+def eligible(info: dict[str, Any], min_bytes: int) -> bool:
+    """Single progressive HTTP(S) format not known to be under ``min_bytes``.
+
+    Extractors often omit the size; the probe then finds it, and a file that
+    fits in one segment costs a single request as before.
+    """
+    if info.get("requested_formats") or info.get("protocol") not in ("http", "https"):
+        return False
+    size = info.get("filesize") or info.get("filesize_approx")
+    return size is None or size >= min_bytes
+
+
+def _cookie_header(cookies: str | None) -> str | None:
+    # "a=1; Domain=.x.com; Path=/; Secure; b=2; ..." -> "a=1; b=2"
+    pairs = []
+    for item in (cookies or "").split(";"):
+        name, sep, value = item.strip().partition("=")
+        if sep and name.lower() not in _COOKIE_ATTRS:
+            pairs.append(f"{name}={value}")
+    return "; ".join(pairs) or None
+
+
+class SegmentedDownload:
+    def __init__(
+        self,
+        url: str,
+        path: Path,
+        headers: dict[str, str],
+        proxy: str | None,
+        connections: int = 4,
+        segment_bytes: int = 4 * 1024 * 1024,
+        on_progress: OnProgress | None = None,
+        progress_interval: float = 0.5,
+        max_bytes: int | None = None,
+    ) -> None:
+        self.url = url
+        self.path = path
+        self._headers = headers
+        self._proxy = proxy
+        self._connections = max(1, connections)
+        self._segment = max(256 * 1024, segment_bytes)
+        self._on_progress = on_progress or (lambda event: None)
+        self._interval = progress_interval
+        self._max_bytes = max_bytes
+        self.total: int | None = None
+        self.ranged = False
+        self.requests = 0
+        # Bytes written into each segment so far
+        self._written: list[int] = [0]
+        self._downloaded = 0
+        self._started = 0.0
+        self._reported = 0.0
+        self._validator: str | None = None
+        self._planned = asyncio.Event()
+
+    @property
+    def contiguous(self) -> int:
+        """Length of the fully written prefix of the file."""
+        done = 0
+        for i, n in enumerate(self._written):
+            done += n
+            if n < self._size(i):
+                break
+        return done
+
+    def _size(self, index: int) -> int:
+        if not self.ranged:
+            return self.total if self.total is not None else self._written[0] + 1
+        return min(self._segment, self.total - index * self._segment)
+
+    async def run(self) -> None:
+        self._started = time.monotonic()
+        limits = httpx.Limits(max_connections=self._connections, max_keepalive_connections=self._connections)
+        timeout = httpx.Timeout(30.0, connect=15.0)
+        async with httpx.AsyncClient(
+            proxy=self._proxy, limits=limits, timeout=timeout, headers=self._headers, follow_redirects=True
+        ) as client:
+            await asyncio.to_thread(self.path.write_bytes, b"")
+            probe = asyncio.create_task(self._fetch(client, 0, probe=True))
+            planned = asyncio.create_task(self._planned.wait())
+            tasks = [probe]
+            try:
+                # The other connections start as soon as the probe's headers
+                # reveal the size, not after the first segment has arrived
+                await asyncio.wait({probe, planned}, return_when=asyncio.FIRST_COMPLETED)
+                if self.ranged:
+                    queue = iter(range(1, len(self._written)))
+                    tasks[0] = asyncio.create_task(self._then(probe, self._worker(client, queue)))
+                    tasks += [asyncio.create_task(self._worker(client, queue)) for _ in range(self._connections - 1)]
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in (*tasks, probe):
+                    task.cancel()
+                await asyncio.gather(*tasks, probe, return_exceptions=True)
+                raise
+            finally:
+                planned.cancel()
+        if self.total is not None and self.contiguous != self.total:
+            raise RuntimeError(f"incomplete download: {self.contiguous} of {self.total} bytes")
+        self._on_progress(progress_event("finished", self._downloaded, self.total, None, None))
+
+    @staticmethod
+    async def _then(first: asyncio.Task, then) -> None:
+        # The probe connection joins the pool once segment 0 is in
+        try:
+            await first
+        except BaseException:
+            then.close()
+            raise
+        await then
+
+    async def _worker(self, client: httpx.AsyncClient, queue) -> None:
+        for index in queue:
+            await self._fetch(client, index)
+
+    async def _fetch(self, client: httpx.AsyncClient, index: int, probe: bool = False, attempts: int = 3) -> None:
+        for attempt in range(attempts):
+            try:
+                await self._fetch_once(client, index, probe)
+                return
+            except (httpx.TransportError, RuntimeError):
+                if attempt == attempts - 1:
+                    raise
+                await asyncio.sleep(1 + attempt)
+
+    async def _fetch_once(self, client: httpx.AsyncClient, index: int, probe: bool) -> None:
+        start = index * self._segment + self._written[index]
+        headers = {}
+        if probe and not self._written[0]:
+            headers["Range"] = f"bytes=0-{self._segment - 1}"
+        elif self.ranged:
+            end = index * self._segment + self._size(index) - 1
+            headers["Range"] = f"bytes={start}-{end}"
+            if self._validator:
+                # The file must not change between segments
+                headers["If-Range"] = self._validator
+        elif self._written[0]:
+            # No range support: start over with a plain GET
+            self._downloaded -= self._written[0]
+            self._written[0] = 0
+            start = 0
+        self.requests += 1
+        async with client.stream("GET", self.url, headers=headers) as response:
+            if response.status_code == 206:
+                match = _CONTENT_RANGE.fullmatch(response.headers.get("content-range", ""))
+                if not match or int(match.group(1)) != start:
+                    raise RuntimeError("unexpected Content-Range")
+                if probe and not self.ranged:
+                    self._check_size(int(match.group(3)))
+                    await self._plan(int(match.group(3)), response.headers)
+            elif response.status_code == 200 and (probe or not self.ranged):
+                self.ranged = False
+                length = response.headers.get("content-length")
+                self.total = int(length) if length and length.isdigit() else None
+                self._check_size(self.total)
+                start = 0
+            else:
+                raise RuntimeError(f"HTTP error {response.status_code}")
+            await self._receive(response, index, start)
+
+    def _check_size(self, total: int | None) -> None:
+        if self._max_bytes and total and total > self._max_bytes:
+            raise TooLarge(f"File is larger than max-filesize ({total} bytes > {self._max_bytes} bytes)")
+
+    async def _plan(self, total: int, headers: httpx.Headers) -> None:
+        self.total, self.ranged = total, True
+        # If-Range needs a strong validator
+        etag = headers.get("etag")
+        self._validator = etag if etag and not etag.startswith("W/") else headers.get("last-modified")
+        self._written = [0] * max(1, -(-total // self._segment))
+        # Where the filesystem lacks fallocate, glibc emulates it by writing
+        # to every block: slow, and not safe next to the segments' writes
+        await asyncio.to_thread(_allocate, self.path, total)
+        self._planned.set()
+
+    async def _receive(self, response: httpx.Response, index: int, pos: int) -> None:
+        fd = os.open(self.path, os.O_WRONLY | getattr(os, "O_BINARY", 0))
+        try:
+            base = index * self._segment if self.ranged else 0
+            buffer = bytearray()
+            async for chunk in response.aiter_raw():
+                buffer += chunk
+                if len(buffer) >= WRITE_BYTES:
+                    pos = await self._flush(fd, buffer, index, base, pos)
+                    buffer = bytearray()
+            pos = await self._flush(fd, buffer, index, base, pos)
+            if self.ranged and self._written[index] < self._size(index):
+                raise RuntimeError("segment cut short")
+        finally:
+            os.close(fd)
+
+    async def _flush(self, fd: int, buffer: bytearray, index: int, base: int, pos: int) -> int:
+        if not buffer:
+            return pos
+        if self.ranged and pos + len(buffer) > base + self._size(index):
+            raise RuntimeError("server sent more than the requested range")
+        await asyncio.to_thread(pwrite, fd, bytes(buffer), pos)
+        self._written[index] += len(buffer)
+        self._downloaded += len(buffer)
+        now = time.monotonic()
+        if now - self._reported >= self._interval:
+            self._reported = now
+            speed = self._downloaded / max(now - self._started, 1e-3)
+            eta = (self.total - self._downloaded) / speed if self.total and speed else None
+            self._on_progress(progress_event("downloading", self._downloaded, self.total, speed, eta))
+        return pos + len(buffer)
+
+
+def _allocate(path: Path, size: int) -> None:
+    with open(path, "r+b") as f:
+        try:
+            os.posix_fallocate(f.fileno(), 0, size)
+        except (AttributeError, OSError):
+            f.truncate(size)
+
+
+def _load_info(info_path: str) -> dict[str, Any]:
+    with open(info_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _target(info: dict[str, Any], incoming: Path) -> Path:
+    # Same shape as the job's yt-dlp output template
+    stem = re.sub(r"[^\w.-]", "_", f"{info.get('extractor_key') or 'Generic'}-{info.get('id') or 'video'}")
+    return incoming / f"{stem}.{info.get('ext') or 'mp4'}"
+
+
+async def download(
+    info_path: str,
+    incoming: Path,
+    proxy: str | None,
+    connections: int,
+    segment_bytes: int,
+    on_progress: OnProgress,
+    on_start: Callable[[SegmentedDownload], None] | None = None,
+    max_bytes: int | None = None,
+) -> EngineResult | None:
+    """Download the format in ``info_path``; None if the caller should let yt-dlp do it."""
+    # Info dicts with every format listed run to megabytes
+    info = await asyncio.to_thread(_load_info, info_path)
+    headers = dict(info.get("http_headers") or {})
+    headers.pop("Cookie", None)
+    # Bytes are written as they arrive; never let a proxy compress them
+    headers["Accept-Encoding"] = "identity"
+    cookie = _cookie_header(info.get("cookies"))
+    if cookie:
+        headers["Cookie"] = cookie
+    target = _target(info, incoming)
+    part = target.with_name(target.name + ".part")
+    job = SegmentedDownload(
+        info["url"], part, headers, proxy, connections, segment_bytes, on_progress, max_bytes=max_bytes
+    )
+    if on_start is not None:
+        on_start(job)
+    try:
+        await job.run()
+    except TooLarge as e:
+        part.unlink(missing_ok=True)
+        message = f"ERROR: {e}"
+        return EngineResult(1, None, "", message, Failure(errors.TOO_LARGE, message, None, True))
+    except ImportError:
+        # socks:// proxies need httpx[socks]
+        part.unlink(missing_ok=True)
+        return None
+    except Exception as e:
+        print(f"Segmented download of {info.get('id')} failed, retrying with yt-dlp: {e}")
+        part.unlink(missing_ok=True)
+        return None
+    os.replace(part, target)
+    info["requested_downloads"] = [{"filepath": str(target), "ext": info.get("ext"), "format_id": info.get("format_id")}]
+    return EngineResult(0, slim_info(info), "", "")
@@ -0,0 +1,62 @@
+"""HMAC-signed, expiring download URLs.
+
+A signed URL carries its own expiry and signature in the path, e.g.
+``/signed/files/1760000000/<sig>/<name>``, so it can be checked with one
+HMAC and a constant-time compare, before any disk or database access.
+Expiries are rounded up to a fixed step, which keeps the URL of a file
+stable for a while and lets an edge cache serve repeat downloads.
+"""
+import base64
+import hmac
+import math
+import os
+import secrets
+import time
+from pathlib import Path
+
+
+def load_key(env_value: str, path: Path, shared: bool = False) -> bytes:
+    """Key from the environment, else a random one persisted under ``path``.
+
+    ``shared``: other instances must accept this one's links. A generated key
+    is local to its instance, so the environment has to provide it.
+    """
+    if env_value:
+        return env_value.encode("utf-8")
+    if shared:
+        raise RuntimeError(
+            "URL_SIGNING_KEY must be set when several instances serve links "
+            "(STORAGE_BACKEND=s3 or REPLICAS > 1); each would sign with its own random key"
+        )
+    try:
+        return bytes.fromhex(path.read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        pass
+    key = secrets.token_bytes(32)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(key.hex(), encoding="utf-8")
+    os.replace(tmp, path)
+    return key
+
+
+class UrlSigner:
+    def __init__(self, key: bytes, ttl: int, step: int = 300) -> None:
+        self._key = key
+        self._ttl = ttl
+        self._step = max(1, step)
+
+    def _signature(self, kind: str, name: str, expires: int) -> str:
+        mac = hmac.digest(self._key, f"{kind}/{name}:{expires}".encode("utf-8"), "sha256")
+        return base64.urlsafe_b64encode(mac[:16]).rstrip(b"=").decode("ascii")
+
+    def sign(self, kind: str, name: str, now: float | None = None) -> str:
+        now = time.time() if now is None else now
+        expires = math.ceil((now + self._ttl) / self._step) * self._step
+        return f"/signed/{kind}/{expires}/{self._signature(kind, name, expires)}/{name}"
+
+    def verify(self, kind: str, name: str, expires: int, sig: str, now: float | None = None) -> bool:
+        now = time.time() if now is None else now
+        if expires < now:
+            return False
+        return hmac.compare_digest(sig, self._signature(kind, name, expires))
@@ -0,0 +1,248 @@
+"""Where finished downloads are published.
+
+``local`` serves files from DOWNLOAD_DIR on the instance that downloaded
+them. ``s3`` also publishes every blob to an S3-compatible bucket so any
+replica can answer a link by redirecting to the object. The upload is a
+multipart upload fed while yt-dlp is still writing: each full part of the
+growing file is uploaded in parallel as soon as it exists, and only the
+tail remains when the download finishes.
+"""
+import asyncio
+import importlib.util
+import mimetypes
+import os
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import quote
+
+from .delivery import pread
+
+# S3 requires every part but the last to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+
+
+class LocalStorage:
+    name = "local"
+    remote = False
+
+    def begin(self, key: str, title: str | None = None) -> None:
+        return None
+
+    def url(self, key: str, attachment: bool, expires_in: int) -> str:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def stats(self) -> dict[str, int]:
+        return {}
+
+
+class S3Storage:
+    name = "s3"
+    remote = True
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: str | None = None,
+        region: str | None = None,
+        public_base_url: str | None = None,
+        part_size: int = 8 * 1024 * 1024,
+        concurrency: int = 4,
+    ) -> None:
+        import boto3
+
+        self._client = boto3.client("s3", endpoint_url=endpoint_url or None, region_name=region or None)
+        self._bucket = bucket
+        self._prefix = prefix
+        self._public_base_url = (public_base_url or "").rstrip("/")
+        self._part_size = max(MIN_PART_SIZE, part_size)
+        self._concurrency = max(1, concurrency)
+        self.uploads = 0
+        self.uploaded_bytes = 0
+        self.reuploads = 0
+        self.failures = 0
+
+    def begin(self, key: str, title: str | None = None) -> "MultipartUpload":
+        extra: dict[str, Any] = {"ContentType": mimetypes.guess_type(key)[0] or "application/octet-stream"}
+        if title:
+            extra["ContentDisposition"] = f"attachment; filename*=utf-8''{quote(title)}"
+        return MultipartUpload(self, key, extra)
+
+    def url(self, key: str, attachment: bool, expires_in: int) -> str:
+        if self._public_base_url and attachment:
+            return f"{self._public_base_url}/{self._prefix}{key}"
+        params: dict[str, Any] = {"Bucket": self._bucket, "Key": self._prefix + key}
+        if not attachment:
+            params["ResponseContentDisposition"] = "inline"
+        return self._client.generate_presigned_url("get_object", Params=params, ExpiresIn=max(1, expires_in))
+
+    def delete(self, key: str) -> None:
+        try:
+            self._client.delete_object(Bucket=self._bucket, Key=self._prefix + key)
+        except Exception:
+            # best-effort only; a bucket lifecycle rule catches leftovers
+            pass
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "uploads": self.uploads,
+            "uploaded_bytes": self.uploaded_bytes,
+            "reuploads": self.reuploads,
+            "failures": self.failures,
+        }
+
+
+class MultipartUpload:
+    """One object, uploaded in parts while the source file is still growing.
+
+    At most ``concurrency`` parts are read into memory at a time, so a job
+    holds no more than ``concurrency * part_size`` bytes of upload buffers.
+    """
+
+    def __init__(self, storage: S3Storage, key: str, extra: dict[str, Any]) -> None:
+        self._storage = storage
+        self._client = storage._client
+        self._bucket = storage._bucket
+        self.key = key
+        self._key = storage._prefix + key
+        self._extra = extra
+        self._upload_id: str | None = None
+        self._fd: int | None = None
+        self._offset = 0
+        self._etags: dict[int, str] = {}
+        self._tasks: list[asyncio.Task] = []
+        self._slots = asyncio.Semaphore(storage._concurrency)
+
+    async def follow(
+        self,
+        find: Callable[[], Path | None],
+        done: Callable[[], bool],
+        poll: float = 0.2,
+        available: Callable[[], int | None] | None = None,
+    ) -> None:
+        """Upload full parts of the file ``find`` returns until ``done()``.
+
+        ``available`` gives how many leading bytes are final when the file
+        is not written front to back; by default that is its size.
+        """
+        part_size = self._storage._part_size
+        while self._fd is None:
+            if done():
+                return
+            path = find()
+            if path is not None:
+                try:
+                    self._fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+                    break
+                except OSError:
+                    pass
+            await asyncio.sleep(poll)
+        while not done():
+            while self._available(available) - self._offset >= part_size:
+                await self._submit(part_size)
+            await asyncio.sleep(poll)
+
+    def _available(self, available: Callable[[], int | None] | None) -> int:
+        size = available() if available is not None else None
+        return os.fstat(self._fd).st_size if size is None else size
+
+    async def _submit(self, length: int) -> None:
+        if self._upload_id is None:
+            resp = await asyncio.to_thread(
+                self._client.create_multipart_upload, Bucket=self._bucket, Key=self._key, **self._extra
+            )
+            self._upload_id = resp["UploadId"]
+        slots = self._slots
+        await slots.acquire()
+        number = len(self._tasks) + 1
+        self._tasks.append(asyncio.create_task(self._upload_part(slots, self._fd, number, self._offset, length)))
+        self._offset += length
+
+    async def _upload_part(self, slots: asyncio.Semaphore, fd: int, number: int, offset: int, length: int) -> None:
+        try:
+            data = await asyncio.to_thread(pread, fd, length, offset)
+            resp = await asyncio.to_thread(
+                self._client.upload_part,
+                Bucket=self._bucket, Key=self._key, UploadId=self._upload_id, PartNumber=number, Body=data,
+            )
+            self._etags[number] = resp["ETag"]
+            self._storage.uploaded_bytes += len(data)
+        finally:
+            slots.release()
+
+    async def complete(self, final_path: Path) -> bool:
+        """Upload the rest of ``final_path`` and publish the object."""
+        try:
+            st = os.stat(final_path)
+            # Parts sent while tailing are only valid if the finished file is
+            # the one that was tailed (post-processors write a new file).
+            if self._fd is None or os.fstat(self._fd).st_ino != st.st_ino or st.st_size < self._offset:
+                if self._fd is not None:
+                    self._storage.reuploads += 1
+                # Start over; parts still in flight belong to the aborted upload
+                await self.abort()
+                self._fd = os.open(final_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+            while True:
+                length = min(self._storage._part_size, st.st_size - self._offset)
+                if length <= 0 and self._tasks:
+                    break
+                await self._submit(max(0, length))
+                if length <= 0:
+                    break
+            await asyncio.gather(*self._tasks)
+            await asyncio.to_thread(
+                self._client.complete_multipart_upload,
+                Bucket=self._bucket,
+                Key=self._key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": [{"PartNumber": n, "ETag": e} for n, e in sorted(self._etags.items())]},
+            )
+            self._storage.uploads += 1
+            return True
+        except Exception as e:
+            print(f"Upload of {self._key} failed: {e}")
+            self._storage.failures += 1
+            await self.abort()
+            return False
+        finally:
+            self._close()
+
+    async def _reset(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks, self._etags, self._offset = [], {}, 0
+        self._slots = asyncio.Semaphore(self._storage._concurrency)
+        self._close()
+
+    async def abort(self) -> None:
+        await self._reset()
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            try:
+                await asyncio.to_thread(
+                    self._client.abort_multipart_upload, Bucket=self._bucket, Key=self._key, UploadId=upload_id
+                )
+            except Exception:
+                pass
+
+    def _close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def make_storage(kind: str, **s3_options: Any):
+    kind = (kind or "").strip().lower()
+    if kind == "local":
+        return LocalStorage()
+    if kind == "s3":
+        if importlib.util.find_spec("boto3") is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 (pip install boto3)")
+        if not s3_options.get("bucket"):
+            raise RuntimeError("STORAGE_BACKEND=s3 needs S3_BUCKET")
+        return S3Storage(**s3_options)
+    raise ValueError(f"Unknown storage backend: {kind!r}")
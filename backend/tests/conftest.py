@@ -0,0 +1,103 @@
+"""Runs the app in a uvicorn thread against local stub servers.
+
+Settings are read when ``backend.main`` is imported, so the environment is
+prepared first; tests tune the module's settings with ``monkeypatch``.
+"""
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+os.environ.update(
+    STATE_DIR=tempfile.mkdtemp(prefix="svd-state-"),
+    JOB_STORE="memory",
+    YTDLP_ENGINE="inprocess",
+    YTDLP_WORKERS="1",
+    YTDLP_UPDATE_INTERVAL_HOURS="0",
+    PROXY_URLS="",
+    RATE_LIMIT_PER_MINUTE="6000",
+    RATE_LIMIT_MAX_PER_MINUTE="6000",
+    RATE_LIMIT_BASE_SLEEP="0",
+    CANCEL_ON_DISCONNECT_SECONDS="1",
+)
+
+import uvicorn  # noqa: E402
+
+from backend import main  # noqa: E402
+from backend.storage import MIN_PART_SIZE, S3Storage  # noqa: E402
+from backend.tests.stubs import HungServer, MediaServer  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def app():
+    before = set(main.DOWNLOAD_DIR.iterdir())
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    server = uvicorn.Server(uvicorn.Config(main.app, log_level="warning"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            pytest.fail("uvicorn did not start")
+        time.sleep(0.05)
+    yield SimpleNamespace(main=main, url=f"http://127.0.0.1:{sock.getsockname()[1]}")
+    server.should_exit = True
+    thread.join(30)
+    # Files the tests downloaded
+    for path in set(main.DOWNLOAD_DIR.iterdir()) - before:
+        if path.is_file():
+            path.unlink()
+    shutil.rmtree(main.STATE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def client(app):
+    with httpx.Client(base_url=app.url, timeout=60) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def slow_media():
+    # 32 MiB at 2 MiB/s per connection: a download runs for a while
+    server = MediaServer(32 * 1024 * 1024, 2 * 1024 * 1024)
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def fast_media():
+    server = MediaServer(256 * 1024)
+    yield server
+    server.close()
+
+
+@pytest.fixture(scope="session")
+def hung():
+    server = HungServer()
+    yield server
+    server.close()
+
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """S3Storage on moto's in-process S3, bucket "downloads", smallest parts S3 allows."""
+    moto = pytest.importorskip("moto")
+    for name, value in (("AWS_ACCESS_KEY_ID", "testing"), ("AWS_SECRET_ACCESS_KEY", "testing"),
+                        ("AWS_DEFAULT_REGION", "us-east-1")):
+        monkeypatch.setenv(name, value)
+    with moto.mock_aws():
+        storage = S3Storage("downloads", prefix="media/", part_size=MIN_PART_SIZE, concurrency=2)
+        storage._client.create_bucket(Bucket="downloads")
+        yield storage
@@ -0,0 +1,391 @@
+"""Local stand-ins for the platforms the service downloads from and the proxies in between."""
+import collections
+import http.server
+import os
+import re
+import select
+import socket
+import socketserver
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlsplit
+
+
+class _MediaHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "MediaServer"
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def do_HEAD(self) -> None:
+        self.do_GET(head=True)
+
+    def do_GET(self, head: bool = False) -> None:
+        path = self.path.split("?")[0]
+        self.server.hits[path] += 1
+        with self.server.lock:
+            self.server.active += 1
+            self.server.peak_active = max(self.server.peak_active, self.server.active)
+        try:
+            time.sleep(self.server.latency)
+            self._respond(path, head)
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def _respond(self, path: str, head: bool) -> None:
+        # /range/<name>.mp4 honours Range requests, /norange/<name>.mp4 ignores
+        # them; /hls/<name>.m3u8 lists the data as segments /hls/<name>/<i>.ts
+        # and /dash/<name>.mpd as the one segment of its best representation;
+        # /formats/<name>.mpd offers FORMATS, each one segment /formats/<name>/<id>.m4s
+        kind = path.split("/")[1]
+        data = self.server.data
+        if kind == "hls" and path.endswith(".m3u8"):
+            self._send(200, "application/vnd.apple.mpegurl", self.server.playlist(path[len("/hls/"):-len(".m3u8")]), head)
+            return
+        if kind == "dash" and path.endswith(".mpd"):
+            query = dict(parse_qsl(urlsplit(self.path).query))
+            manifest = self.server.manifest(
+                path[len("/dash/"):-len(".mpd")], int(query.get("representations", 20)), int(query.get("fragments", 600))
+            )
+            self._send(200, "application/dash+xml", manifest, head)
+            return
+        if re.fullmatch(r"/dash/[^/]+/best\.m4s", path):
+            self._send(200, "video/mp4", data, head)
+            return
+        if kind == "formats" and path.endswith(".mpd"):
+            self._send(200, "application/dash+xml", self.server.formats_manifest(path[len("/formats/"):-len(".mpd")]), head)
+            return
+        match = re.fullmatch(r"/formats/[^/]+/([\w-]+)\.m4s", path)
+        if match and match.group(1) in self.server.FORMATS:
+            self._send(200, "video/mp4", data[:self.server.FORMATS[match.group(1)][2]], head)
+            return
+        match = re.fullmatch(r"/hls/[^/]+/(\d+)\.ts", path)
+        if match and int(match.group(1)) < self.server.segments:
+            start = int(match.group(1)) * self.server.segment_bytes
+            self._send(200, "video/mp2t", data[start:start + self.server.segment_bytes], head)
+            return
+        if kind not in ("range", "norange"):
+            self.send_error(404)
+            return
+        start, end, code = 0, len(data) - 1, 200
+        match = re.fullmatch(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        if kind == "range" and match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else end, end)
+            code = 206
+        self.send_response(code)
+        self.send_header("Content-Type", "video/mp4")
+        if kind == "range":
+            self.send_header("Accept-Ranges", "bytes")
+        if code == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        if not head:
+            self._write(data, start, end)
+
+    def _send(self, code: int, content_type: str, body: bytes, head: bool) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self._write(body, 0, len(body) - 1)
+
+    def _write(self, data: bytes, start: int, end: int) -> None:
+        began, sent = time.monotonic(), 0
+        try:
+            while start + sent <= end:
+                chunk = data[start + sent:min(start + sent + 64 * 1024, end + 1)]
+                self.wfile.write(chunk)
+                sent += len(chunk)
+                self.server.sent[self.path.split("?")[0]] += len(chunk)
+                # Hold each connection to the server's bandwidth
+                lag = sent / self.server.bandwidth - (time.monotonic() - began)
+                if lag > 0:
+                    time.sleep(lag)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+class MediaServer(http.server.ThreadingHTTPServer):
+    """Serves ``size`` random bytes as any ``.mp4`` name, ``bandwidth`` bytes/s per connection.
+
+    The same bytes are also an HLS stream of ``segment_bytes`` segments, and
+    the first bytes of them each of the ``FORMATS`` a formats manifest offers.
+    Every request waits ``latency`` seconds before it is answered;
+    ``peak_active`` is the most requests in flight at once.
+    """
+
+    daemon_threads = True
+    # id -> (codecs, height, bytes) of a 10 s video as a platform lists it:
+    # pre-muxed formats, video-only ones to merge with the audio-only one
+    FORMATS = {
+        "mux360": ("avc1.64001e,mp4a.40.2", 360, 2_500_000),
+        "mux720": ("avc1.64001f,mp4a.40.2", 720, 7_000_000),
+        "v480": ("avc1.64001e", 480, 3_000_000),
+        "v720": ("avc1.64001f", 720, 6_000_000),
+        "v1080": ("avc1.640028", 1080, 14_000_000),
+        "a128": ("mp4a.40.2", None, 500_000),
+    }
+
+    def __init__(
+        self, size: int, bandwidth: float = 64 * 1024 * 1024, segment_bytes: int = 256 * 1024, latency: float = 0
+    ) -> None:
+        super().__init__(("127.0.0.1", 0), _MediaHandler)
+        self.data = os.urandom(size)
+        self.bandwidth = bandwidth
+        self.segment_bytes = segment_bytes
+        self.segments = -(-size // segment_bytes)
+        self.latency = latency
+        self.hits: collections.Counter[str] = collections.Counter()
+        # Body bytes written per path
+        self.sent: collections.Counter[str] = collections.Counter()
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak_active = 0
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def playlist(self, name: str) -> bytes:
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:2", "#EXT-X-MEDIA-SEQUENCE:0",
+                 "#EXT-X-PLAYLIST-TYPE:VOD"]
+        for i in range(self.segments):
+            lines += ["#EXTINF:2.0,", f"{name}/{i}.ts"]
+        return "\n".join(lines + ["#EXT-X-ENDLIST", ""]).encode("ascii")
+
+    def manifest(self, name: str, representations: int, fragments: int) -> bytes:
+        """A DASH manifest whose info dict is big: every lesser representation lists ``fragments`` fragments."""
+        # Long segment names, as CDNs sign them
+        token = "t" * 96
+        lesser = "".join(
+            f'<Representation id="{i}" bandwidth="{100_000 * (i + 1)}" width="{160 * (i + 1)}" height="{90 * (i + 1)}">'
+            f'<SegmentTemplate media="{name}/{i}/{token}/$Number$.m4s" startNumber="1" duration="1" timescale="1"/>'
+            "</Representation>"
+            for i in range(representations - 1)
+        )
+        best = (
+            f'<Representation id="best" bandwidth="{100_000_000}" width="3840" height="2160">'
+            f'<SegmentList duration="{fragments}" timescale="1"><SegmentURL media="{name}/best.m4s"/></SegmentList>'
+            "</Representation>"
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011"'
+            f' minBufferTime="PT2S" mediaPresentationDuration="PT{fragments}S"><Period>'
+            '<AdaptationSet mimeType="video/mp4" codecs="avc1.64001f,mp4a.40.2">'
+            f"{lesser}{best}</AdaptationSet></Period></MPD>"
+        ).encode("utf-8")
+
+    def formats_manifest(self, name: str) -> bytes:
+        """A DASH manifest of ``FORMATS``; sizes are only given as bandwidth, as usual."""
+        sets = []
+        for id_, (codecs, height, size) in self.FORMATS.items():
+            mime, dimensions = ("video/mp4", f' width="{height * 16 // 9}" height="{height}"') if height else ("audio/mp4", "")
+            sets.append(
+                f'<AdaptationSet mimeType="{mime}"><Representation id="{id_}" codecs="{codecs}"'
+                f' bandwidth="{size * 8 // 10}"{dimensions}>'
+                f'<SegmentList duration="10" timescale="1"><SegmentURL media="{name}/{id_}.m4s"/></SegmentList>'
+                "</Representation></AdaptationSet>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<MPD xmlns="urn:mpeg:dash:schema:mpd:2011" type="static" profiles="urn:mpeg:dash:profile:isoff-on-demand:2011"'
+            f' minBufferTime="PT2S" mediaPresentationDuration="PT10S"><Period>{"".join(sets)}</Period></MPD>'
+        ).encode("utf-8")
+
+    def handle_error(self, request, client_address) -> None:
+        # Clients drop connections all the time here (cancelled jobs, keep-alive)
+        pass
+
+    def url(self, name: str, ranged: bool = True) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/{'range' if ranged else 'norange'}/{name}.mp4"
+
+    def hls_url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/hls/{name}.m3u8"
+
+    def dash_url(self, name: str, representations: int = 20, fragments: int = 600) -> str:
+        return (f"http://127.0.0.1:{self.server_address[1]}/dash/{name}.mpd"
+                f"?representations={representations}&fragments={fragments}")
+
+    def formats_url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/formats/{name}.mpd"
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class HungServer:
+    """Accepts connections and never answers."""
+
+    def __init__(self) -> None:
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen(64)
+        self._conns: list[socket.socket] = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self._conns.append(conn)
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self._sock.getsockname()[1]}/{name}.mp4"
+
+    def close(self) -> None:
+        for conn in self._conns:
+            conn.close()
+        self._sock.close()
+
+
+class _ProxyHandler(socketserver.BaseRequestHandler):
+    server: "ProxyServer"
+
+    def handle(self) -> None:
+        if self.server.down:
+            return
+        # SOCKS5 greetings start with the version byte, HTTP with a method name
+        if self.request.recv(1, socket.MSG_PEEK) == b"\x05":
+            self._socks5()
+        else:
+            self._http()
+
+    def _read(self, count: int) -> bytes:
+        data = b""
+        while len(data) < count:
+            chunk = self.request.recv(count - len(data))
+            if not chunk:
+                raise ConnectionError("client went away")
+            data += chunk
+        return data
+
+    def _connect(self, host: str, port: int) -> socket.socket | None:
+        try:
+            upstream = socket.create_connection((host, port), timeout=10)
+        except OSError:
+            return None
+        upstream.settimeout(None)
+        self.server.hits[f"{host}:{port}"] += 1
+        return upstream
+
+    def _socks5(self) -> None:
+        _, count = self._read(2)
+        methods = self._read(count)
+        if 0 in methods:
+            self.request.sendall(b"\x05\x00")
+        elif 2 in methods:
+            # Username/password: any credentials will do
+            self.request.sendall(b"\x05\x02")
+            self._read(1)
+            self._read(self._read(1)[0])
+            self._read(self._read(1)[0])
+            self.request.sendall(b"\x01\x00")
+        else:
+            self.request.sendall(b"\x05\xff")
+            return
+        _, command, _, kind = self._read(4)
+        if kind == 1:
+            host = socket.inet_ntoa(self._read(4))
+        elif kind == 4:
+            host = socket.inet_ntop(socket.AF_INET6, self._read(16))
+        else:
+            host = self._read(self._read(1)[0]).decode("idna")
+        port = int.from_bytes(self._read(2), "big")
+        upstream = self._connect(host, port) if command == 1 else None
+        if upstream is None:
+            self.request.sendall(b"\x05\x05\x00\x01" + bytes(6))
+            return
+        self.request.sendall(b"\x05\x00\x00\x01" + bytes(6))
+        self._relay(upstream)
+
+    def _http(self) -> None:
+        head = b""
+        while not head.endswith(b"\r\n\r\n"):
+            head += self._read(1)
+        request_line, *lines = head.decode("latin-1").split("\r\n")
+        method, target, version = request_line.split()
+        if method == "CONNECT":
+            host, _, port = target.rpartition(":")
+            upstream = self._connect(host.strip("[]"), int(port))
+            if upstream is None:
+                self.request.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+                return
+            self.request.sendall(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            self._relay(upstream)
+            return
+        parts = urlsplit(target)
+        upstream = self._connect(parts.hostname, parts.port or 80)
+        if upstream is None:
+            self.request.sendall(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+            return
+        # One request per connection, which both ends are told about
+        hop_by_hop = ("connection", "proxy-connection", "proxy-authorization", "keep-alive")
+        headers = [line for line in lines if line and line.split(":", 1)[0].strip().lower() not in hop_by_hop]
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        request = "\r\n".join([f"{method} {path} {version}", *headers, "Connection: close", "", ""])
+        upstream.sendall(request.encode("latin-1"))
+        self._relay(upstream, close_response=True)
+
+    def _relay(self, upstream: socket.socket, close_response: bool = False) -> None:
+        with upstream:
+            while True:
+                readable, _, _ = select.select([self.request, upstream], [], [], 60)
+                if not readable:
+                    return
+                for sock in readable:
+                    data = sock.recv(64 * 1024)
+                    if not data:
+                        return
+                    if sock is upstream and close_response:
+                        status, _, rest = data.partition(b"\r\n")
+                        data = status + b"\r\nConnection: close\r\n" + rest
+                        close_response = False
+                    (upstream if sock is self.request else self.request).sendall(data)
+
+
+class ProxyServer(socketserver.ThreadingTCPServer):
+    """Forward proxy speaking HTTP (absolute URIs and CONNECT) and SOCKS5 on one port.
+
+    ``hits`` counts the connections it opened by target ``host:port``. While
+    ``down`` is set it hangs up on every client straight away.
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _ProxyHandler)
+        self.hits: collections.Counter[str] = collections.Counter()
+        # Body bytes written per path
+        self.sent: collections.Counter[str] = collections.Counter()
+        self.down = False
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def handle_error(self, request, client_address) -> None:
+        pass
+
+    def url(self, scheme: str = "http", auth: str = "") -> str:
+        return f"{scheme}://{auth + '@' if auth else ''}127.0.0.1:{self.server_address[1]}"
+
+    def close(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def unique(prefix: str) -> str:
+    # Finished downloads are reused by URL and media id, so each test names its own media
+    return f"{prefix}-{os.urandom(4).hex()}"
+
+
+def installed_ytdlp() -> str:
+    # No yt-dlp executable on PATH is needed: SubprocessEngine runs the
+    # installed package with python -m when given its directory
+    import yt_dlp
+
+    return str(Path(yt_dlp.__file__).resolve().parents[1])
@@ -0,0 +1,43 @@
+"""The blob index is persisted in the background, not on every change."""
+import asyncio
+import json
+
+from backend.blobs import BlobStore
+
+
+def ingest(blobs: BlobStore, name: str) -> None:
+    src = blobs.incoming_dir(name) / f"{name}.mp4"
+    src.write_bytes(name.encode())
+    blobs.ingest(src, {"id": name, "extractor_key": "Generic", "ext": "mp4", "title": name}, f"job:{name}")
+
+
+def test_changes_are_saved_in_the_background(tmp_path):
+    index = tmp_path / "blobs.json"
+    blobs = BlobStore(tmp_path, index, save_interval=0.05)
+
+    async def main():
+        task = asyncio.create_task(blobs.run())
+        for i in range(100):
+            ingest(blobs, f"clip{i}")
+        # Nothing was written on the event loop
+        assert not index.exists()
+        await asyncio.sleep(0.2)
+        assert len(json.loads(index.read_text())) == 100
+        blobs.release("job:clip0")
+        await asyncio.sleep(0.2)
+        task.cancel()
+
+    asyncio.run(main())
+    assert len(json.loads(index.read_text())) == 99
+
+
+def test_flush_saves_pending_changes(tmp_path):
+    index = tmp_path / "blobs.json"
+    blobs = BlobStore(tmp_path, index)
+    ingest(blobs, "clip")
+    blobs.flush()
+
+    reloaded = BlobStore(tmp_path, index)
+    reloaded.load()
+    assert reloaded.stats()["blobs"] == 1
+    assert not index.with_suffix(".tmp").exists()
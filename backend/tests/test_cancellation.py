@@ -0,0 +1,265 @@
+"""Every way a job is cancelled: DELETE, clients leaving and phase deadlines."""
+import asyncio
+import os
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+from backend import main
+from backend.engine import SubprocessEngine
+from backend.tests.stubs import installed_ytdlp, unique
+
+
+@pytest.fixture(params=["inprocess", "subprocess", "segmented"])
+def engine(request, app, monkeypatch):
+    """Downloads go through the warm workers, the yt-dlp CLI or the segmented fetcher."""
+    if request.param != "segmented":
+        monkeypatch.setattr(main, "SEGMENTED_CONNECTIONS", 1)
+    if request.param == "subprocess":
+        site = installed_ytdlp()
+        monkeypatch.setattr(main, "engine", SubprocessEngine(main.YT_DLP_LINE_LIMIT, ytdlp_path=lambda: site))
+    return request.param
+
+
+def wait_for(predicate, timeout: float = 30, interval: float = 0.1):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        value = predicate()
+        if value:
+            return value
+        time.sleep(interval)
+    raise AssertionError("timed out")
+
+
+def wait_status(client, job_id: str, *statuses: str, timeout: float = 30) -> dict:
+    return wait_for(lambda: (job := client.get(f"/jobs/{job_id}").json())["status"] in statuses and job, timeout)
+
+
+def downloading(job_id: str) -> bool:
+    incoming = main.blobs.incoming / job_id
+    return incoming.is_dir() and any(p.name != "info.json" and p.stat().st_size for p in incoming.iterdir())
+
+
+def processes_for(name: str) -> list[int]:
+    """Live processes whose command line mentions ``name``."""
+    pids = []
+    for proc in Path("/proc").iterdir():
+        try:
+            cmdline = (proc / "cmdline").read_bytes()
+            state = (proc / "stat").read_text().rsplit(")", 1)[1].split()[0]
+        except (OSError, IndexError):
+            continue
+        if name.encode() in cmdline and state != "Z":
+            pids.append(int(proc.name))
+    return pids
+
+
+def submit(client, url: str, **headers) -> str:
+    response = client.post("/jobs", json={"url": url}, headers=headers)
+    assert response.status_code == 202, response.text
+    return response.json()["job_id"]
+
+
+def test_delete_queued_and_running_job(client, engine, slow_media, fast_media, monkeypatch):
+    monkeypatch.setattr(main.job_queue, "_max_running", 1)
+    running_name, queued_name = unique("running"), unique("queued")
+    running = submit(client, slow_media.url(running_name))
+    queued = submit(client, slow_media.url(queued_name))
+    wait_for(lambda: downloading(running))
+
+    response = client.delete(f"/jobs/{queued}")
+    assert response.status_code == 200
+    assert response.json()["status"] == "cancelled"
+    assert response.json()["status_code"] == 499
+    assert slow_media.hits[f"/range/{queued_name}.mp4"] == 0
+
+    response = client.delete(f"/jobs/{running}")
+    assert response.status_code in (200, 202)
+    job = wait_status(client, running, "cancelled", "done", "error", timeout=10)
+    assert job["status"] == "cancelled"
+    # yt-dlp (and any child of it) is gone, and so are its .part files
+    wait_for(lambda: not processes_for(running_name), timeout=5)
+    assert not (main.blobs.incoming / running).exists()
+    assert not list(main.DOWNLOAD_DIR.glob(f"*{running_name}*"))
+
+    assert client.delete(f"/jobs/{running}").status_code == 409
+    assert client.delete(f"/jobs/{'0' * 32}").status_code == 404
+    # The engine is still usable
+    response = client.post("/download", json={"url": fast_media.url(unique("after"))})
+    assert response.status_code == 200, response.text
+
+
+def test_delete_by_one_coalesced_submitter_keeps_job(client, slow_media):
+    url = slow_media.url(unique("shared"))
+    job_id = submit(client, url, **{"X-Forwarded-For": "198.51.100.1"})
+    assert submit(client, url, **{"X-Forwarded-For": "198.51.100.2"}) == job_id
+    wait_for(lambda: downloading(job_id))
+
+    response = client.delete(f"/jobs/{job_id}", headers={"X-Forwarded-For": "198.51.100.1"})
+    assert response.status_code == 202
+    assert response.json()["status"] == "running"
+    # A caller that never submitted it cannot take anyone's interest away
+    assert client.delete(f"/jobs/{job_id}", headers={"X-Forwarded-For": "203.0.113.9"}).status_code == 202
+    time.sleep(1.5)
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "running"
+
+    response = client.delete(f"/jobs/{job_id}", headers={"X-Forwarded-For": "198.51.100.2"})
+    assert response.status_code in (200, 202)
+    assert wait_status(client, job_id, "cancelled", "done", "error", timeout=10)["status"] == "cancelled"
+
+
+def test_last_progress_stream_leaving_cancels_job(client, slow_media):
+    job_id = submit(client, slow_media.url(unique("stream")))
+    with client.stream("GET", f"/jobs/{job_id}/events") as events:
+        for line in events.iter_lines():
+            if line == "event: progress":
+                break
+    # CANCEL_ON_DISCONNECT_SECONDS is 1 in these tests
+    job = wait_status(client, job_id, "cancelled", "done", "error", timeout=10)
+    assert job["status"] == "cancelled"
+    assert not (main.blobs.incoming / job_id).exists()
+
+
+def test_polled_job_is_not_cancelled(client, slow_media):
+    job_id = submit(client, slow_media.url(unique("polled")))
+    time.sleep(2.5)
+    assert client.get(f"/jobs/{job_id}").json()["status"] in ("queued", "running")
+    client.delete(f"/jobs/{job_id}")
+    wait_status(client, job_id, "cancelled", "done", "error")
+
+
+def test_dropped_blocking_download_cancels_job(app, client, slow_media):
+    cancelled = main.job_queue.stats()["cancelled"]
+    with pytest.raises(httpx.ReadTimeout):
+        httpx.post(f"{app.url}/download", json={"url": slow_media.url(unique("blocking"))}, timeout=2)
+    wait_for(lambda: main.job_queue.stats()["cancelled"] > cancelled, timeout=10)
+
+
+def test_dropped_file_wait_cancels_job(app, client, slow_media, monkeypatch):
+    monkeypatch.setattr(main.job_queue, "_max_running", 1)
+    running = submit(client, slow_media.url(unique("ahead")))
+    queued = submit(client, slow_media.url(unique("waited")))
+    watched = main.job_queue.stats()["watched"]
+
+    # Nothing to stream yet: the request waits for the queued job
+    waiting = threading.Thread(
+        target=lambda: pytest.raises(httpx.ReadTimeout, httpx.get, f"{app.url}/files-download/{queued}", timeout=2)
+    )
+    waiting.start()
+    wait_for(lambda: main.job_queue.stats()["watched"] > watched, timeout=2)
+    waiting.join()
+    assert wait_status(client, queued, "cancelled", "done", "error", timeout=10)["status"] == "cancelled"
+    client.delete(f"/jobs/{running}")
+    wait_status(client, running, "cancelled", "done", "error")
+
+
+def test_file_wait_is_bounded(client, slow_media, monkeypatch):
+    monkeypatch.setattr(main.job_queue, "_max_running", 1)
+    monkeypatch.setattr(main, "STREAM_WAIT_SECONDS", 1)
+    running = submit(client, slow_media.url(unique("ahead")))
+    queued = submit(client, slow_media.url(unique("unready")))
+
+    started = time.monotonic()
+    response = client.get(f"/files-download/{queued}")
+    assert response.status_code == 504
+    assert response.json()["detail"].startswith("The file was not ready")
+    assert time.monotonic() - started < 5
+    for job_id in (queued, running):
+        client.delete(f"/jobs/{job_id}")
+        wait_status(client, job_id, "cancelled", "done", "error")
+
+
+def test_finished_and_unknown_jobs_are_not_tracked(client, fast_media):
+    tracked, watched = len(main.job_queue._interest), main.job_queue.stats()["watched"]
+    done_url = fast_media.url(unique("cached"))
+    assert client.post("/download", json={"url": done_url}).status_code == 200
+    dead_url = fast_media.url(unique("dead")).replace("/range/", "/missing/")
+    assert client.post("/download", json={"url": dead_url}).status_code == 404
+    done = submit(client, done_url)
+
+    for _ in range(20):
+        # Answered from the result cache and the negative cache
+        assert client.post("/download", json={"url": done_url}).status_code == 200
+        assert client.post("/download", json={"url": dead_url}).status_code == 404
+        assert client.get(f"/jobs/{'0' * 32}/events").status_code == 404
+        assert client.get(f"/files-download/{os.urandom(16).hex()}").status_code == 404
+        with client.stream("GET", f"/jobs/{done}/events") as events:
+            assert "event: done" in events.read().decode()
+
+    assert len(main.job_queue._interest) == tracked
+    assert main.job_queue.stats()["watched"] == watched
+
+
+def test_extraction_deadline(client, hung, monkeypatch):
+    monkeypatch.setattr(main, "EXTRACT_TIMEOUT_SECONDS", 1.5)
+    started = time.monotonic()
+    response = client.post("/download", json={"url": hung.url(unique("hung"))})
+    assert response.status_code == 504
+    assert response.json()["detail"].startswith("Extraction did not finish")
+    assert time.monotonic() - started < 10
+
+
+def test_download_deadline(client, engine, slow_media, monkeypatch):
+    monkeypatch.setattr(main, "DOWNLOAD_TIMEOUT_SECONDS", 1.5)
+    name = unique("deadline")
+    response = client.post("/download", json={"url": slow_media.url(name)})
+    assert response.status_code == 504
+    assert response.json()["detail"].startswith("Download did not finish")
+    wait_for(lambda: not processes_for(name), timeout=5)
+    assert not list(main.blobs.incoming.glob("*/*.part"))
+
+
+def test_postprocessing_deadline(client, fast_media, monkeypatch):
+    def slow_sha256(path):
+        time.sleep(3)
+        return "0" * 64
+
+    monkeypatch.setattr(main, "POSTPROCESS_TIMEOUT_SECONDS", 1)
+    monkeypatch.setattr(main.blobs, "verify_content", True)
+    monkeypatch.setattr(main, "file_sha256", slow_sha256)
+    response = client.post("/download", json={"url": fast_media.url(unique("hashing"))})
+    assert response.status_code == 504
+    assert response.json()["detail"].startswith("Post-processing did not finish")
+
+
+def test_rate_limiter_wait_is_not_extraction_time(client, fast_media, monkeypatch):
+    acquire = main.rate_limiter.acquire
+
+    async def paced(platform, egress=None):
+        await asyncio.sleep(2)
+        await acquire(platform, egress)
+
+    monkeypatch.setattr(main, "EXTRACT_TIMEOUT_SECONDS", 1.5)
+    monkeypatch.setattr(main.rate_limiter, "acquire", paced)
+    response = client.post("/download", json={"url": fast_media.url(unique("paced"))})
+    assert response.status_code == 200, response.text
+
+
+def test_cancelled_cli_takes_its_process_group_along(tmp_path):
+    # yt-dlp's own children (ffmpeg) run in its process group
+    pidfile = tmp_path / "child.pid"
+    script = f"sleep 60 & echo $! > {pidfile}; wait"
+    engine = SubprocessEngine()
+
+    async def run():
+        task = asyncio.create_task(engine._run(["sh", "-c", script], lambda line: None, None))
+        while not pidfile.exists() or not pidfile.read_text().strip():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    child = int(pidfile.read_text())
+    wait_for(lambda: not alive(child), timeout=5)
+
+
+def alive(pid: int) -> bool:
+    try:
+        state = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0]
+    except (OSError, IndexError):
+        return False
+    return state != "Z"
@@ -0,0 +1,25 @@
+"""Which address a request is accounted to (queue limits, job interest)."""
+import pytest
+from starlette.requests import Request
+
+from backend import main
+
+
+def request(forwarded: str | None = None, peer: str = "10.0.0.1") -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.mark.parametrize("forwarded, proxies, expected", [
+    (None, 1, "10.0.0.1"),
+    ("203.0.113.9", 1, "203.0.113.9"),
+    # The client wrote the first entry; the proxy appended the real address
+    ("198.51.100.1, 203.0.113.9", 1, "203.0.113.9"),
+    ("198.51.100.1, 203.0.113.9, 192.0.2.7", 2, "203.0.113.9"),
+    ("203.0.113.9", 2, "203.0.113.9"),
+    ("198.51.100.1, 203.0.113.9", 0, "10.0.0.1"),
+    (" , ", 1, "10.0.0.1"),
+])
+def test_client_is_counted_from_trusted_proxies(forwarded, proxies, expected, monkeypatch):
+    monkeypatch.setattr(main, "TRUSTED_PROXY_COUNT", proxies)
+    assert main._client_id(request(forwarded)) == expected
@@ -0,0 +1,60 @@
+"""Identical concurrent requests share one upstream fetch (single-flight)."""
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from backend import main
+from backend.tests.stubs import MediaServer, unique
+
+CLIENTS = 50
+
+
+@pytest.fixture(scope="module")
+def media():
+    # 4 MiB at 4 MiB/s: every request arrives while the first download runs
+    server = MediaServer(4 * 1024 * 1024, 4 * 1024 * 1024)
+    yield server
+    server.close()
+
+
+def fetches(media, name: str) -> int:
+    return sum(n for path, n in media.hits.items() if f"/{name}." in path)
+
+
+def concurrently(app, request) -> list[httpx.Response]:
+    def send(i):
+        # Each from its own address, so per-client queue limits do not apply
+        with httpx.Client(base_url=app.url, timeout=60, headers={"X-Forwarded-For": f"198.51.100.{i}"}) as client:
+            return request(client)
+
+    with ThreadPoolExecutor(CLIENTS) as pool:
+        return list(pool.map(send, range(CLIENTS)))
+
+
+def test_identical_downloads_fetch_once(app, client, media):
+    # What one download costs upstream: the extraction probe and the file
+    single = unique("single")
+    assert client.post("/download", json={"url": media.url(single)}).status_code == 200
+    assert fetches(media, single) >= 1
+
+    name = unique("viral")
+    coalesced = main.job_queue.stats()["coalesced"]
+    responses = concurrently(app, lambda c: c.post("/download", json={"url": media.url(name)}))
+
+    assert {r.status_code for r in responses} == {200}
+    assert len({r.json()["job_id"] for r in responses}) == 1
+    assert len({r.json()["download_url"] for r in responses}) == 1
+    assert fetches(media, name) == fetches(media, single)
+    assert main.job_queue.stats()["coalesced"] - coalesced == CLIENTS - 1
+
+
+def test_identical_info_requests_extract_once(app, client, media):
+    single = unique("probe")
+    assert client.get("/info", params={"url": media.url(single)}).status_code == 200
+
+    name = unique("info")
+    responses = concurrently(app, lambda c: c.get("/info", params={"url": media.url(name)}))
+
+    assert {r.status_code for r in responses} == {200}
+    assert fetches(media, name) == fetches(media, single)
@@ -0,0 +1,118 @@
+"""Range and conditional requests on /files-download (numbers: python -m backend.bench.file_serving)."""
+import os
+import re
+
+import pytest
+
+from backend import main
+from backend.delivery import MAX_RANGES, parse_range
+
+SIZE = 100_000
+
+
+@pytest.fixture(scope="module")
+def served(app):
+    data = os.urandom(SIZE)
+    path = main.DOWNLOAD_DIR / f"ranges-{os.urandom(4).hex()}.mp4"
+    path.write_bytes(data)
+    yield f"/files-download/{path.name}", data
+    path.unlink(missing_ok=True)
+
+
+@pytest.mark.parametrize("header, size, ranges", [
+    ("bytes=0-99", 1000, [(0, 100)]),
+    ("bytes=900-", 1000, [(900, 1000)]),
+    ("bytes=1-", 1000, [(1, 1000)]),
+    ("bytes=990-2000", 1000, [(990, 1000)]),
+    # Suffix ranges: the last N bytes, or the whole file if it is shorter
+    ("bytes=-100", 1000, [(900, 1000)]),
+    ("bytes=-5000", 1000, [(0, 1000)]),
+    # Overlapping and adjacent ranges are merged, and sorted
+    ("bytes=500-599, 0-9, 5-20", 1000, [(0, 21), (500, 600)]),
+    ("bytes=0-9,10-19", 1000, [(0, 20)]),
+    ("bytes=0-0,-1", 1000, [(0, 1), (999, 1000)]),
+    # Valid but unsatisfiable: 416
+    ("bytes=1000-", 1000, []),
+    ("bytes=-0", 1000, []),
+    ("bytes=-5", 0, []),
+    ("bytes=1000-1999,5000-", 1000, []),
+    # Invalid: ignored, the whole file is sent
+    ("bytes=5-1", 1000, None),
+    ("items=0-1", 1000, None),
+    ("bytes=", 1000, None),
+    ("bytes=a-b", 1000, None),
+    ("bytes=0-1,x", 1000, None),
+    (f"bytes={','.join(f'{i * 10}-{i * 10 + 1}' for i in range(MAX_RANGES + 1))}", 1000, None),
+])
+def test_parse_range(header, size, ranges):
+    assert parse_range(header, size) == ranges
+
+
+def byteranges(response) -> list[tuple[str, bytes]]:
+    """(Content-Range, body) of each part of a multipart/byteranges response."""
+    boundary = re.fullmatch(r"multipart/byteranges; boundary=(\w+)", response.headers["content-type"]).group(1)
+    body = response.content
+    assert body.endswith(f"\r\n--{boundary}--\r\n".encode())
+    parts = []
+    for part in body.split(f"--{boundary}".encode())[1:-1]:
+        head, _, content = part.partition(b"\r\n\r\n")
+        headers = dict(line.split(": ", 1) for line in head.decode().strip().splitlines())
+        # Parts are separated by a line break that belongs to the delimiter
+        parts.append((headers["Content-Range"], content.removesuffix(b"\r\n")))
+    return parts
+
+
+def test_single_and_suffix_ranges(client, served):
+    url, data = served
+    response = client.get(url, headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes 100-199/{SIZE}"
+    assert response.content == data[100:200]
+
+    response = client.get(url, headers={"Range": "bytes=-100"})
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {SIZE - 100}-{SIZE - 1}/{SIZE}"
+    assert response.headers["content-length"] == "100"
+    assert response.content == data[-100:]
+
+
+def test_multiple_ranges(client, served):
+    url, data = served
+    response = client.get(url, headers={"Range": "bytes=0-9, 50000-50099, -5, 5-14"})
+    assert response.status_code == 206
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert byteranges(response) == [
+        (f"bytes 0-14/{SIZE}", data[0:15]),
+        (f"bytes 50000-50099/{SIZE}", data[50000:50100]),
+        (f"bytes {SIZE - 5}-{SIZE - 1}/{SIZE}", data[-5:]),
+    ]
+    # Past MAX_RANGES the header is ignored
+    many = ",".join(f"{i * 100}-{i * 100 + 9}" for i in range(MAX_RANGES + 1))
+    response = client.get(url, headers={"Range": f"bytes={many}"})
+    assert response.status_code == 200 and response.content == data
+
+
+def test_unsatisfiable_and_invalid_ranges(client, served):
+    url, data = served
+    for header in (f"bytes={SIZE}-", "bytes=-0", f"bytes={SIZE + 10}-{SIZE + 20}"):
+        response = client.get(url, headers={"Range": header})
+        assert response.status_code == 416, header
+        assert response.headers["content-range"] == f"bytes */{SIZE}"
+        assert response.content == b""
+    response = client.get(url, headers={"Range": "bytes=10-5"})
+    assert response.status_code == 200 and response.content == data
+
+
+def test_conditional_requests(client, served):
+    url, data = served
+    full = client.get(url)
+    etag, modified = full.headers["etag"], full.headers["last-modified"]
+    assert full.headers["accept-ranges"] == "bytes"
+
+    assert client.get(url, headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(url, headers={"If-Modified-Since": modified}).status_code == 304
+    # If-Range: the range only if the file is still the one the client has
+    ranged = client.get(url, headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert (ranged.status_code, ranged.content) == (206, data[:10])
+    stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+    assert (stale.status_code, stale.content) == (200, data)
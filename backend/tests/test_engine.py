@@ -0,0 +1,45 @@
+"""yt-dlp engines, run against the local media server."""
+import asyncio
+import collections
+
+from backend.engine import DownloadOptions, SubprocessEngine, _read_lines
+from backend.tests.stubs import installed_ytdlp, unique
+
+COOKIES = "# Netscape HTTP Cookie File\n.example.com\tTRUE\t/\tFALSE\t0\tsession\tabc\n"
+
+
+def test_concurrent_cli_runs_leave_the_cookie_file_alone(tmp_path, fast_media):
+    cookies = tmp_path / "cookies.txt"
+    cookies.write_text(COOKIES, encoding="utf-8")
+    site = installed_ytdlp()
+    engine = SubprocessEngine(ytdlp_path=lambda: site)
+
+    async def extract(i):
+        options = DownloadOptions(outtmpl=str(tmp_path / "%(id)s.%(ext)s"), cookie_file=str(cookies))
+        return await engine.extract(f"job{i}", fast_media.url(unique("cookies")), options, str(tmp_path / f"{i}.json"))
+
+    async def main():
+        return await asyncio.gather(*(extract(i) for i in range(8)))
+
+    results = asyncio.run(main())
+    assert [r.code for r in results] == [0] * 8, [r.stderr for r in results]
+    # yt-dlp saves its cookie jar on exit; only the per-run copies were written
+    assert cookies.read_text(encoding="utf-8") == COOKIES
+
+
+def test_over_long_lines_are_dropped_whole():
+    lines = []
+
+    async def main():
+        stream = asyncio.StreamReader(limit=64)
+        reader = asyncio.create_task(_read_lines(stream, collections.deque(), lines.append))
+        # One line arrives in pieces, one past the limit in a single chunk
+        for chunk in (b"[download]  10.0%\n" + b"x" * 100, b"x" * 100, b'{"id": "tail"}\n',
+                      b"[download] 100%\n" + b"y" * 80 + b'{"id": "fragment"}\n', b"ERROR: last"):
+            stream.feed_data(chunk)
+            await asyncio.sleep(0)
+        stream.feed_eof()
+        await reader
+
+    asyncio.run(main())
+    assert lines == ["[download]  10.0%", "[download] 100%", "ERROR: last"]
@@ -0,0 +1,129 @@
+"""How yt-dlp failures are classified, the negative cache of permanent ones, and oversized downloads."""
+import io
+import time
+
+import pytest
+from yt_dlp.networking.common import Response
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from yt_dlp.utils import DownloadError, ExtractorError, GeoRestrictedError, UnsupportedError
+
+from backend import errors, main
+from backend.cache import InfoCache
+from backend.tests.stubs import MediaServer, unique
+
+BUG = "; please report this issue on  https://github.com/yt-dlp/yt-dlp/issues?q= , filling out the appropriate issue template."
+
+
+def http_error(status: int) -> HTTPError:
+    return HTTPError(Response(io.BytesIO(b""), "https://example.com/video", {}, status=status))
+
+
+def wrapped(e: BaseException) -> DownloadError:
+    # What YoutubeDL raises: the extractor's error, kept in exc_info
+    return DownloadError(f"ERROR: {e}", (type(e), e, None))
+
+
+@pytest.mark.parametrize("exception, kind, status, expected", [
+    (UnsupportedError("https://example.com/page"), errors.UNSUPPORTED, None, True),
+    (GeoRestrictedError("This video is not available from your location due to geo restriction"),
+     errors.GEO_RESTRICTED, None, True),
+    (ExtractorError("Unable to download webpage: HTTP Error 404: Not Found", cause=http_error(404), expected=True),
+     errors.UNAVAILABLE, 404, True),
+    (ExtractorError("Unable to download webpage: HTTP Error 410: Gone", cause=http_error(410)),
+     errors.UNAVAILABLE, 410, False),
+    (ExtractorError("Unable to download JSON metadata: HTTP Error 429: Too Many Requests", cause=http_error(429)),
+     errors.RATE_LIMITED, 429, False),
+    (ExtractorError("Unable to download webpage: HTTP Error 407: Proxy Authentication Required", cause=http_error(407)),
+     errors.NETWORK, 407, False),
+    (ExtractorError("Unable to download webpage: <urlopen error [Errno 111] Connection refused>",
+                    cause=TransportError("[Errno 111] Connection refused")), errors.NETWORK, None, False),
+    (ExtractorError("Instagram sent an empty media response. Check if this post is accessible in your browser "
+                    "without being logged-in", expected=True), errors.LOGIN_REQUIRED, None, True),
+    (ExtractorError("Private video. Sign in if you've been granted access to this video", expected=True),
+     errors.PRIVATE, None, True),
+    (ExtractorError("Video unavailable. This video has been removed by the uploader", expected=True),
+     errors.UNAVAILABLE, None, True),
+    (ExtractorError("Requested format is not available. Use --list-formats for a list of available formats",
+                    expected=True), errors.FORMAT_UNAVAILABLE, None, True),
+    (ExtractorError("Unable to extract video data" + BUG), errors.FAILED, None, False),
+    (KeyError("video_versions"), errors.FAILED, None, False),
+])
+def test_from_exception(exception, kind, status, expected):
+    for e in (exception, wrapped(exception)):
+        failure = errors.from_exception(e)
+        assert (failure.kind, failure.status, failure.expected) == (kind, status, expected)
+        assert failure.message.startswith("ERROR:")
+    assert errors.from_exception(wrapped(exception)).permanent == (expected and kind in errors.PERMANENT)
+
+
+@pytest.mark.parametrize("code, stderr, kind, status, expected", [
+    (1, "ERROR: Unsupported URL: https://example.com/page", errors.UNSUPPORTED, None, True),
+    (1, "ERROR: [Instagram] Cx1: Unable to download webpage: HTTP Error 404: Not Found",
+     errors.UNAVAILABLE, 404, True),
+    (1, "ERROR: [TikTok] 73: Unable to download JSON metadata: HTTP Error 429: Too Many Requests",
+     errors.RATE_LIMITED, 429, True),
+    (1, "ERROR: [youtube] abc: Private video. Sign in if you've been granted access to this video",
+     errors.PRIVATE, None, True),
+    (1, "ERROR: [facebook] 12: This video is only available for registered users. Use --cookies",
+     errors.LOGIN_REQUIRED, None, True),
+    (1, "ERROR: [youtube] abc: The uploader has not made this video available in your country",
+     errors.GEO_RESTRICTED, None, True),
+    (1, "ERROR: [youtube] abc: Requested format is not available. Use --list-formats",
+     errors.FORMAT_UNAVAILABLE, None, True),
+    (1, "ERROR: [generic] x: Unable to download webpage: <urlopen error Tunnel connection failed: 403 Forbidden>",
+     errors.NETWORK, None, True),
+    (1, "WARNING: [Instagram] retrying\nERROR: [Instagram] Cx1: Unable to extract shared data" + BUG,
+     errors.FAILED, None, False),
+    (2, "Usage: yt-dlp [OPTIONS] URL [URL...]\n\nyt-dlp: error: no such option: --bogus", errors.FAILED, None, True),
+])
+def test_from_output(code, stderr, kind, status, expected):
+    failure = errors.from_output(code, "[download] Destination: x.mp4\n", stderr)
+    assert (failure.kind, failure.status, failure.expected) == (kind, status, expected)
+    # The last ERROR: line is the message, else the last line of output
+    assert failure.message == [line for line in stderr.splitlines() if line.startswith("ERROR:") or "error:" in line][-1]
+
+
+def test_from_output_success_and_oversized_file():
+    assert errors.from_output(0, "[download] 100% of 1.00MiB\n", "") is None
+    # yt-dlp exits 0 after skipping a file over --max-filesize
+    failure = errors.from_output(0, "[download] File is larger than max-filesize (2048 bytes > 1024 bytes). Aborting.\n", "")
+    assert (failure.kind, failure.expected) == (errors.TOO_LARGE, True)
+
+
+def test_max_filesize_stops_a_fragmented_download(client):
+    # DASH formats of bitrates only, no sizes; 1 MiB/s so progress comes in mid-fragment
+    media = MediaServer(max(size for _, _, size in MediaServer.FORMATS.values()), 1024 * 1024)
+    try:
+        name = unique("capped")
+        body = {"url": media.formats_url(name), "quality": "720p", "max_filesize": 1_000_000}
+        response = client.post("/download", json=body)
+        assert response.status_code == 413, response.text
+        assert response.json()["detail"] == errors.RESPONSES[errors.TOO_LARGE][1]
+        # mux720, 7 MB: stopped once past the cap, not failed on its first fragment
+        assert 1_000_000 < media.sent[f"/formats/{name}/mux720.m4s"] < 7_000_000
+    finally:
+        media.close()
+
+
+def test_failed_url_is_answered_from_the_negative_cache_until_it_expires(client, fast_media, monkeypatch):
+    monkeypatch.setattr(main, "failure_cache", InfoCache(1024 * 1024, 1))
+    name = unique("gone")
+    url = fast_media.url(name).replace("/range/", "/missing/")
+    path = f"/missing/{name}.mp4"
+
+    first = client.post("/download", json={"url": url})
+    assert first.status_code == 404
+    fetched = fast_media.hits[path]
+    assert fetched >= 1
+
+    # Within the TTL: the stored status and detail, without asking upstream
+    for request in (lambda: client.post("/download", json={"url": url}),
+                    lambda: client.get("/info", params={"url": url})):
+        response = request()
+        assert (response.status_code, response.json()["detail"]) == (404, first.json()["detail"])
+    assert fast_media.hits[path] == fetched
+    assert main.failure_cache.stats()["hits"] == 2
+
+    time.sleep(1.1)
+    assert client.post("/download", json={"url": url}).status_code == 404
+    assert fast_media.hits[path] > fetched
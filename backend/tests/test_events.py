@@ -0,0 +1,27 @@
+"""The progress stream, GET /jobs/{id}/events."""
+import json
+
+from backend import main
+from backend.jobs import DONE, Job
+from backend.tests.stubs import unique
+
+
+def test_finished_job_is_answered_without_a_channel(client):
+    job = Job(url=f"https://example.com/{unique('finished')}", status=DONE, result={"filename": "x.mp4"})
+    main.job_queue.store.save(job)
+    channels = main.progress_hub.stats()["channels"]
+    for _ in range(3):
+        response = client.get(f"/jobs/{job.id}/events")
+        assert response.status_code == 200
+        event, data = response.text.strip().split("\n")
+        assert event == "event: done"
+        assert json.loads(data.removeprefix("data: "))["result"] == {"filename": "x.mp4"}
+    assert main.progress_hub.stats()["channels"] == channels
+
+
+def test_stream_follows_a_job_to_its_end(client, fast_media):
+    response = client.post("/jobs", json={"url": fast_media.url(unique("followed"))})
+    job_id = response.json()["job_id"]
+    with client.stream("GET", f"/jobs/{job_id}/events") as events:
+        kinds = [line.removeprefix("event: ") for line in events.iter_lines() if line.startswith("event: ")]
+    assert kinds[-1] == "done"
@@ -0,0 +1,41 @@
+"""File expiry runs on one task whatever the number of pending files."""
+import asyncio
+import random
+import threading
+
+from backend.expiry import ExpiryScheduler
+
+FILES = 100_000
+
+
+def test_100k_expiries_do_not_add_threads(tmp_path):
+    expired: list[str] = []
+    scheduler = ExpiryScheduler(expired.append, tmp_path / "expiry.json", save_interval=0.2)
+
+    async def main():
+        threads = threading.active_count()
+        tasks = len(asyncio.all_tasks())
+        runner = asyncio.create_task(scheduler.run())
+        peak_threads, peak_tasks = threads, tasks
+        for i in range(FILES):
+            scheduler.schedule(f"file-{i}", random.uniform(0, 1.5))
+        # Rescheduling and cancelling must not leave anything behind either
+        for i in range(0, FILES, 10):
+            scheduler.touch(f"file-{i}", 2.0)
+        for i in range(5, FILES, 10):
+            scheduler.cancel(f"file-{i}")
+        async with asyncio.timeout(30):
+            while len(expired) < FILES - FILES // 10:
+                peak_threads = max(peak_threads, threading.active_count())
+                peak_tasks = max(peak_tasks, len(asyncio.all_tasks()))
+                await asyncio.sleep(0.05)
+        runner.cancel()
+        # At most the one executor thread that persists deadlines
+        assert peak_threads <= threads + 1
+        # run() and the wait_for it sleeps in
+        assert peak_tasks <= tasks + 2
+
+    asyncio.run(main())
+    assert len(expired) == len(set(expired)) == FILES - FILES // 10
+    assert not any(key.endswith("5") for key in expired)
+    assert scheduler.stats()["pending"] == 0
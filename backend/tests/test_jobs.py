@@ -0,0 +1,60 @@
+"""Job stores and the queue's housekeeping."""
+import asyncio
+import time
+
+import pytest
+
+from backend.jobs import CANCELLED, DONE, ERROR, QUEUED, RUNNING, Job, JobQueue, MemoryJobStore, SqliteJobStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    return MemoryJobStore() if request.param == "memory" else SqliteJobStore(tmp_path / "jobs.sqlite3")
+
+
+def saved(store, status: str, age: float) -> Job:
+    job = Job(url=f"https://example.com/{status}/{age}", status=status, updated_at=time.time() - age)
+    store.save(job)
+    return job
+
+
+def test_prune_deletes_only_old_finished_jobs(store):
+    old = [saved(store, status, 7200) for status in (DONE, ERROR, CANCELLED)]
+    recent = saved(store, DONE, 60)
+    # Unfinished jobs stay however old they are; recover() picks them up
+    waiting = [saved(store, status, 7200) for status in (QUEUED, RUNNING)]
+
+    assert store.prune(time.time() - 3600) == 3
+    assert all(store.get(job.id) is None for job in old)
+    assert store.get(recent.id) is not None
+    assert {job.id for job in store.unfinished()} == {job.id for job in waiting}
+    assert store.prune(time.time() - 3600) == 0
+
+
+def test_queue_prunes_periodically(store):
+    async def never_run(job):
+        raise AssertionError("not submitted")
+
+    async def main():
+        queue = JobQueue(store, never_run, retention=3600)
+        old = saved(store, DONE, 7200)
+        task = asyncio.create_task(queue.run_retention(0.05))
+        await asyncio.sleep(0.1)
+        assert store.get(old.id) is None
+        later = saved(store, ERROR, 7200)
+        await asyncio.sleep(0.1)
+        task.cancel()
+        assert store.get(later.id) is None
+        assert queue.stats()["pruned"] == 2
+
+    asyncio.run(main())
+
+
+def test_no_retention_keeps_finished_jobs(store):
+    async def never_run(job):
+        raise AssertionError("not submitted")
+
+    queue = JobQueue(store, never_run)
+    old = saved(store, DONE, 10 ** 6)
+    assert asyncio.run(queue.prune()) == 0
+    assert store.get(old.id) is not None
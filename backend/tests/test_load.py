@@ -0,0 +1,19 @@
+"""/healthz keeps answering while downloads run (numbers: python -m backend.bench.healthz_load)."""
+import pytest
+
+from backend.bench import healthz_load
+from backend.bench.common import percentile
+
+
+@pytest.mark.parametrize("engine", ["inprocess", "subprocess"])
+def test_healthz_p99_is_flat_during_20_downloads(engine):
+    idle, loaded, durations = healthz_load.run(
+        engine, downloads=20, size=2 * 1024 * 1024, bandwidth=1024 * 1024, idle_seconds=2, interval=0.05
+    )
+    # A download holding the event loop would stall /healthz for as long as
+    # the download takes. What remains is CPU contention with 20 yt-dlp runs.
+    assert min(durations) >= 2
+    assert percentile(loaded, 99) < min(1.0, min(durations) / 2)
+    assert percentile(loaded, 50) < 0.1
+    assert len(loaded) >= 20
+    assert percentile(idle, 99) < 0.1
@@ -0,0 +1,37 @@
+"""HLS downloads fetch fragments in parallel (numbers: python -m backend.bench.fragments)."""
+import pytest
+
+from backend import main
+from backend.profiles import DownloadProfiles
+from backend.tests.stubs import MediaServer, unique
+
+SEGMENTS = 16
+
+
+@pytest.fixture(scope="module")
+def media():
+    # Short segments with a round trip each, as CDNs serve HLS
+    server = MediaServer(SEGMENTS * 256 * 1024, segment_bytes=256 * 1024, latency=0.05)
+    yield server
+    server.close()
+
+
+def download_hls(client, media, name: str) -> bytes:
+    media.peak_active = 0
+    response = client.post("/download", json={"url": media.hls_url(name)})
+    assert response.status_code == 200, response.text
+    assert [media.hits[f"/hls/{name}/{i}.ts"] for i in range(SEGMENTS)] == [1] * SEGMENTS
+    return client.get(response.json()["download_url"]).content
+
+
+def test_hls_fragments_are_fetched_in_parallel(client, media):
+    chosen = main.download_profiles.stats().get("default:fragmented", 0)
+    assert download_hls(client, media, unique("hls")) == media.data
+    assert media.peak_active == main.DOWNLOAD_FRAGMENTS > 1
+    assert main.download_profiles.stats()["default:fragmented"] == chosen + 1
+
+
+def test_one_fragment_at_a_time_without_a_profile(client, media, monkeypatch):
+    monkeypatch.setattr(main, "download_profiles", DownloadProfiles(fragments=1))
+    assert download_hls(client, media, unique("hls")) == media.data
+    assert media.peak_active == 1
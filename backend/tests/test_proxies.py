@@ -0,0 +1,135 @@
+"""The proxy pool against local proxies: health checks, ejection, stickiness and reassignment."""
+import asyncio
+import time
+from urllib.parse import urlparse
+
+import pytest
+
+from backend import main
+from backend.cache import canonical_key
+from backend.proxies import ProxyPool, parse_proxies
+from backend.tests.stubs import MediaServer, ProxyServer, unique
+
+
+@pytest.fixture
+def proxies():
+    servers = [ProxyServer(), ProxyServer()]
+    yield servers
+    for server in servers:
+        server.close()
+
+
+@pytest.fixture(scope="module")
+def media():
+    # Four segments of the smallest size the segmented fetcher uses
+    server = MediaServer(1024 * 1024)
+    yield server
+    server.close()
+
+
+def use_pool(monkeypatch, *urls: str, **settings) -> ProxyPool:
+    pool = ProxyPool(parse_proxies(" ".join(urls)), **settings)
+    monkeypatch.setattr(main, "proxy_pool", pool)
+    return pool
+
+
+def target(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.hostname}:{parsed.port}"
+
+
+def media_picking(pool: ProxyPool, server: MediaServer, proxy_url: str) -> str:
+    """A fresh media URL that the pool assigns to ``proxy_url`` (and now sticks to it)."""
+    for _ in range(100):
+        url = server.url(unique("proxied"))
+        picked = pool.pick(main._detect_platform(url), canonical_key(url))
+        if picked.url == proxy_url:
+            return url
+    raise AssertionError(f"no media maps to {proxy_url}")
+
+
+def test_health_checks_score_and_eject(proxies, fast_media):
+    up, down = proxies
+    down.down = True
+    pool = ProxyPool(parse_proxies(f"{up.url()} {down.url()}"), eject_after=2, health_url=fast_media.url(unique("204")))
+    live, dead = pool.proxies.values()
+
+    for _ in range(2):
+        asyncio.run(pool.check(live))
+        asyncio.run(pool.check(dead))
+
+    assert live.latency is not None and live.checks == 2 and live.check_failures == 0
+    assert dead.check_failures == 2
+    assert live.healthy(time.monotonic())
+    assert not dead.healthy(time.monotonic())
+    assert pool.stats()["proxies"][dead.label]["ejections"] == 1
+    assert pool.candidates(None) == [live]
+    # Fast, clean proxies draw more new media than erroring ones
+    assert live.weight() > dead.weight()
+
+
+def test_media_sticks_to_its_proxy(proxies):
+    first, second = proxies
+    pool = ProxyPool(parse_proxies(f"{first.url()} {second.url()}"))
+    keys = [f"url:example.com/{i}" for i in range(200)]
+    picked = {key: pool.pick(None, key) for key in keys}
+    # Both proxies get a share, and a later score change does not move
+    # media that already has a proxy
+    assert len({proxy.label for proxy in picked.values()}) == 2
+    for proxy in pool.proxies.values():
+        proxy.latency = 5.0 if proxy.url == first.url() else 0.01
+    assert {key: pool.pick(None, key) for key in keys} == picked
+    assert pool.stats()["sticky_hits"] == len(keys)
+
+
+def test_segments_of_one_download_share_one_proxy(client, proxies, media, monkeypatch):
+    pool = use_pool(monkeypatch, *(server.url() for server in proxies))
+    monkeypatch.setattr(main, "SEGMENTED_CONNECTIONS", 4)
+    monkeypatch.setattr(main, "SEGMENTED_MIN_BYTES", 0)
+    monkeypatch.setattr(main, "SEGMENTED_SEGMENT_BYTES", 256 * 1024)
+    name = unique("segments")
+    url = media.url(name)
+
+    response = client.post("/download", json={"url": url})
+    assert response.status_code == 200, response.text
+
+    # Extraction and every segment went out through the same proxy
+    used = [server for server in proxies if server.hits[target(url)]]
+    assert len(used) == 1
+    assert used[0].hits[target(url)] == media.hits[f"/range/{name}.mp4"] >= 5
+    # The next job for this media is assigned the same proxy
+    assert pool.pick(None, canonical_key(url)).url == used[0].url()
+
+
+def test_failing_proxy_is_ejected_and_jobs_move_on(client, proxies, fast_media, monkeypatch):
+    up, down = proxies
+    down.down = True
+    pool = use_pool(monkeypatch, up.url(), down.url(), eject_after=2)
+    dead = pool.proxies[target(down.url())]
+
+    for _ in range(2):
+        # Media assigned to the broken proxy is moved to the working one
+        url = media_picking(pool, fast_media, down.url())
+        response = client.post("/download", json={"url": url})
+        assert response.status_code == 200, response.text
+        assert up.hits[target(url)] >= 1
+        assert pool.pick(None, canonical_key(url)).url == up.url()
+
+    stats = pool.stats()["proxies"][dead.label]
+    assert stats["failed"] == 2
+    assert not stats["healthy"] and stats["ejections"] == 1
+    # Ejected: new media only goes to the working proxy
+    assert all(pool.pick(None, f"url:example.com/{i}").url == up.url() for i in range(50))
+    assert client.get("/metrics").json()["proxies"]["proxies"][dead.label]["healthy"] is False
+
+
+def test_download_through_socks_proxy(client, proxies, fast_media, monkeypatch):
+    socks = proxies[0]
+    use_pool(monkeypatch, socks.url("socks5", "user:secret"))
+    url = fast_media.url(unique("socks"))
+
+    response = client.post("/download", json={"url": url})
+    assert response.status_code == 200, response.text
+    assert socks.hits[target(url)] >= 2
+    # Metrics name proxies by address only
+    assert "secret" not in client.get("/metrics").text
@@ -0,0 +1,30 @@
+"""Disk quota accounting while jobs write into .incoming."""
+import asyncio
+import os
+
+from backend.blobs import BlobStore
+from backend.quota import DiskQuota
+
+MIB = 1024 * 1024
+
+
+def test_bytes_written_by_running_jobs_are_counted_once(tmp_path):
+    blobs = BlobStore(tmp_path, tmp_path / "index.json")
+    quota = DiskQuota(blobs)
+    for job_id in ("a", "b"):
+        asyncio.run(quota.reserve(job_id, 64 * MIB))
+    before = quota.capacity()
+
+    # Both jobs write part of their file; the volume's free space shrinks by
+    # that much, but the reservations already account for it
+    for job_id in ("a", "b"):
+        with open(blobs.incoming_dir(job_id) / "video.mp4.part", "wb") as f:
+            f.write(os.urandom(48 * MIB))
+            os.fsync(f.fileno())
+    assert abs(quota.capacity() - before) < 16 * MIB
+
+    # Past its reservation, a job's extra bytes come out of the capacity
+    with open(blobs.incoming_dir("a") / "video.mp4.part", "ab") as f:
+        f.write(os.urandom(48 * MIB))
+        os.fsync(f.fileno())
+    assert quota.capacity() < before - 16 * MIB
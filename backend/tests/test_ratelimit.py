@@ -0,0 +1,15 @@
+"""The adaptive limiter against a fake upstream that rate limits (numbers: python -m backend.bench.ratelimit_sim)."""
+import asyncio
+
+from backend.bench.ratelimit_sim import simulate
+
+
+def test_adaptive_pace_outruns_fixed_pace_without_getting_blocked():
+    # 3 simulated minutes, 120 of them per real minute
+    fixed = asyncio.run(simulate("fixed", minutes=3, scale=120))
+    adaptive = asyncio.run(simulate("adaptive", minutes=3, scale=120))
+
+    assert fixed.upstream.blocked_seconds > 0
+    assert adaptive.upstream.blocked_seconds == 0
+    assert adaptive.jobs > max(2 * fixed.jobs, 5)
+    assert adaptive.upstream.refused < fixed.upstream.refused / 10
@@ -0,0 +1,29 @@
+"""Where the URL signing key comes from."""
+import pytest
+
+from backend.signing import UrlSigner, load_key
+
+
+def test_generated_key_is_kept(tmp_path):
+    path = tmp_path / "url-signing.key"
+    key = load_key("", path)
+    assert load_key("", path) == key
+    assert load_key("from-env", path) == b"from-env"
+
+
+def test_shared_deployments_need_the_key_from_the_environment(tmp_path):
+    path = tmp_path / "url-signing.key"
+    with pytest.raises(RuntimeError, match="URL_SIGNING_KEY"):
+        load_key("", path, shared=True)
+    assert not path.exists()
+    assert load_key("from-env", path, shared=True) == b"from-env"
+
+
+def test_instances_with_one_key_accept_each_other_links(tmp_path):
+    one = UrlSigner(load_key("from-env", tmp_path / "a.key", shared=True), ttl=900)
+    other = UrlSigner(load_key("from-env", tmp_path / "b.key", shared=True), ttl=900)
+    lone = UrlSigner(load_key("", tmp_path / "c.key"), ttl=900)
+    url = one.sign("files", "clip.mp4")
+    expires, signature = url.split("/")[-3:-1]
+    assert other.verify("files", "clip.mp4", int(expires), signature)
+    assert not lone.verify("files", "clip.mp4", int(expires), signature)
@@ -0,0 +1,97 @@
+"""Multipart upload to S3 (moto's stand-in) while the file is still being written."""
+import asyncio
+import os
+
+import pytest
+
+from backend.storage import MIN_PART_SIZE
+
+SIZE = 3 * MIN_PART_SIZE + 12345
+
+
+def objects(s3) -> dict[str, bytes]:
+    client = s3._client
+    listed = client.list_objects_v2(Bucket="downloads").get("Contents", [])
+    return {o["Key"]: client.get_object(Bucket="downloads", Key=o["Key"])["Body"].read() for o in listed}
+
+
+def pending_uploads(s3) -> list:
+    return s3._client.list_multipart_uploads(Bucket="downloads").get("Uploads", [])
+
+
+async def write_slowly(path, data: bytes, chunk: int = 1024 * 1024) -> None:
+    with open(path, "wb") as f:
+        for i in range(0, len(data), chunk):
+            f.write(data[i:i + chunk])
+            f.flush()
+            await asyncio.sleep(0.01)
+
+
+async def download_and_upload(s3, path, data: bytes, final=None) -> tuple[bool, int]:
+    """Upload while ``path`` grows; returns the outcome and the bytes sent before the download ended."""
+    upload = s3.begin("clip.mp4", "Clip")
+    finished = False
+    follower = asyncio.create_task(upload.follow(lambda: path if path.exists() else None, lambda: finished, 0.01))
+    await write_slowly(path, data)
+    await asyncio.sleep(0.3)
+    early = s3.uploaded_bytes
+    if final is not None:
+        final.write_bytes(data)
+    finished = True
+    await follower
+    return await upload.complete(final or path), early
+
+
+def test_parts_go_up_while_the_file_grows(s3, tmp_path):
+    data = os.urandom(SIZE)
+    ok, early = asyncio.run(download_and_upload(s3, tmp_path / "clip.mp4.part", data))
+
+    assert ok
+    # Every full part was sent during the download; only the tail after it
+    assert early == 3 * MIN_PART_SIZE
+    assert objects(s3) == {"media/clip.mp4": data}
+    head = s3._client.head_object(Bucket="downloads", Key="media/clip.mp4")
+    assert head["ETag"].endswith('-4"')
+    assert head["ContentType"] == "video/mp4"
+    assert head["ContentDisposition"] == "attachment; filename*=utf-8''Clip"
+    assert s3.stats() == {"uploads": 1, "uploaded_bytes": SIZE, "reuploads": 0, "failures": 0}
+    assert pending_uploads(s3) == []
+
+
+def test_replaced_file_is_uploaded_again(s3, tmp_path):
+    # A post-processor wrote a new file: the parts tailed so far are dropped
+    data = os.urandom(2 * MIN_PART_SIZE)
+    ok, _ = asyncio.run(download_and_upload(s3, tmp_path / "clip.mp4.part", data, final=tmp_path / "clip.mp4"))
+
+    assert ok
+    assert objects(s3) == {"media/clip.mp4": data}
+    assert s3.stats()["reuploads"] == 1
+    assert pending_uploads(s3) == []
+
+
+def test_small_file_is_one_part(s3, tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(b"tiny")
+    assert asyncio.run(s3.begin("clip.mp4").complete(path))
+    assert objects(s3) == {"media/clip.mp4": b"tiny"}
+
+
+@pytest.mark.parametrize("failing", ["upload_part", "complete_multipart_upload"])
+def test_failed_upload_is_aborted(s3, tmp_path, monkeypatch, failing):
+    calls = []
+    original = getattr(s3._client, failing)
+
+    def fail_second(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 2 or failing == "complete_multipart_upload":
+            raise ConnectionResetError("connection reset by peer")
+        return original(**kwargs)
+
+    monkeypatch.setattr(s3._client, failing, fail_second)
+    ok, _ = asyncio.run(download_and_upload(s3, tmp_path / "clip.mp4.part", os.urandom(SIZE)))
+
+    assert not ok
+    assert s3.stats()["failures"] == 1 and s3.stats()["uploads"] == 0
+    # Nothing published and no parts left behind in the bucket
+    assert objects(s3) == {}
+    assert pending_uploads(s3) == []
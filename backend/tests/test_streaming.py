@@ -0,0 +1,57 @@
+"""/files-download/{job_id}: the file streams while the job is still downloading it."""
+import os
+
+import httpx
+import pytest
+
+from backend import main
+from backend.tests.stubs import MediaServer, unique
+
+
+@pytest.fixture(scope="module")
+def media():
+    # 2 MiB at 1 MiB/s: the stream starts well before the job is done
+    server = MediaServer(2 * 1024 * 1024, 1024 * 1024)
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def one_connection(monkeypatch):
+    monkeypatch.setattr(main, "SEGMENTED_CONNECTIONS", 1)
+
+
+def submit(client, url: str) -> str:
+    response = client.post("/jobs", json={"url": url})
+    assert response.status_code == 202, response.text
+    return response.json()["job_id"]
+
+
+def test_stream_follows_the_download_to_the_end(client, media):
+    job_id = submit(client, media.url(unique("streamed")))
+    body = bytearray()
+    with client.stream("GET", f"/files-download/{job_id}") as response:
+        assert response.status_code == 200
+        for chunk in response.iter_raw():
+            body += chunk
+            if len(body) < len(media.data):
+                # Still downloading while the first bytes are served
+                assert client.get(f"/jobs/{job_id}").json()["status"] in ("running", "done")
+    assert bytes(body) == media.data
+
+
+def test_stream_of_cancelled_job_is_cut_off(client, media):
+    job_id = submit(client, media.url(unique("cut")))
+    with pytest.raises(httpx.RemoteProtocolError):
+        with client.stream("GET", f"/files-download/{job_id}") as response:
+            assert response.status_code == 200
+            for i, _ in enumerate(response.iter_raw()):
+                if i == 0:
+                    client.delete(f"/jobs/{job_id}")
+
+
+def test_unknown_job_leaves_nothing_behind(client):
+    tracked = len(main.job_queue._interest)
+    for _ in range(50):
+        assert client.get(f"/files-download/{os.urandom(16).hex()}").status_code == 404
+    assert len(main.job_queue._interest) == tracked
@@ -0,0 +1,71 @@
+"""Old yt-dlp versions are pruned only once no worker pool or CLI run uses them."""
+import asyncio
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from backend import updater
+from backend.engine import DownloadOptions, InProcessEngine
+from backend.tests.stubs import installed_ytdlp, unique
+
+
+@pytest.fixture
+def stage(tmp_path, monkeypatch):
+    monkeypatch.setattr(updater, "VERSIONS_DIR", tmp_path / "versions")
+    monkeypatch.setattr(updater, "KEEP_VERSIONS", 1)
+    updater.VERSIONS_DIR.mkdir()
+
+    def stage(name: str, age: float) -> Path:
+        # The installed package, as if update() had staged it `age` seconds ago
+        path = updater.VERSIONS_DIR / name
+        path.mkdir()
+        (path / "yt_dlp").symlink_to(Path(installed_ytdlp()) / "yt_dlp", target_is_directory=True)
+        (path / updater.LOCK_NAME).touch()
+        os.utime(path, (time.time() - age,) * 2)
+        return path
+
+    return stage
+
+
+def test_held_versions_are_kept(stage):
+    oldest, old, current = stage("1.0", 30), stage("2.0", 20), stage("3.0", 10)
+    held = updater.hold(str(oldest))
+    updater._prune(current.name)
+    assert (oldest.exists(), old.exists(), current.exists()) == (True, False, True)
+
+    held.close()
+    updater._prune(current.name)
+    assert not oldest.exists() and current.exists()
+
+
+def test_draining_pool_keeps_its_version(stage, tmp_path, fast_media):
+    old, new = stage("1.0", 20), stage("2.0", 10)
+    active = [str(old)]
+    engine = InProcessEngine(workers=1, ytdlp_path=lambda: active[0])
+
+    async def extract(job_id: str):
+        options = DownloadOptions(outtmpl=str(tmp_path / "%(id)s.%(ext)s"))
+        result = await engine.extract(job_id, fast_media.url(unique("updater")), options, str(tmp_path / f"{job_id}.json"))
+        assert result.code == 0, result.stderr
+
+    async def main():
+        await extract("before")
+        # Activated, but no job has gone to the new pool yet: the old one lives on
+        active[0] = str(new)
+        updater._prune(new.name)
+        assert old.exists()
+
+        await extract("after")
+        # The old pool drains and exits; then its version can go
+        deadline = time.monotonic() + 30
+        while old.exists() and time.monotonic() < deadline:
+            updater._prune(new.name)
+            await asyncio.sleep(0.1)
+        assert not old.exists() and new.exists()
+
+    try:
+        asyncio.run(main())
+    finally:
+        engine.close()
@@ -0,0 +1,206 @@
+"""Out-of-band yt-dlp updater.
+
+Installs the latest yt-dlp into a fresh staging directory, smoke-tests it
+against local fixtures and, only if that passes, atomically repoints the
+``CURRENT`` file at it. Engines resolve the active directory for every new
+job, so in-flight downloads keep the version they started with. Whatever
+runs a staged version holds a shared lock on it (see ``hold``), and old
+versions are only removed once nothing holds theirs: a worker pool that is
+still draining keeps importing from the one it started with.
+
+Run from cron with ``python -m backend.updater`` or let the app schedule it
+(see YTDLP_UPDATE_INTERVAL_HOURS in main.py).
+"""
+import functools
+import http.server
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: old versions are pruned by age alone
+    fcntl = None
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+STATE_DIR = Path(os.getenv("STATE_DIR", str(BASE_DIR / "state")))
+YTDLP_HOME = Path(os.getenv("YTDLP_HOME", str(STATE_DIR / "yt-dlp")))
+# Optional directory of recorded fixtures: <name>.json = {"path": "...", "expect": {...}}
+FIXTURES_DIR = os.getenv("YTDLP_SMOKE_FIXTURES", "")
+KEEP_VERSIONS = int(os.getenv("YTDLP_KEEP_VERSIONS", "2"))
+
+POINTER = YTDLP_HOME / "CURRENT"
+VERSIONS_DIR = YTDLP_HOME / "versions"
+# Inside each version directory; locked shared while the version is in use
+LOCK_NAME = ".in-use"
+
+
+def active_path() -> str | None:
+    """Directory holding the staged yt_dlp package, or None to use the installed one."""
+    try:
+        name = POINTER.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    path = VERSIONS_DIR / name
+    return str(path) if name and (path / "yt_dlp").is_dir() else None
+
+
+def hold(path: str):
+    """Mark the version in ``path`` as in use for as long as the returned file stays open.
+
+    Any number of processes can hold a version at once; ``_prune`` skips it
+    until the last one closes the file or exits. None without ``fcntl`` or
+    if the version is already gone.
+    """
+    if fcntl is None:
+        return None
+    try:
+        f = open(Path(path) / LOCK_NAME, "a")
+    except OSError:
+        return None
+    fcntl.flock(f, fcntl.LOCK_SH)
+    return f
+
+
+def _env_for(path: str) -> dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = path + os.pathsep + env.get("PYTHONPATH", "") if env.get("PYTHONPATH") else path
+    return env
+
+
+def _version_of(path: str) -> str:
+    proc = subprocess.run(
+        [sys.executable, "-m", "yt_dlp", "--version"],
+        env=_env_for(path), capture_output=True, text=True, timeout=120, check=True,
+    )
+    return proc.stdout.strip()
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _fixtures(root: Path) -> list[tuple[str, dict]]:
+    if FIXTURES_DIR:
+        specs = []
+        for spec_file in sorted(Path(FIXTURES_DIR).glob("*.json")):
+            spec = json.loads(spec_file.read_text(encoding="utf-8"))
+            shutil.copy(Path(FIXTURES_DIR) / spec["path"], root / spec["path"])
+            specs.append((spec["path"], spec.get("expect") or {}))
+        if specs:
+            return specs
+    # Built-in fixture: a direct media link handled by the generic extractor.
+    (root / "smoke.mp4").write_bytes(b"\x00" * 4096)
+    return [("smoke.mp4", {"id": "smoke", "ext": "mp4"})]
+
+
+def smoke_test(path: str) -> None:
+    """Raise if the yt-dlp in ``path`` cannot extract the recorded fixtures."""
+    with tempfile.TemporaryDirectory() as root:
+        fixtures = _fixtures(Path(root))
+        handler = functools.partial(_QuietHandler, directory=root)
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            for name, expect in fixtures:
+                url = f"http://127.0.0.1:{server.server_address[1]}/{name}"
+                proc = subprocess.run(
+                    [sys.executable, "-m", "yt_dlp", "--ignore-config", "--no-playlist", "-J", url],
+                    env=_env_for(path), capture_output=True, text=True, timeout=300,
+                )
+                if proc.returncode != 0:
+                    raise RuntimeError(f"{name}: yt-dlp exited {proc.returncode}: {proc.stderr.strip()}")
+                info = json.loads(proc.stdout)
+                for key, value in expect.items():
+                    if info.get(key) != value:
+                        raise RuntimeError(f"{name}: expected {key}={value!r}, got {info.get(key)!r}")
+        finally:
+            server.shutdown()
+
+
+def _activate(name: str) -> None:
+    tmp = POINTER.with_suffix(".tmp")
+    tmp.write_text(name, encoding="utf-8")
+    os.replace(tmp, POINTER)
+
+
+def _prune(keep: str) -> None:
+    versions = sorted(
+        (p for p in VERSIONS_DIR.iterdir() if p.is_dir()),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True,
+    )
+    for old in versions[max(1, KEEP_VERSIONS):]:
+        if old.name != keep:
+            _remove_unused(old)
+
+
+def _remove_unused(path: Path) -> None:
+    if fcntl is None:
+        shutil.rmtree(path, ignore_errors=True)
+        return
+    try:
+        f = open(path / LOCK_NAME, "a")
+    except OSError:
+        return
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            # A draining worker pool or a running CLI still imports from it;
+            # a later update removes it
+            return
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def update() -> str | None:
+    """Stage, verify and activate the latest yt-dlp; returns the new version or None."""
+    VERSIONS_DIR.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix="staging-", dir=VERSIONS_DIR))
+    try:
+        subprocess.run(
+            [sys.executable, "-m", "pip", "install", "--quiet", "--no-deps", "--upgrade",
+             "--target", str(staging), "yt-dlp"],
+            capture_output=True, text=True, timeout=600, check=True,
+        )
+        version = _version_of(str(staging))
+        current = active_path()
+        if current and Path(current).name == version:
+            return None
+        smoke_test(str(staging))
+        # Created now: creating it later would touch the mtime _prune sorts by
+        (staging / LOCK_NAME).touch()
+        final = VERSIONS_DIR / version
+        if final.exists():
+            shutil.rmtree(final)
+        os.replace(staging, final)
+        _activate(version)
+        _prune(version)
+        return version
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def main() -> int:
+    started = time.time()
+    try:
+        version = update()
+    except Exception as e:
+        print(f"yt-dlp update failed: {e}", file=sys.stderr)
+        return 1
+    if version:
+        print(f"yt-dlp {version} activated in {time.time() - started:.1f}s")
+    else:
+        print("yt-dlp is already up to date")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,12 +24,19 @@ export default function Home() {
   const [videoLink, setVideoLink] = useState('');
   const [error, setError] = useState<string | null>(null);
   const jobWindowsRef = useRef<Map<string, Window | null>>(new Map());
+  type JobProgress = {
+    percent: number | null;
+    speed: number | null;
+    eta: number | null;
+    downloaded_bytes: number | null;
+  };
   type DownloadJob = {
     id: string;
     url: string;
     status: 'processing' | 'success' | 'error';
     downloadUrl?: string | null;
     error?: string | null;
+    progress?: JobProgress | null;
   };
   const [jobs, setJobs] = useState<DownloadJob[]>([]);
 
@@ -39,6 +46,39 @@ export default function Home() {
     return '';
   }, []);
 
+  // Follow a job's Server-Sent Events until it finishes; resolves with the job result
+  const waitForJob = (jobId: string, onProgress: (p: JobProgress) => void) =>
+    new Promise<{ download_url?: string | null; force_download_url?: string | null }>((resolve, reject) => {
+      const path = `/jobs/${jobId}/events`;
+      const source = new EventSource(API_BASE ? `${API_BASE}${path}` : path);
+      source.addEventListener('progress', (e) => {
+        onProgress(JSON.parse((e as MessageEvent).data));
+      });
+      source.addEventListener('done', (e) => {
+        source.close();
+        resolve(JSON.parse((e as MessageEvent).data).result || {});
+      });
+      source.addEventListener('error', (e) => {
+        const raw = (e as MessageEvent).data;
+        if (raw) {
+          source.close();
+          reject(new Error(JSON.parse(raw).error || 'Download failed'));
+        } else if (source.readyState === EventSource.CLOSED) {
+          reject(new Error('Lost connection to the server.'));
+        }
+        // otherwise the browser reconnects on its own
+      });
+    });
+
+  const formatProgress = (p?: JobProgress | null) => {
+    if (!p) return null;
+    const parts: string[] = [];
+    if (p.percent != null) parts.push(`${p.percent.toFixed(1)}%`);
+    if (p.speed != null) parts.push(`${(p.speed / (1024 * 1024)).toFixed(2)} MiB/s`);
+    if (p.eta != null) parts.push(`ETA ${p.eta}s`);
+    return parts.join(' · ') || null;
+  };
+
   const handleDownload = async () => {
     const currentLink = videoLink.trim();
     if (!currentLink) return;
@@ -58,7 +98,7 @@ export default function Home() {
     }
 
     try {
-      const endpoint = API_BASE ? `${API_BASE}/download` : '/download';
+      const endpoint = API_BASE ? `${API_BASE}/jobs` : '/jobs';
       const response = await fetch(endpoint, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
@@ -70,7 +110,10 @@ export default function Home() {
         throw new Error(errorData.detail || 'Something went wrong.');
       }
 
-      const data = await response.json();
+      const { job_id: jobId } = await response.json();
+      const data = await waitForJob(jobId, (progress) => {
+        setJobs((prev) => prev.map((j) => j.id === id ? { ...j, progress } : j));
+      });
       const bestUrl = data.force_download_url
         ? (API_BASE ? new URL(data.force_download_url, API_BASE).href : data.force_download_url)
         : (data.download_url
@@ -798,6 +841,9 @@ export default function Home() {
                           </svg>
                           <div style={{ display: 'flex', flexDirection: 'column' }}>
                             <p style={{ color: '#c7d2fe', fontWeight: 700, margin: 0 }}>Processing…</p>
+                            {formatProgress(job.progress) && (
+                              <span style={{ color: '#c7d2fe', fontSize: '0.85rem' }}>{formatProgress(job.progress)}</span>
+                            )}
                             <span style={{ color: '#93c5fd', fontSize: '0.85rem', wordBreak: 'break-all' }}>{job.url}</span>
                           </div>
                         </div>
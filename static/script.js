@@ -15,7 +15,7 @@ $("#go").addEventListener("click", async () => {
   }
   log("Sending request...");
   try {
-    const r = await fetch("/download", {
+    const r = await fetch("/jobs", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ url }),
@@ -24,13 +24,44 @@ $("#go").addEventListener("click", async () => {
     let data;
     try { data = JSON.parse(text) } catch { data = { raw: text } }
     log("Status: " + r.status);
-    log(JSON.stringify(data, null, 2));
-    if (r.ok && data.download_url) {
-      $("#result").innerHTML = `<a href="${data.download_url}" target="_blank">Download file</a>`;
+    if (!r.ok) {
+      log(JSON.stringify(data, null, 2));
+      return;
     }
+    follow(data.job_id);
   } catch (e) {
     log("Error: " + e.message);
   }
 });
 
+const follow = (jobId) => {
+  const source = new EventSource(`/jobs/${jobId}/events`);
+  source.addEventListener("status", (e) => {
+    log("Job " + JSON.parse(e.data).status);
+  });
+  source.addEventListener("progress", (e) => {
+    const p = JSON.parse(e.data);
+    const parts = [];
+    if (p.percent != null) parts.push(p.percent.toFixed(1) + "%");
+    if (p.speed != null) parts.push((p.speed / 1048576).toFixed(2) + " MiB/s");
+    if (p.eta != null) parts.push("ETA " + p.eta + "s");
+    $("#result").textContent = parts.join(" · ");
+  });
+  source.addEventListener("done", (e) => {
+    source.close();
+    const data = JSON.parse(e.data).result || {};
+    const size = data.filesize != null ? " (" + (data.filesize / 1048576).toFixed(1) + " MiB)" : "";
+    log("Done: " + (data.title || "file") + size + (data.cached ? " [cached]" : ""));
+    if (data.download_url) {
+      $("#result").innerHTML = `<a href="${data.download_url}" target="_blank">Download file</a>`;
+    }
+  });
+  source.addEventListener("error", (e) => {
+    if (!e.data) return; // connection hiccup; EventSource reconnects
+    source.close();
+    log("Error: " + (JSON.parse(e.data).error || "Download failed"));
+    log(`yt-dlp output: /jobs/${jobId}/log`);
+  });
+};
+
 